@@ -0,0 +1,162 @@
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+import compare_background_prices_with_badge_prices as scraper
+
+
+def make_synthetic_game_page(appid, background_prices, seed=None):
+    """
+    Builds an HTML page shaped like a Steam Card Exchange game page: navigation, a title,
+    and Trading Cards / Emoticons / Backgrounds sections made of a div.bg-gray-dark header
+    followed by a div.grid of items with "Price: $x.xx" buttons.
+    """
+    rng = random.Random(seed if seed is not None else appid)
+
+    def section(name, prices, kind):
+        items = []
+        for index, price in enumerate(prices):
+            market_url = f"https://steamcommunity.com/market/listings/753/{appid}-{kind}%20{index}"
+            items.append(
+                f'<div class="flex flex-col items-center gap-2">'
+                f'<img src="https://community.cloudflare.steamstatic.com/economy/image/{appid}x{index}" alt="{kind} {index}" loading="lazy">'
+                f'<span class="text-sm">{kind} {index} &amp; Co.</span><br>'
+                f'<a class="btn-primary w-full" href="{market_url}" target="_blank">Price: ${price:.2f}</a>'
+                f'<a class="btn-secondary w-full" href="https://steamcommunity.com/market/search?q={kind}">Stock: {rng.randint(0, 40)}</a>'
+                f'</div>'
+            )
+        return (
+            f'<div class="bg-gray-dark flex justify-between p-2"><h2><a href="#{kind.lower()}">{name}</a></h2>'
+            f'<span class="text-xs">{len(prices)} items</span></div>'
+            f'<div class="grid grid-cols-5 gap-4 p-4">{"".join(items)}</div>'
+        )
+
+    card_prices = [rng.uniform(0.03, 0.5) for _ in range(rng.randint(5, 15))]
+    emoticon_prices = [rng.uniform(0.03, 2.0) for _ in range(rng.randint(0, 8))]
+    navigation = ''.join(f'<li><a href="/index.php?page-{n}">Menu {n}</a></li>' for n in range(30))
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f'<title>Steam Card Exchange - Game {appid}</title><link rel="stylesheet" href="/style.css">'
+        '<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>'
+        '</head><body>'
+        f'<nav><ul class="menu">{navigation}</ul></nav>'
+        '<main class="container">'
+        f'<div class="gameTitle text-2xl"> Synthetic Game {appid} </div>'
+        '<div class="flex gap-2"><a class="btn-primary" href="https://store.steampowered.com/app/'
+        f'{appid}">Store Page</a><a class="btn-primary" href="https://steamcommunity.com/market/search?appid=753">Market</a></div>'
+        '<section class="content">'
+        + section("Trading Cards", card_prices, "Card")
+        + section("Emoticons", emoticon_prices, "Emoticon")
+        + section("Backgrounds", background_prices, "Background")
+        + '</section></main>'
+        '<footer><p>Prices are updated periodically.<br>&copy; Steam Card Exchange</p></footer>'
+        '</body></html>'
+    )
+
+
+def make_synthetic_pages(count, seed=0):
+    """Returns [(appid, html)] for `count` synthetic game pages, some without backgrounds."""
+    rng = random.Random(seed)
+    pages = []
+    for index in range(count):
+        appid = 100000 + index * 10
+        background_count = 0 if index % 10 == 0 else rng.randint(1, 12)
+        background_prices = [rng.uniform(0.05, 15.0) for _ in range(background_count)]
+        pages.append((appid, make_synthetic_game_page(appid, background_prices, seed=appid)))
+    return pages
+
+
+def load_saved_pages(pages_dir):
+    """Loads saved SCE game pages; the AppID is taken from the first number in each file name."""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.htm*'))):
+        match = re.search(r'(\d+)', os.path.basename(path))
+        if not match:
+            continue
+        with open(path, 'r', encoding='utf-8', errors='replace') as page_file:
+            pages.append((int(match.group(1)), page_file.read()))
+    return pages
+
+
+def benchmark_extractor(extractor, pages, repeat):
+    """Returns (pages per second, peak traced memory in bytes) for one extractor."""
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for appid, html in pages:
+            extractor(html, appid)
+    elapsed = time.perf_counter() - start_time
+
+    # Memory is measured in a separate pass so tracing overhead does not skew the timing
+    tracemalloc.start()
+    for appid, html in pages:
+        extractor(html, appid)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (len(pages) * repeat) / elapsed, peak_bytes
+
+
+def check_parity(pages, extractor_names):
+    """Compares every extractor with the bs4 reference and returns a list of mismatch descriptions."""
+    mismatches = []
+    reference = scraper.HTML_EXTRACTORS['bs4']
+    for appid, html in pages:
+        expected = reference(html, appid)
+        for name in extractor_names:
+            actual = scraper.HTML_EXTRACTORS[name](html, appid)
+            if actual != expected:
+                mismatches.append(f"AppID {appid}: {name} returned {actual!r}, bs4 returned {expected!r}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SCE game page extractors and check they agree with the bs4 reference.")
+    parser.add_argument("pages_dir", nargs="?",
+                        help="Directory of saved SCE game pages (*.html, AppID in the file name). Synthetic pages are used if omitted.")
+    parser.add_argument("--synthetic", type=int, default=200,
+                        help="Number of synthetic pages to generate when no pages directory is given (default: 200).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the page set (default: 3).")
+    parser.add_argument("--extractors", default=",".join(sorted(scraper.HTML_EXTRACTORS)),
+                        help="Comma-separated extractors to benchmark (default: all available).")
+    args = parser.parse_args(argv)
+
+    pages = load_saved_pages(args.pages_dir) if args.pages_dir else make_synthetic_pages(args.synthetic)
+    if not pages:
+        print(f"No pages found in '{args.pages_dir}'.")
+        return 1
+
+    extractor_names = [name.strip() for name in args.extractors.split(",") if name.strip()]
+    unknown = [name for name in extractor_names if name not in scraper.HTML_EXTRACTORS]
+    if unknown:
+        print(f"Unknown or unavailable extractors: {', '.join(unknown)}")
+        return 1
+
+    total_kib = sum(len(html) for _, html in pages) / 1024
+    print(f"Benchmarking {len(extractor_names)} extractors over {len(pages)} pages ({total_kib:.0f} KiB), {args.repeat} passes each")
+    print(f"{'extractor':<10} {'pages/sec':>12} {'peak memory':>14}")
+    reference_rate = None
+    for name in extractor_names:
+        pages_per_second, peak_bytes = benchmark_extractor(scraper.HTML_EXTRACTORS[name], pages, args.repeat)
+        if name == 'bs4':
+            reference_rate = pages_per_second
+        speedup = f"  ({pages_per_second / reference_rate:.1f}x bs4)" if reference_rate and name != 'bs4' else ""
+        print(f"{name:<10} {pages_per_second:>12.1f} {peak_bytes / 1024:>11.0f} KiB{speedup}")
+    print("(peak memory is the Python heap as seen by tracemalloc; memory allocated inside lxml's C library is not included)")
+
+    mismatches = check_parity(pages, [name for name in extractor_names if name != 'bs4'])
+    if mismatches:
+        print(f"\nParity check FAILED: {len(mismatches)} mismatches")
+        for mismatch in mismatches[:20]:
+            print(f"  {mismatch}")
+        return 1
+    print(f"\nParity check passed: all extractors match the bs4 reference on {len(pages)} pages.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay_server import FaultProfile, ReplayServer, synthesize_fixtures
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compare_background_prices_with_badge_prices.py")
+
+# name -> (FaultProfile keyword arguments, extra scraper arguments)
+SCENARIOS = {
+    'clean': ({}, []),
+    'latency': ({'latency_ms': 40, 'jitter_ms': 20}, []),
+    'faults': ({'latency_ms': 20, 'jitter_ms': 10, 'rate_429': 0.03, 'rate_5xx': 0.02, 'rate_garbage': 0.01}, []),
+}
+
+
+def run_scenario(fixtures_dir, scenario_name, concurrency, retry_delay, extra_args=()):
+    """
+    Runs the full scraper (__main__ included) in a subprocess against two fresh replay
+    servers and a clean working directory. Returns the scraper's --stats-json summary
+    plus the replay servers' request/fault counts.
+    """
+    fault_kwargs, scenario_args = SCENARIOS[scenario_name]
+    servers = [ReplayServer(fixtures_dir, FaultProfile(seed=seed, **fault_kwargs)).start() for seed in (1, 2)]
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            stats_path = os.path.join(work_dir, "stats.json")
+            command = [
+                sys.executable, SCRIPT_PATH,
+                "--sce-base-url", servers[0].base_url,
+                "--steam-base-url", servers[1].base_url,
+                "--sce-rate", "0", "--steam-rate", "0",
+                "--retry-delay", str(retry_delay),
+                "--concurrency", str(concurrency),
+                "--stats-json", stats_path,
+            ] + scenario_args + list(extra_args)
+            start_time = time.monotonic()
+            completed = subprocess.run(command, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            wall_seconds = time.monotonic() - start_time
+            if completed.returncode != 0 or not os.path.exists(stats_path):
+                raise RuntimeError(f"Scraper run failed (exit {completed.returncode}):\n{completed.stdout[-3000:]}")
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                stats = json.load(stats_file)
+    finally:
+        for server in servers:
+            server.stop()
+
+    stats['wall_seconds'] = wall_seconds
+    stats['server_faults'] = {}
+    for server in servers:
+        for fault, count in server.stats['faults'].items():
+            stats['server_faults'][fault] = stats['server_faults'].get(fault, 0) + count
+    return stats
+
+
+def format_row(name, stats):
+    first_alert = stats['time_to_first_alert_seconds']
+    first_alert_text = f"{first_alert:.2f}s" if first_alert is not None else "-"
+    # Summed over all worker threads, so this can exceed 100% at high concurrency
+    retry_share = stats['retry_sleep_seconds'] / stats['total_seconds'] * 100 if stats['total_seconds'] else 0.0
+    return (f"{name:<22} {stats['games_per_second']:>9.1f} {stats['requests_per_game']:>9.2f} "
+            f"{first_alert_text:>12} {stats['retries']:>8} {stats['retry_sleep_seconds']:>9.2f}s {retry_share:>6.1f}% {stats['alerts']:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark of the scraper against local replay servers.")
+    parser.add_argument("--fixtures", help="Fixture directory (see replay_server.py). Synthetic fixtures are generated if omitted.")
+    parser.add_argument("--games", type=int, default=300, help="Games in the generated synthetic fixtures (default: 300).")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated scenarios (default: {','.join(SCENARIOS)}).")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated concurrency levels (default: 1,8).")
+    parser.add_argument("--retry-delay", type=float, default=0.05, help="Scraper --retry-delay for the runs (default: 0.05).")
+    parser.add_argument("--save", metavar="JSON", help="Save the results, e.g. as a baseline for later runs.")
+    parser.add_argument("--baseline", metavar="JSON", help="Compare games/sec against a previously saved run.")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Fail when games/sec drops by more than this fraction versus --baseline (default: 0.2).")
+    args, scraper_args = parser.parse_known_args(argv)
+
+    with tempfile.TemporaryDirectory() as generated_dir:
+        fixtures_dir = args.fixtures
+        if not fixtures_dir:
+            fixtures_dir = generated_dir
+            synthesize_fixtures(fixtures_dir, args.games)
+
+        print(f"{'run':<22} {'games/s':>9} {'req/game':>9} {'first alert':>12} {'retries':>8} {'retry sleep':>10} {'of wall':>7} {'alerts':>7}")
+        results = {}
+        for scenario_name in [name.strip() for name in args.scenarios.split(",") if name.strip()]:
+            for concurrency in [int(level) for level in args.concurrency.split(",") if level.strip()]:
+                run_name = f"{scenario_name}@{concurrency}"
+                stats = run_scenario(fixtures_dir, scenario_name, concurrency, args.retry_delay, scraper_args)
+                results[run_name] = stats
+                print(format_row(run_name, stats))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as results_file:
+            json.dump(results, results_file, indent=2)
+        print(f"\nSaved results to '{args.save}'.")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = []
+        for run_name, stats in results.items():
+            if run_name not in baseline:
+                continue
+            baseline_rate = baseline[run_name]['games_per_second']
+            if baseline_rate and stats['games_per_second'] < baseline_rate * (1 - args.max_regression):
+                regressions.append(f"{run_name}: {stats['games_per_second']:.1f} games/s vs baseline {baseline_rate:.1f}")
+        if regressions:
+            print("\nThroughput regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo throughput regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
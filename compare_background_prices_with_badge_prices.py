@@ -6,6 +6,50 @@ import csv
 import time
 import os
 import sys
+import argparse
+import asyncio
+import threading
+import queue
+import bisect
+import heapq
+import mmap
+import statistics
+import random
+import codecs
+import socket
+import signal
+import subprocess
+import zlib
+import math
+from array import array
+import atexit
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+from html.parser import HTMLParser
+from urllib.parse import urlparse, unquote, parse_qs
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
 
 # Define the path for the output CSV files in the current working directory
 drive_folder = '.' # Current directory
@@ -16,417 +60,3502 @@ os.makedirs(drive_folder, exist_ok=True) # Create the folder if it doesn't exist
 output_csv_file = os.path.join(drive_folder, "steam_background_alerts.csv")
 # Comprehensive log of all processed games
 all_processed_games_file = os.path.join(drive_folder, "all_processed_games.csv")
+# Append-only journal of processed AppIDs and alerts; both CSVs above are exported from it
+results_journal_file = os.path.join(drive_folder, "scan_journal.jsonl")
+# Compact memory-mapped set of processed AppIDs built from the journal (plus its ".log" append segment)
+processed_app_ids_file = os.path.join(drive_folder, "processed_app_ids.u32")
+# Local SQLite cache of values that never change between runs (e.g. item_nameids)
+cache_db_file = os.path.join(drive_folder, "steam_price_cache.sqlite3")
+# Shared work-claim checkpoint for sharded scans; put it on a volume every worker can reach
+shard_db_file = os.path.join(drive_folder, "shard_checkpoint.sqlite3")
+# Run summaries of local shard workers when only --metrics-json/--metrics-prom asked for them (removed once merged)
+shard_run_stats_file = os.path.join(drive_folder, "shard_run_stats.json")
+# Alerts of the last --depth run ranked by realizable profit after fees
+depth_ranking_csv_file = os.path.join(drive_folder, "steam_depth_ranking.csv")
+# cProfile statistics and the readable cProfile/tracemalloc report written by --profile
+profile_stats_file = os.path.join(drive_folder, "steam_alerts_profile.pstats")
+profile_report_file = os.path.join(drive_folder, "steam_alerts_profile.txt")
+
+ALERT_CSV_HEADER = [
+    "game name", 
+    "app id", 
+    "badge price", 
+    "highest background price", 
+    "buy order price", 
+    "highest background steam market link",
+    "steam card exchange link"
+]
 
-# Global variables to hold file objects and writers, allowing re-opening
-alert_csvfile_global = None
-all_processed_csvfile_global = None
-alert_csv_writer_global = None
-all_processed_csv_writer_global = None
+DEFAULT_JOURNAL_BATCH_SIZE = 50
+DEFAULT_JOURNAL_FLUSH_INTERVAL_MS = 1000
+# Recovery only reads this much of the journal's end unless the tail looks damaged
+JOURNAL_TAIL_CHECK_BYTES = 64 * 1024
 
-def open_csv_files(output_csv_path, all_processed_games_path, alert_file_exists, all_processed_file_exists):
-    """Opens or re-opens the CSV files and initializes writers."""
-    global alert_csvfile_global, all_processed_csvfile_global, alert_csv_writer_global, all_processed_csv_writer_global
+def read_journal(journal_path, max_length=None):
+    """
+    Returns (records, byte length up to the end of the last valid record) for a results
+    journal, optionally only its first max_length bytes. Never modifies the file. Corrupt
+    lines followed by valid records are skipped with a warning; an incomplete or corrupt
+    tail is a write torn by a crash (or still in flight) and is left out silently.
+    """
+    records = []
+    good_length = 0
+    if not os.path.exists(journal_path):
+        return records, good_length
+    offset = 0
+    corrupt_lines = []
+    with open(journal_path, 'rb') as journal_file:
+        for line_number, line in enumerate(journal_file, 1):
+            if not line.endswith(b'\n') or (max_length is not None and offset + len(line) > max_length):
+                break
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                corrupt_lines.append(line_number)
+                continue
+            if corrupt_lines:
+                print(f"Warning: Skipping corrupt records in journal '{journal_path}' at line(s) {', '.join(map(str, corrupt_lines))}.")
+                corrupt_lines = []
+            records.append(record)
+            good_length = offset
+    return records, good_length
+
+def committed_journal_length(journal_path):
+    """
+    Returns the byte length of a journal's intact prefix by checking only its tail: torn
+    writes can only be at the end of an append-only file, so the prefix ends after the last
+    complete line if that line parses. Falls back to reading the whole journal otherwise.
+    """
+    file_size = os.path.getsize(journal_path)
+    with open(journal_path, 'rb') as journal_file:
+        tail_start = max(0, file_size - JOURNAL_TAIL_CHECK_BYTES)
+        journal_file.seek(tail_start)
+        tail = journal_file.read()
+    last_newline = tail.rfind(b'\n')
+    previous_newline = tail.rfind(b'\n', 0, last_newline) if last_newline >= 0 else -1
+    if previous_newline >= 0 or (tail_start == 0 and last_newline >= 0):
+        try:
+            json.loads(tail[previous_newline + 1:last_newline + 1])
+            return tail_start + last_newline + 1
+        except ValueError:
+            pass
+    return read_journal(journal_path)[1]
+
+class ResultJournal:
+    """
+    Append-only JSON-lines journal of scan results with group commit. Records are buffered
+    and written + fsynced together once flush_every records are pending or flush_interval_ms
+    has passed since the last commit, instead of one write and flush per game.
+
+    On open, the journal is recovered: a write torn by a crash (an incomplete or corrupt
+    last line) is found from the tail and truncated so new records append cleanly. At most
+    one uncommitted batch is lost in a crash, and those games are simply checked again on
+    the next run. The committed records are only read when `records` is first used.
+    on_commit(records), if set, is called with every batch once it is on disk.
+    """
+
+    def __init__(self, journal_path, flush_every=DEFAULT_JOURNAL_BATCH_SIZE, flush_interval_ms=DEFAULT_JOURNAL_FLUSH_INTERVAL_MS):
+        self.journal_path = journal_path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval_seconds = flush_interval_ms / 1000.0
+        self.pending_lines = []
+        self.pending_records = []
+        self.on_commit = None
+        self.last_flush_time = time.monotonic()
+        self.lock = threading.Lock()
+        self.is_new = not os.path.exists(journal_path) or os.path.getsize(journal_path) == 0
+        self.recovered_length = self.recover()
+        self._records = None
+        self.journal_file = open(journal_path, 'a', encoding='utf-8')
+
+    def recover(self):
+        """Truncates any torn tail left by a crash and returns the length of the committed records."""
+        if self.is_new:
+            return 0
+        good_length = committed_journal_length(self.journal_path)
+        if good_length < os.path.getsize(self.journal_path):
+            print(f"Recovered journal '{self.journal_path}': dropping {os.path.getsize(self.journal_path) - good_length} bytes of incomplete records.")
+            with open(self.journal_path, 'r+b') as journal_file:
+                journal_file.truncate(good_length)
+        return good_length
+
+    @property
+    def records(self):
+        """The records committed before this run, read on first use."""
+        if self._records is None:
+            self._records = read_journal(self.journal_path, self.recovered_length)[0]
+        return self._records
+
+    def append(self, record):
+        with self.lock:
+            self.pending_lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+            self.pending_records.append(record)
+            if (len(self.pending_lines) >= self.flush_every
+                    or time.monotonic() - self.last_flush_time >= self.flush_interval_seconds):
+                self._commit()
+
+    def flush(self):
+        with self.lock:
+            self._commit()
+
+    def _commit(self):
+        self.last_flush_time = time.monotonic()
+        if not self.pending_lines:
+            return
+        try:
+            self.journal_file.write(''.join(self.pending_lines))
+            self.journal_file.flush()
+            os.fsync(self.journal_file.fileno())
+        except (IOError, ValueError) as e:
+            # Keep the batch buffered; it is retried with the next commit
+            print(f"Warning: Could not commit {len(self.pending_lines)} records to '{self.journal_path}': {e}")
+            return
+        committed_records = self.pending_records
+        self.pending_lines = []
+        self.pending_records = []
+        if self.on_commit is not None:
+            self.on_commit(committed_records)
 
+    def close(self):
+        self.flush()
+        self.journal_file.close()
+
+# Opened in the main block
+results_journal_global = None
+
+# Processed AppIDs appended since the last compaction are merged into the sorted file at this count
+DEFAULT_APPID_COMPACT_THRESHOLD = 10000
+
+class ProcessedAppIdStore:
+    """
+    Compact set of processed AppIDs used to skip games checked in earlier runs. The base
+    segment is a sorted array of native uint32 (4 bytes per AppID) that is memory-mapped
+    read-only and binary-searched, so opening it reads nothing and lookups create no
+    per-entry Python objects. AppIDs added since the last compaction go to an append
+    segment (the same format, unsorted) mirrored in a small set; once it holds
+    compact_threshold AppIDs both are merged into a new base file that atomically
+    replaces the old one. Closing only syncs the append segment. AppIDs are added once their journal batch has been
+    committed, so the store never holds a game the journal does not.
+    """
+
+    def __init__(self, path, compact_threshold=DEFAULT_APPID_COMPACT_THRESHOLD, read_only=False):
+        self.path = path
+        self.append_path = path + '.log'
+        self.compact_threshold = max(1, compact_threshold)
+        self.read_only = read_only
+        self.lock = threading.Lock()
+        self.base_file = None
+        self.base_map = None
+        self.base_ids = ()
+        self._map_base()
+        self.appended_ids = self._read_append_segment()
+        self.append_file = None if read_only else open(self.append_path, 'ab')
+
+    @staticmethod
+    def create(path, app_ids):
+        """Writes a new base file holding app_ids and drops any append segment. Returns the number of AppIDs."""
+        sorted_ids = array('I', sorted(set(app_ids)))
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as base_file:
+            sorted_ids.tofile(base_file)
+            base_file.flush()
+            os.fsync(base_file.fileno())
+        os.replace(temporary_path, path)
+        if os.path.exists(path + '.log'):
+            os.remove(path + '.log')
+        return len(sorted_ids)
+
+    def _map_base(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < 4:
+            return
+        self.base_file = open(self.path, 'rb')
+        self.base_map = mmap.mmap(self.base_file.fileno(), 0, access=mmap.ACCESS_READ)
+        usable_length = len(self.base_map) - len(self.base_map) % 4
+        self.base_ids = memoryview(self.base_map)[:usable_length].cast('I')
+
+    def _unmap_base(self):
+        if self.base_map is None:
+            return
+        # The memoryview must be released before the map can be closed
+        self.base_ids.release()
+        self.base_ids = ()
+        self.base_map.close()
+        self.base_file.close()
+        self.base_map = None
+        self.base_file = None
+
+    def _read_append_segment(self):
+        appended = array('I')
+        if os.path.exists(self.append_path):
+            with open(self.append_path, 'rb') as append_file:
+                data = append_file.read()
+            usable_length = len(data) - len(data) % 4
+            if usable_length < len(data) and not self.read_only:
+                # A write torn by a crash
+                with open(self.append_path, 'r+b') as append_file:
+                    append_file.truncate(usable_length)
+            appended.frombytes(data[:usable_length])
+        # AppIDs already in the base were left behind by a compaction interrupted before truncating the segment
+        return {appid for appid in appended if not self._in_base(appid)}
+
+    def _in_base(self, appid):
+        index = bisect.bisect_left(self.base_ids, appid)
+        return index < len(self.base_ids) and self.base_ids[index] == appid
+
+    def __contains__(self, appid):
+        with self.lock:
+            return appid in self.appended_ids or self._in_base(appid)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.base_ids) + len(self.appended_ids)
+
+    def add_many(self, app_ids):
+        """Adds AppIDs with one write to the append segment."""
+        with self.lock:
+            new_ids = array('I')
+            for appid in app_ids:
+                if appid not in self.appended_ids and not self._in_base(appid):
+                    self.appended_ids.add(appid)
+                    new_ids.append(appid)
+            if not new_ids:
+                return
+            self.append_file.write(new_ids.tobytes())
+            self.append_file.flush()
+            if len(self.appended_ids) >= self.compact_threshold:
+                self._compact()
+
+    def add_committed_records(self, records):
+        """ResultJournal.on_commit hook: adds the AppIDs of a committed batch's 'processed' records."""
+        self.add_many(record['appid'] for record in records if record.get('type') == 'processed')
+
+    def _compact(self):
+        merged_ids = array('I', heapq.merge(self.base_ids, sorted(self.appended_ids)))
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'wb') as base_file:
+            merged_ids.tofile(base_file)
+            base_file.flush()
+            os.fsync(base_file.fileno())
+        self._unmap_base()
+        os.replace(temporary_path, self.path)
+        self.append_file.close()
+        self.append_file = open(self.append_path, 'wb')
+        self.appended_ids = set()
+        self._map_base()
+
+    def compact(self):
+        with self.lock:
+            if self.appended_ids:
+                self._compact()
+
+    def close(self):
+        with self.lock:
+            if not self.read_only:
+                # Below the threshold the segment is cheaper to keep than a rewrite of the whole base
+                if len(self.appended_ids) >= self.compact_threshold:
+                    self._compact()
+                self.append_file.flush()
+                os.fsync(self.append_file.fileno())
+                self.append_file.close()
+            self._unmap_base()
+
+def processed_record(appid):
+    return {'type': 'processed', 'appid': appid}
+
+def alert_record(alert_row):
+    return {'type': 'alert', 'row': alert_row}
+
+def cleared_record(appid):
+    """Journaled when a checked game does not alert, superseding any earlier alert for it."""
+    return {'type': 'cleared', 'appid': appid}
+
+def alert_row_appid(alert_row):
+    """The AppID of an alert row as an int; rows migrated from the CSV hold it as text."""
     try:
-        # Close existing files if they are open and not already closed
-        if alert_csvfile_global and not alert_csvfile_global.closed:
-            alert_csvfile_global.close()
-        if all_processed_csvfile_global and not all_processed_csvfile_global.closed:
-            all_processed_csvfile_global.close()
-
-        alert_csvfile_global = open(output_csv_path, 'a', newline='', encoding='utf-8')
-        all_processed_csvfile_global = open(all_processed_games_path, 'a', newline='', encoding='utf-8') # Always open in append mode
-
-        alert_csv_writer_global = csv.writer(alert_csvfile_global)
-        all_processed_csv_writer_global = csv.writer(all_processed_csvfile_global)
-
-        # Write header for the main alert CSV ONLY if the file is new or empty
-        if not alert_file_exists or os.stat(output_csv_path).st_size == 0:
-            alert_csv_writer_global.writerow([
-                "game name", 
-                "app id", 
-                "badge price", 
-                "highest background price", 
-                "buy order price", 
-                "highest background steam market link",
-                "steam card exchange link"
-            ])
-        
-        # Write header for the comprehensive processed games log ONLY if the file is new or empty
-        # This check is important because we always open in 'a' mode to avoid truncating
-        if not all_processed_file_exists or os.stat(all_processed_games_path).st_size == 0:
-            all_processed_csv_writer_global.writerow(["AppID"])
-        
-        print("CSV files successfully opened/re-opened.")
-        return True
-    except Exception as e:
-        print(f"ERROR: Failed to open/re-open CSV files: {e}")
-        return False
+        return int(alert_row[1])
+    except (IndexError, TypeError, ValueError):
+        return None
 
-def get_steam_market_buy_listings(market_url):
+def migrate_csv_logs_to_journal(journal, alert_csv_path, all_processed_games_path):
+    """Seeds a new journal with the AppIDs and alerts already in the pre-journal CSV files."""
+    migrated_records = []
+    if os.path.exists(all_processed_games_path):
+        migrated_records.extend(processed_record(appid) for appid in sorted(load_processed_app_ids(all_processed_games_path)))
+    if os.path.exists(alert_csv_path):
+        with open(alert_csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+            csv_reader = csv.reader(csvfile)
+            next(csv_reader, None)
+            migrated_records.extend(alert_record(row) for row in csv_reader if row)
+    for record in migrated_records:
+        journal.append(record)
+    journal.flush()
+    journal.records.extend(migrated_records)
+    return len(migrated_records)
+
+def export_journal_to_csv(journal_records, alert_csv_path, all_processed_games_path):
+    """
+    Rewrites steam_background_alerts.csv and all_processed_games.csv from journal records.
+    The alert CSV holds one row per game, from its latest check; games whose latest
+    check did not alert are left out. Each file is written to a temporary path and
+    then renamed into place. Returns (alert count, processed AppID count).
+    """
+    latest_alert_rows = {}
+    for index, record in enumerate(journal_records):
+        if record.get('type') == 'alert':
+            appid = alert_row_appid(record['row'])
+            # Re-inserted so the CSV stays in order of each game's latest alert
+            key = appid if appid is not None else ('unkeyed', index)
+            latest_alert_rows.pop(key, None)
+            latest_alert_rows[key] = record['row']
+        elif record.get('type') == 'cleared':
+            latest_alert_rows.pop(record['appid'], None)
+    alert_rows = list(latest_alert_rows.values())
+    processed_app_ids = []
+    seen_app_ids = set()
+    for record in journal_records:
+        if record.get('type') == 'processed' and record['appid'] not in seen_app_ids:
+            seen_app_ids.add(record['appid'])
+            processed_app_ids.append(record['appid'])
+
+    with stage_metrics.timer('csv_export'):
+        for csv_path, header, rows in ((alert_csv_path, ALERT_CSV_HEADER, alert_rows),
+                                       (all_processed_games_path, ["AppID"], [[appid] for appid in processed_app_ids])):
+            temporary_path = csv_path + '.tmp'
+            with open(temporary_path, 'w', newline='', encoding='utf-8') as csvfile:
+                csv_writer = csv.writer(csvfile)
+                csv_writer.writerow(header)
+                csv_writer.writerows(rows)
+            os.replace(temporary_path, csv_path)
+    return len(alert_rows), len(processed_app_ids)
+
+# Site roots; overridable with --sce-base-url/--steam-base-url, e.g. to point at replay_server.py
+SCE_BASE_URL = "https://www.steamcardexchange.net"
+STEAM_COMMUNITY_BASE_URL = "https://steamcommunity.com"
+
+# Base delay between retries of a failed request; it doubles with every attempt up to the cap
+RETRY_DELAY_SECONDS = 10
+RETRY_MAX_DELAY_SECONDS = 300
+
+# A host's circuit opens after this many consecutive failures (or at once on a 429 with
+# Retry-After) and stays open for the cooldown, which doubles while the host keeps failing
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN_SECONDS = 30
+BREAKER_MAX_COOLDOWN_SECONDS = 600
+
+# Counters for the run summary (--stats-json), updated from every worker thread
+run_stats = {
+    'requests': 0,
+    'requests_by_host': {},
+    'retries': 0,
+    'retry_sleep_seconds': 0.0,
+    'retry_after_honored': 0,
+    'throttle_sleep_seconds': 0.0,
+    'breaker_opens': 0,
+    'breaker_wait_seconds': 0.0,
+    'deferred_market_lookups': 0,
+    'responses_by_host': {},
+    'bytes_by_host': {},
+    'alerts': 0,
+    'time_to_first_alert_seconds': None,
+}
+run_stats_lock = threading.Lock()
+run_start_time = time.monotonic()
+
+# Upper bounds (seconds) of the stage latency histogram buckets, as in a Prometheus histogram
+STAGE_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class StageMetrics:
+    """
+    Latency histograms for the pipeline stages (badge feed fetch, game page fetch, HTML
+    parse, listing fetch, histogram fetch, result write, CSV export), updated from every
+    worker thread and exported as a JSON summary or a Prometheus text file.
+    """
+
+    def __init__(self, buckets=STAGE_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'bucket_counts': [0] * (len(self.buckets) + 1)}
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            for index, upper_bound in enumerate(self.buckets):
+                if seconds <= upper_bound:
+                    entry['bucket_counts'][index] += 1
+                    break
+            else:
+                entry['bucket_counts'][-1] += 1
+
+    @contextmanager
+    def timer(self, stage):
+        """Times the enclosed block as one observation of `stage`."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start_time)
+
+    def quantile(self, entry, fraction):
+        """Estimates a latency quantile from the histogram (the upper bound of the bucket it falls in)."""
+        target = entry['count'] * fraction
+        seen = 0
+        for upper_bound, bucket_count in zip(self.buckets + (entry['max'],), entry['bucket_counts']):
+            seen += bucket_count
+            if seen >= target:
+                return min(upper_bound, entry['max'])
+        return entry['max']
+
+    def snapshot(self):
+        """Returns the raw histograms ({stage: {count, sum, max, bucket_counts}}) so another process can merge them."""
+        with self.lock:
+            return {stage: dict(entry, bucket_counts=list(entry['bucket_counts'])) for stage, entry in self.stages.items()}
+
+    def merge(self, snapshot):
+        """Adds the histograms of another process's snapshot() to this one."""
+        with self.lock:
+            for stage, other in snapshot.items():
+                if len(other['bucket_counts']) != len(self.buckets) + 1:
+                    continue
+                entry = self.stages.get(stage)
+                if entry is None:
+                    entry = self.stages[stage] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'bucket_counts': [0] * (len(self.buckets) + 1)}
+                entry['count'] += other['count']
+                entry['sum'] += other['sum']
+                entry['max'] = max(entry['max'], other['max'])
+                entry['bucket_counts'] = [count + other_count for count, other_count in zip(entry['bucket_counts'], other['bucket_counts'])]
+
+    def summary(self):
+        """Returns {stage: {count, total_seconds, mean_seconds, p50_seconds, p95_seconds, max_seconds}}."""
+        with self.lock:
+            stages = {stage: dict(entry, bucket_counts=list(entry['bucket_counts'])) for stage, entry in self.stages.items()}
+        return {
+            stage: {
+                'count': entry['count'],
+                'total_seconds': entry['sum'],
+                'mean_seconds': entry['sum'] / entry['count'] if entry['count'] else 0.0,
+                'p50_seconds': self.quantile(entry, 0.5),
+                'p95_seconds': self.quantile(entry, 0.95),
+                'max_seconds': entry['max'],
+            }
+            for stage, entry in sorted(stages.items())
+        }
+
+    def prometheus_lines(self, prefix):
+        with self.lock:
+            stages = {stage: dict(entry, bucket_counts=list(entry['bucket_counts'])) for stage, entry in self.stages.items()}
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latency of each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage, entry in sorted(stages.items()):
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets, entry['bucket_counts']):
+                cumulative_count += bucket_count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{upper_bound:g}"}} {cumulative_count}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+        return lines
+
+stage_metrics = StageMetrics()
+
+def write_metrics_json(metrics_path):
+    """Writes the stage latencies and request/retry counters as a JSON summary."""
+    with run_stats_lock:
+        counters = dict(run_stats, requests_by_host=dict(run_stats['requests_by_host']),
+                        responses_by_host=dict(run_stats['responses_by_host']), bytes_by_host=dict(run_stats['bytes_by_host']))
+    with open(metrics_path, 'w', encoding='utf-8') as metrics_file:
+        json.dump({'stages': stage_metrics.summary(), 'counters': counters}, metrics_file, indent=2)
+
+def write_metrics_prometheus(metrics_path, prefix="steam_alerts"):
+    """Writes the stage latency histograms and request/retry counters in the Prometheus text format (e.g. for node_exporter's textfile collector)."""
+    with run_stats_lock:
+        responses_by_host = dict(run_stats['responses_by_host'])
+        bytes_by_host = dict(run_stats['bytes_by_host'])
+        counters = {name: run_stats[name] for name in (
+            'retries', 'retry_sleep_seconds', 'retry_after_honored', 'throttle_sleep_seconds',
+            'breaker_opens', 'breaker_wait_seconds', 'deferred_market_lookups', 'alerts')}
+    lines = stage_metrics.prometheus_lines(prefix)
+    lines.append(f"# HELP {prefix}_http_responses_total HTTP responses by host and status code.")
+    lines.append(f"# TYPE {prefix}_http_responses_total counter")
+    for status_key, count in sorted(responses_by_host.items()):
+        host, status = status_key.rsplit(' ', 1)
+        lines.append(f'{prefix}_http_responses_total{{host="{host}",status="{status}"}} {count}')
+    lines.append(f"# HELP {prefix}_http_bytes_total Response body bytes downloaded by host.")
+    lines.append(f"# TYPE {prefix}_http_bytes_total counter")
+    for host, byte_count in sorted(bytes_by_host.items()):
+        lines.append(f'{prefix}_http_bytes_total{{host="{host}"}} {byte_count}')
+    for name, value in counters.items():
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+    temporary_path = metrics_path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as metrics_file:
+        metrics_file.write("\n".join(lines) + "\n")
+    # Renamed into place so a collector never reads a half-written file
+    os.replace(temporary_path, metrics_path)
+
+def print_stage_summary():
+    stages = stage_metrics.summary()
+    if not stages:
+        return
+    print(f"--- Stage timings ({'count':>6} {'total':>9} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}) ---")
+    for stage, entry in stages.items():
+        print(f"    {stage:<18} {entry['count']:>6} {entry['total_seconds']:>8.2f}s {entry['mean_seconds'] * 1000:>6.1f}ms "
+              f"{entry['p50_seconds'] * 1000:>6.1f}ms {entry['p95_seconds'] * 1000:>6.1f}ms {entry['max_seconds'] * 1000:>6.1f}ms")
+
+def record_downloaded_bytes(host, byte_count):
+    with run_stats_lock:
+        run_stats['bytes_by_host'][host] = run_stats['bytes_by_host'].get(host, 0) + byte_count
+
+# cProfile profilers enabled by --profile; one per worker thread on Pythons that profile per thread
+active_profilers = []
+
+def start_thread_profiler():
+    """Profiles the calling thread as part of --profile (a no-op when one profiler already covers every thread)."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ profiles all threads with the first enabled profiler
+        return
+    active_profilers.append(profiler)
+
+def write_profile_report():
+    """Stops --profile and writes the cProfile statistics plus a readable cProfile/tracemalloc report."""
+    for profiler in active_profilers:
+        profiler.disable()
+    stats = pstats.Stats(*active_profilers)
+    stats.dump_stats(profile_stats_file)
+    report = io.StringIO()
+    stats.stream = report
+    report.write("=== cProfile: top functions by cumulative time ===\n")
+    stats.sort_stats('cumulative').print_stats(40)
+    report.write("=== cProfile: top functions by own time ===\n")
+    stats.sort_stats('tottime').print_stats(25)
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    report.write(f"=== tracemalloc: current {current_bytes / 1024:.0f} KiB, peak {peak_bytes / 1024:.0f} KiB; top allocation sites ===\n")
+    for statistic in tracemalloc.take_snapshot().statistics('lineno')[:25]:
+        report.write(f"{statistic}\n")
+    tracemalloc.stop()
+    with open(profile_report_file, 'w', encoding='utf-8') as report_file:
+        report_file.write(report.getvalue())
+    print(f"--- Profile written to '{profile_report_file}' (raw cProfile stats in '{profile_stats_file}'); peak traced memory {peak_bytes / 1024 / 1024:.1f} MiB ---")
+
+def retry_sleep(seconds):
+    """Sleeps before a retry and counts it in the run summary."""
+    with run_stats_lock:
+        run_stats['retries'] += 1
+        run_stats['retry_sleep_seconds'] += seconds
+    time.sleep(seconds)
+
+def parse_retry_after(response):
+    """Returns the delay in seconds requested by a response's Retry-After header, or None."""
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def backoff_delay(attempt, error=None):
+    """
+    Delay before retry number `attempt`: the server's Retry-After when the failed
+    response carried one, otherwise exponential backoff from RETRY_DELAY_SECONDS capped
+    at RETRY_MAX_DELAY_SECONDS, with jitter so concurrent workers do not retry in lockstep.
+    """
+    retry_after = parse_retry_after(getattr(error, 'response', None))
+    if retry_after is not None:
+        with run_stats_lock:
+            run_stats['retry_after_honored'] += 1
+        return retry_after
+    delay = min(RETRY_MAX_DELAY_SECONDS, RETRY_DELAY_SECONDS * 2 ** min(attempt - 1, 30))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def rebase_steam_community_url(url):
+    """Points a steamcommunity.com link scraped from SCE at STEAM_COMMUNITY_BASE_URL."""
+    default_base_url = "https://steamcommunity.com"
+    if STEAM_COMMUNITY_BASE_URL != default_base_url and url.startswith(default_base_url):
+        return STEAM_COMMUNITY_BASE_URL + url[len(default_base_url):]
+    return url
+
+# Default request rates (requests per second) for each host during a scan.
+# steamcommunity.com throttles much more aggressively than steamcardexchange.net.
+DEFAULT_SCE_RATE_LIMIT = 2.0
+DEFAULT_STEAM_RATE_LIMIT = 0.5
+
+# Token buckets keyed by host name, shared by every worker thread
+host_rate_limiters = {}
+
+class TokenBucket:
+    """Thread-safe token bucket that spaces out requests to a single host."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, consumes it, and returns the seconds spent waiting."""
+        waited_seconds = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited_seconds
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+            waited_seconds += wait_seconds
+
+class HostCircuitBreaker:
+    """
+    Per-host circuit breaker shared by every worker thread. Throttling (429) and server
+    errors count as failures; once the host is failing, its circuit opens and every
+    request to it waits for the cooldown instead of each worker hammering it on its own
+    retry schedule. Callers can check is_open() to put work for that host aside.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_BREAKER_THRESHOLD, cooldown_seconds=DEFAULT_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown_seconds = cooldown_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.cooldown_seconds = self.base_cooldown_seconds
+
+    def record_failure(self, retry_after=None):
+        with self.lock:
+            self.consecutive_failures += 1
+            if retry_after is None and self.consecutive_failures < self.failure_threshold:
+                return
+            open_seconds = retry_after if retry_after is not None else self.cooldown_seconds
+            open_until = time.monotonic() + open_seconds
+            if open_until <= self.open_until:
+                return
+            self.open_until = open_until
+            self.consecutive_failures = 0
+            if retry_after is None:
+                self.cooldown_seconds = min(BREAKER_MAX_COOLDOWN_SECONDS, self.cooldown_seconds * 2)
+        with run_stats_lock:
+            run_stats['breaker_opens'] += 1
+
+    def wait_seconds(self):
+        """Seconds until the circuit closes again (0 when it is closed)."""
+        with self.lock:
+            return max(0.0, self.open_until - time.monotonic())
+
+    def is_open(self):
+        return self.wait_seconds() > 0
+
+# Circuit breakers keyed by host name, shared by every worker thread
+host_circuit_breakers = {}
+
+def configure_rate_limits(sce_rate=DEFAULT_SCE_RATE_LIMIT, steam_rate=DEFAULT_STEAM_RATE_LIMIT,
+                          breaker_threshold=DEFAULT_BREAKER_THRESHOLD, breaker_cooldown=DEFAULT_BREAKER_COOLDOWN_SECONDS):
+    """
+    Installs the per-host token buckets and circuit breakers used by http_get.
+    A rate of 0 disables throttling for that host.
+    """
+    host_rate_limiters.clear()
+    host_circuit_breakers.clear()
+    for base_url, rate in ((SCE_BASE_URL, sce_rate), (STEAM_COMMUNITY_BASE_URL, steam_rate)):
+        host = urlparse(base_url).netloc
+        if rate and rate > 0:
+            host_rate_limiters[host] = TokenBucket(rate)
+        host_circuit_breakers[host] = HostCircuitBreaker(breaker_threshold, breaker_cooldown)
+
+def circuit_breaker_for(url):
+    """Returns the circuit breaker of the host a URL points at, or None."""
+    return host_circuit_breakers.get(urlparse(url).netloc)
+
+def http_get(url, stage=None, **kwargs):
+    """
+    Sends a GET request once the target host's circuit is closed and its token bucket
+    allows it, and reports the outcome to the host's circuit breaker. The request's
+    latency is recorded under `stage` and its body size under the host (streamed bodies
+    are counted by the caller as they are read).
+    """
+    host = urlparse(url).netloc
+    breaker = host_circuit_breakers.get(host)
+    if breaker:
+        while True:
+            wait_seconds = breaker.wait_seconds()
+            if wait_seconds <= 0:
+                break
+            with run_stats_lock:
+                run_stats['breaker_wait_seconds'] += wait_seconds
+            time.sleep(wait_seconds)
+    limiter = host_rate_limiters.get(host)
+    if limiter:
+        throttle_seconds = limiter.acquire()
+        if throttle_seconds:
+            with run_stats_lock:
+                run_stats['throttle_sleep_seconds'] += throttle_seconds
+    with run_stats_lock:
+        run_stats['requests'] += 1
+        run_stats['requests_by_host'][host] = run_stats['requests_by_host'].get(host, 0) + 1
+    request_start_time = time.perf_counter()
+    try:
+        response = requests.get(url, **kwargs)
+    except requests.exceptions.RequestException:
+        if breaker:
+            breaker.record_failure()
+        raise
+    finally:
+        if stage:
+            stage_metrics.observe(stage, time.perf_counter() - request_start_time)
+    if not kwargs.get('stream'):
+        record_downloaded_bytes(host, len(response.content))
+    status_key = f"{host} {response.status_code}"
+    with run_stats_lock:
+        run_stats['responses_by_host'][status_key] = run_stats['responses_by_host'].get(status_key, 0) + 1
+    if breaker:
+        if response.status_code == 429 or response.status_code >= 500:
+            breaker.record_failure(parse_retry_after(response))
+        else:
+            breaker.record_success()
+    return response
+
+# Writes of the cache stores are batched and committed together at this many pending writes or this often
+DEFAULT_CACHE_FLUSH_EVERY = 200
+DEFAULT_CACHE_FLUSH_INTERVAL_SECONDS = 5.0
+
+def connect_cache_db(db_path):
+    """
+    Opens the cache database in WAL mode with synchronous=NORMAL: a commit appends to the
+    write-ahead log without an fsync, and readers never block the writer. A crash can lose
+    the last commits but cannot corrupt the database, which only holds data that can be
+    fetched again.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class BufferedCacheWriter:
+    """
+    Write batching shared by the cache stores. A store keeps its pending writes in memory
+    and its write_pending() method puts them into the database in one transaction once
+    flush_every writes are pending or flush_interval_seconds has passed since the last
+    commit, and on flush() and close(). Reads check the pending writes first or flush
+    before querying. Subclasses set self.lock and self.conn and define write_pending().
+    """
+
+    def __init__(self, flush_every=DEFAULT_CACHE_FLUSH_EVERY, flush_interval_seconds=DEFAULT_CACHE_FLUSH_INTERVAL_SECONDS):
+        self.flush_every = max(1, flush_every)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.pending_writes = 0
+        self.last_flush_time = time.monotonic()
+
+    def note_write(self, count=1):
+        """Counts buffered writes (self.lock held) and commits the batch when it is due."""
+        self.pending_writes += count
+        if (self.pending_writes >= self.flush_every
+                or time.monotonic() - self.last_flush_time >= self.flush_interval_seconds):
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self.last_flush_time = time.monotonic()
+        if not self.pending_writes:
+            return
+        self.write_pending()
+        self.conn.commit()
+        self.pending_writes = 0
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def close(self):
+        with self.lock:
+            self._flush_locked()
+            self.conn.close()
+
+class ItemNameIdCache(BufferedCacheWriter):
+    """
+    Persistent market_hash_name -> item_nameid map backed by SQLite. A listing's
+    item_nameid never changes, so once known the listing page never has to be fetched again.
+    New entries are batched (see BufferedCacheWriter).
+    """
+
+    def __init__(self, db_path):
+        BufferedCacheWriter.__init__(self)
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.pending_nameids = {}  # market_hash_name -> (item_nameid, updated_at)
+        self.conn = connect_cache_db(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS item_nameids ("
+            "market_hash_name TEXT PRIMARY KEY, item_nameid TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, market_hash_name):
+        with self.lock:
+            if market_hash_name in self.pending_nameids:
+                return self.pending_nameids[market_hash_name][0]
+            row = self.conn.execute(
+                "SELECT item_nameid FROM item_nameids WHERE market_hash_name = ?", (market_hash_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, market_hash_name, item_nameid):
+        self.put_many([(market_hash_name, item_nameid)])
+
+    def put_many(self, entries):
+        """Queues (market_hash_name, item_nameid) pairs for the next batch and returns how many were given."""
+        now = time.time()
+        rows = [(name, str(nameid), now) for name, nameid in entries]
+        with self.lock:
+            for name, nameid, updated_at in rows:
+                self.pending_nameids[name] = (nameid, updated_at)
+            self.note_write(len(rows))
+        return len(rows)
+
+    def write_pending(self):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO item_nameids (market_hash_name, item_nameid, updated_at) VALUES (?, ?, ?)",
+            [(name, nameid, updated_at) for name, (nameid, updated_at) in self.pending_nameids.items()]
+        )
+        self.pending_nameids = {}
+
+    def __len__(self):
+        with self.lock:
+            self._flush_locked()
+            return self.conn.execute("SELECT COUNT(*) FROM item_nameids").fetchone()[0]
+
+# Opened in the main block; None disables the item_nameid cache
+item_nameid_cache_global = None
+
+DEFAULT_PAGE_CACHE_TTL_HOURS = 24
+DEFAULT_PAGE_CACHE_MAX_ENTRIES = 50000
+
+class GamePageCache(BufferedCacheWriter):
+    """
+    HTTP response cache for Steam Card Exchange game pages, keyed by URL and backed by SQLite.
+    Instead of the raw HTML it keeps the extracted (title, highest price, market URL,
+    background prices, emoticon count) tuple, so a hit or a 304 revalidation skips the HTML parse as well
+    as the download. Entries are served as-is within the TTL, revalidated with
+    If-None-Match/If-Modified-Since after it, and the least recently used entries are
+    evicted once max_entries is exceeded. Stores, hits and revalidations are batched
+    (see BufferedCacheWriter), and the entry count is kept in memory.
+    """
+
+    def __init__(self, db_path, ttl_seconds, max_entries=DEFAULT_PAGE_CACHE_MAX_ENTRIES):
+        BufferedCacheWriter.__init__(self)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+        self.pending_entries = {}  # url -> [etag, last_modified, extracted JSON, fetched_at, last_access]
+        self.pending_revalidations = {}  # url -> time of the 304
+        self.pending_accesses = {}  # url -> time of the hit
+        self.conn = connect_cache_db(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS game_page_cache ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, extracted TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS game_page_cache_last_access ON game_page_cache (last_access)")
+        self.conn.commit()
+        self.entry_count = self.conn.execute("SELECT COUNT(*) FROM game_page_cache").fetchone()[0]
+
+    def lookup(self, url):
+        """Returns the cached entry for url (with an is_fresh flag), or None."""
+        with self.lock:
+            if url in self.pending_entries:
+                row = self.pending_entries[url][:4]
+            else:
+                row = self.conn.execute(
+                    "SELECT etag, last_modified, extracted, fetched_at FROM game_page_cache WHERE url = ?", (url,)
+                ).fetchone()
+                if row and url in self.pending_revalidations:
+                    row = row[:3] + (self.pending_revalidations[url],)
+        if not row:
+            return None
+        etag, last_modified, extracted, fetched_at = row
+        extracted = json.loads(extracted)
+        if len(extracted) != 5:
+            # Written before background prices and emoticon counts were cached; fetch the page again in full
+            return None
+        game_title, highest_price, highest_price_market_url, background_prices, emoticon_count = extracted
+        return {
+            'etag': etag,
+            'last_modified': last_modified,
+            'extracted': (game_title, highest_price, highest_price_market_url, [tuple(item) for item in background_prices], emoticon_count),
+            'is_fresh': time.time() - fetched_at < self.ttl_seconds,
+        }
+
+    def record_hit(self, url):
+        now = time.time()
+        with self.lock:
+            self.stats['hits'] += 1
+            if url in self.pending_entries:
+                self.pending_entries[url][4] = now
+            else:
+                self.pending_accesses[url] = now
+            self.note_write()
+
+    def record_revalidation(self, url):
+        """Marks an entry as fresh again after the server answered 304 Not Modified."""
+        now = time.time()
+        with self.lock:
+            self.stats['revalidated'] += 1
+            if url in self.pending_entries:
+                self.pending_entries[url][3:5] = [now, now]
+            else:
+                self.pending_revalidations[url] = now
+                self.pending_accesses.pop(url, None)
+            self.note_write()
+
+    def store(self, url, etag, last_modified, extracted):
+        now = time.time()
+        with self.lock:
+            self.stats['stored'] += 1
+            self.pending_entries[url] = [etag, last_modified, json.dumps(list(extracted)), now, now]
+            self.pending_revalidations.pop(url, None)
+            self.pending_accesses.pop(url, None)
+            self.note_write()
+
+    def write_pending(self):
+        new_urls = sum(
+            1 for url in self.pending_entries
+            if self.conn.execute("SELECT 1 FROM game_page_cache WHERE url = ?", (url,)).fetchone() is None
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO game_page_cache (url, etag, last_modified, extracted, fetched_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(url, *entry) for url, entry in self.pending_entries.items()]
+        )
+        self.conn.executemany(
+            "UPDATE game_page_cache SET fetched_at = ?, last_access = ? WHERE url = ?",
+            [(revalidated_at, revalidated_at, url) for url, revalidated_at in self.pending_revalidations.items()]
+        )
+        self.conn.executemany(
+            "UPDATE game_page_cache SET last_access = ? WHERE url = ?",
+            [(accessed_at, url) for url, accessed_at in self.pending_accesses.items()]
+        )
+        self.pending_entries = {}
+        self.pending_revalidations = {}
+        self.pending_accesses = {}
+        self.entry_count += new_urls
+        if self.entry_count > self.max_entries:
+            evict_count = self.conn.execute(
+                "DELETE FROM game_page_cache WHERE url IN "
+                "(SELECT url FROM game_page_cache ORDER BY last_access ASC LIMIT ?)", (self.entry_count - self.max_entries,)
+            ).rowcount
+            self.entry_count -= evict_count
+            self.stats['evicted'] += evict_count
+
+# Opened in the main block; None disables the game page cache
+game_page_cache_global = None
+
+DEFAULT_RESCAN_TTL_HOURS = 24
+
+class GameStateStore(BufferedCacheWriter):
     """
-    Fetches the Steam Community Market page for a given item to extract the item_nameid,
-    then queries the Steam Market API for buy order details with infinite retry logic.
+    Per-AppID record of when a game was last checked and the badge and highest
+    background prices seen at that time, backed by SQLite. Used by --rescan to
+    refresh only games whose data may have changed. Checks are batched (see
+    BufferedCacheWriter); a crash loses at most the last batch, and those games are
+    simply checked again.
+    """
+
+    def __init__(self, db_path):
+        BufferedCacheWriter.__init__(self)
+        self.lock = threading.Lock()
+        self.pending_checks = {}  # appid -> game_state row
+        self.conn = connect_cache_db(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS game_state ("
+            "appid INTEGER PRIMARY KEY, last_checked REAL NOT NULL, "
+            "last_badge_price REAL, last_highest_bg_price REAL, "
+            "last_buy_order_price REAL, last_num_buyers INTEGER)"
+        )
+        existing_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(game_state)")}
+        for column, column_type in (('last_buy_order_price', 'REAL'), ('last_num_buyers', 'INTEGER')):
+            if column not in existing_columns:
+                # Databases created before buy orders were recorded
+                self.conn.execute(f"ALTER TABLE game_state ADD COLUMN {column} {column_type}")
+        self.conn.commit()
+
+    def load_all(self):
+        """Returns {appid: (last_checked, last_badge_price, last_highest_bg_price)} for every known game."""
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute(
+                "SELECT appid, last_checked, last_badge_price, last_highest_bg_price FROM game_state"
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def record_check(self, appid, badge_price, highest_bg_price, buy_order_price=None, num_buyers=None):
+        with self.lock:
+            self.pending_checks[appid] = (appid, time.time(), badge_price, highest_bg_price, buy_order_price, num_buyers)
+            self.note_write()
+
+    def write_pending(self):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO game_state (appid, last_checked, last_badge_price, last_highest_bg_price, "
+            "last_buy_order_price, last_num_buyers) VALUES (?, ?, ?, ?, ?, ?)",
+            list(self.pending_checks.values())
+        )
+        self.pending_checks = {}
+
+    def iter_rows(self):
+        """Yields (appid, badge price, highest background price, buy order price, buyers, last checked) for every game."""
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute(
+                "SELECT appid, last_badge_price, last_highest_bg_price, last_buy_order_price, last_num_buyers, last_checked FROM game_state"
+            ).fetchall()
+        return iter(rows)
+
+# Opened in the main block
+game_state_store_global = None
+
+def rescan_reason(game_info, state, ttl_seconds, now):
+    """Returns why a game should be re-fetched ('new', 'badge price changed' or 'stale'), or None to skip it."""
+    if state is None:
+        return 'new'
+    last_checked, last_badge_price, _ = state
+    if last_badge_price is None or abs(last_badge_price - game_info['badge_price']) >= 0.005:
+        return 'badge price changed'
+    if now - last_checked >= ttl_seconds:
+        return 'stale'
+    return None
+
+# --priority: a game's last known background/badge ratio loses half its weight against the
+# badge price band's prior every half-life, and each earlier alert raises its score
+DEFAULT_PRIORITY_HALF_LIFE_HOURS = 72
+PRIORITY_ALERT_BONUS = 0.25
+PRIORITY_MAX_ALERT_HITS = 4
+# Typical highest background price assumed before any game has been checked
+DEFAULT_PRIORITY_BACKGROUND_PRICE = 0.10
+PRIORITY_MIN_BAND_GAMES = 5
+# How many streamed games are held back so higher-priority ones can overtake them
+PRIORITY_LOOKAHEAD = 500
+# Points of the sweep (% of games checked) at which the share of alerts found is reported
+ALERT_DISCOVERY_CHECKPOINTS = (5, 10, 25, 50, 75, 100)
+
+def badge_price_band(badge_price):
+    """Groups badge prices into bands that double in width: ..., $0.16-0.32, $0.32-0.64, ..."""
+    return int(math.floor(math.log2(max(badge_price, 0.01) / 0.01)))
+
+def count_alerts_by_appid(journal_records):
+    """Returns {appid: number of alerts journaled for it}."""
+    alert_counts = {}
+    for record in journal_records:
+        if record.get('type') != 'alert':
+            continue
+        appid = alert_row_appid(record['row'])
+        if appid is not None:
+            alert_counts[appid] = alert_counts.get(appid, 0) + 1
+    return alert_counts
+
+class GamePriorityModel:
+    """
+    Scores games by their expected highest background price relative to the badge price,
+    so the games most likely to alert are checked first. A game never checked gets the
+    median background price of its badge price band divided by its badge price; a game
+    checked before blends its last known ratio (against today's badge price) with that
+    prior as the check ages, and earlier alerts raise the score further.
+    """
+
+    def __init__(self, game_states, alert_counts, half_life_seconds=DEFAULT_PRIORITY_HALF_LIFE_HOURS * 3600):
+        self.game_states = game_states
+        self.alert_counts = alert_counts
+        self.half_life_seconds = half_life_seconds
+        band_prices = {}
+        all_prices = []
+        for state in game_states.values():
+            _, last_badge_price, last_highest_bg_price = state[:3]
+            if last_badge_price is None or last_highest_bg_price is None:
+                continue
+            band_prices.setdefault(badge_price_band(last_badge_price), []).append(last_highest_bg_price)
+            all_prices.append(last_highest_bg_price)
+        self.default_background_price = statistics.median(all_prices) if all_prices else DEFAULT_PRIORITY_BACKGROUND_PRICE
+        self.band_background_prices = {
+            band: statistics.median(prices) for band, prices in band_prices.items() if len(prices) >= PRIORITY_MIN_BAND_GAMES
+        }
+
+    def score(self, game_info, now=None):
+        now = time.time() if now is None else now
+        badge_price = max(game_info['badge_price'], 0.01)
+        ratio = self.band_background_prices.get(badge_price_band(badge_price), self.default_background_price) / badge_price
+        state = self.game_states.get(game_info['appid'])
+        if state is not None and state[2] is not None:
+            weight = 0.5 ** (max(0.0, now - state[0]) / self.half_life_seconds) if self.half_life_seconds > 0 else 0.0
+            ratio = weight * (state[2] / badge_price) + (1 - weight) * ratio
+        alert_hits = min(self.alert_counts.get(game_info['appid'], 0), PRIORITY_MAX_ALERT_HITS)
+        return ratio * (1 + PRIORITY_ALERT_BONUS * alert_hits)
+
+def alert_discovery_curve(alert_positions, games_checked, checkpoints=ALERT_DISCOVERY_CHECKPOINTS):
+    """
+    Returns [(% of sweep, % of alerts found by then)] from the sweep positions (1-based
+    count of games checked) at which each alert was found.
+    """
+    if not alert_positions or not games_checked:
+        return []
+    curve = []
+    for sweep_percent in checkpoints:
+        games_done = games_checked * sweep_percent / 100
+        found = sum(1 for position in alert_positions if position <= games_done)
+        curve.append((sweep_percent, found / len(alert_positions) * 100))
+    return curve
+
+# (name, array typecode, numpy/Arrow type) of each GameTable column. Missing prices are
+# stored as NaN and missing buyer counts as -1 so every column stays a flat typed array.
+GAME_TABLE_COLUMNS = (
+    ('appid', 'I', 'uint32'),
+    ('badge_price', 'd', 'float64'),
+    ('highest_bg_price', 'd', 'float64'),
+    ('buy_order_price', 'd', 'float64'),
+    ('num_buyers', 'i', 'int32'),
+    ('last_checked', 'd', 'float64'),
+)
+
+class GameTable:
+    """
+    Columnar table of every checked game: one typed array per column instead of one dict
+    per game. Columns are numpy arrays when numpy is installed (alert evaluation is then a
+    handful of vectorized comparisons) and array.array otherwise.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds a table from (appid, badge price, highest background price, buy order price, buyers, last checked) tuples."""
+        arrays = {name: array(typecode) for name, typecode, _ in GAME_TABLE_COLUMNS}
+        appids, badge_prices, highest_prices, buy_order_prices, buyer_counts, checked_times = arrays.values()
+        for appid, badge_price, highest_bg_price, buy_order_price, num_buyers, last_checked in rows:
+            appids.append(appid)
+            badge_prices.append(badge_price if badge_price is not None else math.nan)
+            highest_prices.append(highest_bg_price if highest_bg_price is not None else math.nan)
+            buy_order_prices.append(buy_order_price if buy_order_price is not None else math.nan)
+            buyer_counts.append(num_buyers if num_buyers is not None else -1)
+            checked_times.append(last_checked if last_checked is not None else math.nan)
+        if numpy is not None:
+            # array.array's item sizes are platform-dependent, so convert rather than view the buffer
+            arrays = {name: numpy.asarray(arrays[name], dtype=dtype) for name, _, dtype in GAME_TABLE_COLUMNS}
+        return cls(arrays)
+
+    def __len__(self):
+        return len(self.columns['appid'])
+
+    def evaluate_alerts(self, min_margin=0.0, min_margin_pct=0.0, min_buyers=0):
+        """
+        Returns (alert flags, margins) over the whole table. A game alerts when its highest
+        background price beats the badge price, by at least min_margin dollars and at least
+        min_margin_pct percent, and has at least min_buyers buy orders (when min_buyers > 0).
+        """
+        badge_prices = self.columns['badge_price']
+        highest_prices = self.columns['highest_bg_price']
+        buyer_counts = self.columns['num_buyers']
+        if numpy is not None:
+            margins = highest_prices - badge_prices
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                margin_pcts = margins / badge_prices * 100
+            alert_flags = (margins > 0) & (margins >= min_margin) & (margin_pcts >= min_margin_pct)
+            if min_buyers > 0:
+                alert_flags &= buyer_counts >= min_buyers
+            return alert_flags, margins
+
+        margins = array('d', (highest - badge for highest, badge in zip(highest_prices, badge_prices)))
+        alert_flags = []
+        for margin, badge_price, num_buyers in zip(margins, badge_prices, buyer_counts):
+            margin_pct = margin / badge_price * 100 if badge_price else math.inf
+            alert_flags.append(margin > 0 and margin >= min_margin and margin_pct >= min_margin_pct
+                               and (min_buyers <= 0 or num_buyers >= min_buyers))
+        return alert_flags, margins
+
+    def alert_rows(self, alert_flags, margins):
+        """Returns the flagged games as dicts, largest margin first."""
+        indices = [index for index, flagged in enumerate(alert_flags) if flagged]
+        indices.sort(key=lambda index: margins[index], reverse=True)
+        rows = []
+        for index in indices:
+            row = {name: self.columns[name][index] for name, _, _ in GAME_TABLE_COLUMNS}
+            row = {name: (value.item() if hasattr(value, 'item') else value) for name, value in row.items()}
+            row['margin'] = round(float(margins[index]), 2)
+            rows.append(row)
+        return rows
+
+    def to_parquet(self, parquet_path, alert_flags, margins):
+        """Writes every game plus its margin and alert flag to a Parquet file (needs pyarrow)."""
+        arrow_columns = {}
+        for name, _, arrow_type in GAME_TABLE_COLUMNS:
+            values = self.columns[name]
+            if numpy is not None:
+                # Zero-copy for numeric columns; NaN prices and -1 buyer counts become nulls
+                if arrow_type == 'float64':
+                    arrow_columns[name] = pyarrow.array(values, from_pandas=True)
+                else:
+                    arrow_columns[name] = pyarrow.array(values, mask=values < 0 if name == 'num_buyers' else None)
+            elif arrow_type == 'float64':
+                arrow_columns[name] = pyarrow.array([None if math.isnan(value) else float(value) for value in values], type=pyarrow.float64())
+            elif name == 'num_buyers':
+                arrow_columns[name] = pyarrow.array([None if value < 0 else int(value) for value in values], type=pyarrow.int32())
+            else:
+                arrow_columns[name] = pyarrow.array([int(value) for value in values], type=pyarrow.uint32())
+        if numpy is not None:
+            arrow_columns['margin'] = pyarrow.array(margins, from_pandas=True)
+            arrow_columns['alert'] = pyarrow.array(alert_flags)
+        else:
+            arrow_columns['margin'] = pyarrow.array([None if math.isnan(value) else float(value) for value in margins], type=pyarrow.float64())
+            arrow_columns['alert'] = pyarrow.array([bool(flagged) for flagged in alert_flags], type=pyarrow.bool_())
+        table = pyarrow.table(arrow_columns)
+        table = table.replace_schema_metadata({'snapshot_at': str(time.time())})
+        temporary_path = parquet_path + '.tmp'
+        pyarrow.parquet.write_table(table, temporary_path, compression='zstd')
+        os.replace(temporary_path, parquet_path)
+
+def export_game_table(state_store, parquet_path, min_margin, min_margin_pct, min_buyers):
+    """Loads the game table from the state store, evaluates alerts, writes it to Parquet and returns (games, alerts)."""
+    game_table = GameTable.from_rows(state_store.iter_rows())
+    alert_flags, margins = game_table.evaluate_alerts(min_margin, min_margin_pct, min_buyers)
+    game_table.to_parquet(parquet_path, alert_flags, margins)
+    return len(game_table), sum(1 for flagged in alert_flags if flagged)
+
+DEFAULT_PRUNE_MARGIN = 0.5
+DEFAULT_PRUNE_REVALIDATE_RATE = 0.05
+DEFAULT_PRUNE_MAX_AGE_HOURS = 168
+
+class BackgroundPriceIndex(BufferedCacheWriter):
+    """
+    Persistent record of every background seen on SCE game pages, backed by SQLite: the
+    last price of each item and the lowest/highest price it has been listed at, plus a
+    per-AppID upper bound on the game's highest background price. An item's bound is its
+    last price plus the full range it has moved over, so --prune can tell which games
+    cannot plausibly beat their badge price without fetching their page. Game pages are
+    folded in batches (see BufferedCacheWriter).
+    """
+
+    def __init__(self, db_path):
+        BufferedCacheWriter.__init__(self)
+        self.lock = threading.Lock()
+        self.pending_games = []  # (appid, background_prices, recorded_at) in arrival order
+        self.conn = connect_cache_db(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS background_prices ("
+            "market_url TEXT PRIMARY KEY, appid INTEGER NOT NULL, last_price REAL NOT NULL, "
+            "min_price REAL NOT NULL, max_price REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS background_prices_appid ON background_prices (appid)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS background_price_bounds ("
+            "appid INTEGER PRIMARY KEY, price_bound REAL NOT NULL, item_count INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def record_game(self, appid, background_prices):
+        """Queues one game page's [(market URL, price)] list to be folded into the item ranges and the game's bound."""
+        with self.lock:
+            self.pending_games.append((appid, list(background_prices), time.time()))
+            self.note_write()
+
+    def write_pending(self):
+        for appid, background_prices, recorded_at in self.pending_games:
+            self.conn.executemany(
+                "INSERT INTO background_prices (market_url, appid, last_price, min_price, max_price, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(market_url) DO UPDATE SET "
+                "appid = excluded.appid, last_price = excluded.last_price, "
+                "min_price = MIN(min_price, excluded.min_price), max_price = MAX(max_price, excluded.max_price), "
+                "updated_at = excluded.updated_at",
+                [(market_url, appid, price, price, price, recorded_at) for market_url, price in background_prices if market_url]
+            )
+            # Backgrounds no longer listed on the page do not count towards the bound
+            self.conn.execute("DELETE FROM background_prices WHERE appid = ? AND updated_at < ?", (appid, recorded_at))
+            price_bound, item_count = self.conn.execute(
+                "SELECT COALESCE(MAX(last_price + max_price - min_price), 0), COUNT(*) FROM background_prices WHERE appid = ?", (appid,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO background_price_bounds (appid, price_bound, item_count, updated_at) VALUES (?, ?, ?, ?)",
+                (appid, price_bound, item_count, recorded_at)
+            )
+        self.pending_games = []
+
+    def load_bounds(self):
+        """Returns {appid: (price_bound, updated_at)} for every game with a recorded page."""
+        with self.lock:
+            self._flush_locked()
+            rows = self.conn.execute("SELECT appid, price_bound, updated_at FROM background_price_bounds").fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def __len__(self):
+        with self.lock:
+            self._flush_locked()
+            return self.conn.execute("SELECT COUNT(*) FROM background_prices").fetchone()[0]
+
+# Opened in the main block
+background_price_index_global = None
+
+def prune_decision(game_info, bound_entry, margin, revalidate_rate, max_age_seconds, now, rng=random):
+    """
+    Decides whether a game's page must be fetched given its entry in the background price
+    index. Returns 'prune' when the game's price bound, raised by the safety margin, is
+    still below the badge price; otherwise why it is checked ('unindexed', 'within bound',
+    'expired' or 'forced revalidation').
+    """
+    if bound_entry is None:
+        return 'unindexed'
+    price_bound, updated_at = bound_entry
+    if price_bound * (1 + margin) >= game_info['badge_price']:
+        return 'within bound'
+    if now - updated_at >= max_age_seconds:
+        return 'expired'
+    # A random share of pruned games is fetched anyway so a bound that went wrong gets corrected
+    if rng.random() < revalidate_rate:
+        return 'forced revalidation'
+    return 'prune'
+
+DEFAULT_SHARD_LEASE_MINUTES = 30
+
+def shard_for_appid(appid, shard_count):
+    """Stable AppID -> shard mapping (crc32, so every machine and Python process agrees)."""
+    return zlib.crc32(str(appid).encode('ascii')) % shard_count
+
+class ShardCheckpoint:
+    """
+    Transactional work queue shared by every worker of a sharded scan, backed by one SQLite
+    file. Each AppID is a work item assigned to a shard by hash. Workers claim items in
+    BEGIN IMMEDIATE transactions, so two workers can never claim the same pending item;
+    a claim whose lease expires (crashed worker) becomes claimable again. Finished items
+    store their alert row, keyed by AppID, so a game checked twice still merges once.
+    Once every item is done, the next worker to start seeds a new sweep with the games
+    that are new to the feed.
+
+    WAL mode only works when every worker runs on the same host. For workers on several
+    machines sharing a network volume, use journal_mode='delete', which relies on the
+    filesystem's locks instead of shared memory.
+    """
+
+    def __init__(self, db_path, journal_mode='wal'):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS work_items ("
+            "appid INTEGER PRIMARY KEY, game_title TEXT, badge_price REAL, shard INTEGER NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, claimed_at REAL, finished_at REAL, alert_row TEXT, "
+            "merged INTEGER NOT NULL DEFAULT 0)"
+        )
+        if 'merged' not in {row[1] for row in self.conn.execute("PRAGMA table_info(work_items)")}:
+            # Checkpoints created before results were merged into the journal
+            self.conn.execute("ALTER TABLE work_items ADD COLUMN merged INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS work_items_status_shard ON work_items (status, shard)")
+
+    def has_open_work(self):
+        """True while the current sweep has pending or claimed items."""
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM work_items WHERE status != 'done' LIMIT 1").fetchone() is not None
+
+    def seed(self, games, shard_count, skip_app_ids=()):
+        """
+        Starts a sweep: adds the games that are not in the checkpoint yet and not in
+        skip_app_ids as pending work, in one transaction, unless another worker already
+        started one. Returns the number of games added.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.conn.execute("SELECT 1 FROM work_items WHERE status != 'done' LIMIT 1").fetchone():
+                    self.conn.execute("COMMIT")
+                    return 0
+                changes_before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO work_items (appid, game_title, badge_price, shard) VALUES (?, ?, ?, ?)",
+                    [(game['appid'], game['game_title'], game['badge_price'], shard_for_appid(game['appid'], shard_count))
+                     for game in games if game['appid'] not in skip_app_ids]
+                )
+                self.conn.execute("COMMIT")
+                return self.conn.total_changes - changes_before
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker_id, shard_index, batch_size, lease_seconds, steal=True):
+        """
+        Claims up to batch_size items: pending or lease-expired items of this worker's shard first,
+        then (with steal) those of any shard. Returns a list of game_info dicts.
+        """
+        now = time.time()
+        expired_before = now - lease_seconds
+        claimable = "(status = 'pending' OR (status = 'claimed' AND claimed_at < ?))"
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    f"SELECT appid, game_title, badge_price FROM work_items WHERE shard = ? AND {claimable} LIMIT ?",
+                    (shard_index, expired_before, batch_size)
+                ).fetchall()
+                if not rows and steal:
+                    rows = self.conn.execute(
+                        f"SELECT appid, game_title, badge_price FROM work_items WHERE {claimable} LIMIT ?",
+                        (expired_before, batch_size)
+                    ).fetchall()
+                self.conn.executemany(
+                    "UPDATE work_items SET status = 'claimed', worker = ?, claimed_at = ? WHERE appid = ?",
+                    [(worker_id, now, row[0]) for row in rows]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [{'appid': row[0], 'game_title': row[1], 'badge_price': row[2]} for row in rows]
+
+    def complete(self, appid, alert_row):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE work_items SET status = 'done', finished_at = ?, alert_row = ? WHERE appid = ?",
+                (time.time(), json.dumps(alert_row) if alert_row else None, appid)
+            )
+
+    def progress(self):
+        """Returns {status: count} over all work items."""
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status").fetchall()
+        return dict(rows)
+
+    def unmerged_results(self):
+        """Returns [(appid, alert row or None)] for finished games not yet merged into the results journal."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT appid, alert_row FROM work_items WHERE status = 'done' AND merged = 0 ORDER BY finished_at, appid"
+            ).fetchall()
+        return [(row[0], json.loads(row[1]) if row[1] else None) for row in rows]
+
+    def mark_merged(self, app_ids):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("UPDATE work_items SET merged = 1 WHERE appid = ?", [(appid,) for appid in app_ids])
+            self.conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def merge_shard_results(checkpoint, journal):
+    """
+    Journals the games finished by shard workers since the last merge, as a normal scan
+    would: a processed record plus their alert (or a cleared record). The journal is
+    committed before the games are marked merged; merging a game twice after a crash
+    is harmless since the export keeps one row per AppID. Returns (games, alerts) merged.
+    """
+    results = checkpoint.unmerged_results()
+    alert_count = 0
+    for appid, alert_row in results:
+        journal.append(processed_record(appid))
+        if alert_row:
+            journal.append(alert_record(alert_row))
+            alert_count += 1
+        else:
+            journal.append(cleared_record(appid))
+    journal.flush()
+    checkpoint.mark_merged([appid for appid, _ in results])
+    return len(results), alert_count
+
+def market_hash_name_from_url(market_url):
+    """
+    Extracts the "<appid>/<market_hash_name>" key from a Steam Market listing URL such as
+    https://steamcommunity.com/market/listings/753/603750-A%20Deep%20Black
+    """
+    match = re.search(r'/market/listings/(\d+)/([^?#]+)', market_url or '')
+    if not match:
+        return None
+    return f"{match.group(1)}/{unquote(match.group(2))}"
+
+def import_item_nameids(cache, csv_path):
+    """
+    Bulk-loads item_nameids from a CSV with a header row containing an item_nameid column
+    and either a market_hash_name ("753/<name>") or a market_url column.
+    """
+    entries = []
+    with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            item_nameid = (row.get('item_nameid') or '').strip()
+            market_hash_name = (row.get('market_hash_name') or '').strip() or market_hash_name_from_url(row.get('market_url'))
+            if item_nameid.isdigit() and market_hash_name:
+                entries.append((market_hash_name, item_nameid))
+    return cache.put_many(entries)
+
+def warm_item_nameid_cache(cache, alert_csv_path):
+    """Resolves and caches the item_nameid of every market link in the alert CSV that is not cached yet."""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    # Keyed by URL so duplicate links are skipped in O(1) while the CSV order is kept
+    market_urls = {}
+    with open(alert_csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            market_url = row.get("highest background steam market link")
+            if market_url in market_urls:
+                continue
+            market_hash_name = market_hash_name_from_url(market_url)
+            if market_hash_name and not cache.get(market_hash_name):
+                market_urls[market_url] = market_hash_name
+
+    print(f"Warming item_nameid cache for {len(market_urls)} uncached market listings...")
+    for market_url in market_urls:
+        get_item_nameid(market_url, headers)
+    return len(market_urls)
+
+def get_item_nameid(market_url, headers):
+    """
+    Returns the Steam Market item_nameid for a listing URL. The persistent cache is
+    checked first; otherwise the listing page is fetched and scraped with infinite
+    retry logic, and the result is stored in the cache.
+    """
+    market_hash_name = market_hash_name_from_url(market_url)
+    if item_nameid_cache_global is not None and market_hash_name:
+        cached_item_nameid = item_nameid_cache_global.get(market_hash_name)
+        if cached_item_nameid:
+            return cached_item_nameid
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = http_get(rebase_steam_community_url(market_url), stage='listing_fetch', headers=headers, timeout=10)
+            response.raise_for_status()
+            
+            item_nameid_match = re.search(r'Market_LoadOrderSpread\( (\d+) \);', response.text)
+            if item_nameid_match:
+                item_nameid = item_nameid_match.group(1)
+                if item_nameid_cache_global is not None and market_hash_name:
+                    item_nameid_cache_global.put(market_hash_name, item_nameid)
+                return item_nameid
+            else:
+                retry_delay = backoff_delay(attempt)
+                print(f"Attempt {attempt}: Could not find item_nameid on Steam Market page {market_url}. Retrying in {retry_delay:.1f} seconds...")
+                retry_sleep(retry_delay)
+        except requests.exceptions.RequestException as e:
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Error accessing Steam Market page {market_url}: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
+        except Exception as e:
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Unexpected error during initial market page fetch: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
+
+def get_order_histogram(market_url):
+    """
+    Resolves the item_nameid for a Steam Community Market item (from the local cache
+    when possible), then returns its full itemordershistogram response (buy and sell
+    order graphs) with infinite retry logic. Responses younger than the order book
+    store's TTL are served from it without a request. Returns None if the listing
+    has no item_nameid.
     """
     if not market_url:
-        return None, None
+        return None
 
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
 
-    retry_delay_seconds = 10
+    item_nameid = get_item_nameid(market_url, headers)
+
+    if not item_nameid:
+        print(f"Failed to find item_nameid for {market_url} after multiple attempts.")
+        return None
+
+    if order_book_store_global is not None:
+        cached_histogram = order_book_store_global.get_fresh(item_nameid)
+        if cached_histogram is not None:
+            return cached_histogram
+
+    histogram_api_url = f"{STEAM_COMMUNITY_BASE_URL}/market/itemordershistogram?country=US&language=english&currency=1&item_nameid={item_nameid}"
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            api_response = http_get(histogram_api_url, stage='histogram_fetch', headers=headers, timeout=10)
+            api_response.raise_for_status()
+            json_data = api_response.json()
+
+            if json_data.get('success') == 1:
+                json_data['item_nameid'] = item_nameid
+                if order_book_store_global is not None:
+                    order_book_store_global.store(item_nameid, market_url, json_data)
+                return json_data
+            else:
+                retry_delay = backoff_delay(attempt)
+                print(f"Attempt {attempt}: Steam Market API response not successful for item_nameid {item_nameid}: {json_data.get('success')}. Retrying in {retry_delay:.1f} seconds...")
+                retry_sleep(retry_delay)
+        except requests.exceptions.RequestException as e:
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Error accessing Steam Market API for item_nameid {item_nameid}: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
+        except json.JSONDecodeError as e:
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Error decoding JSON from Steam Market API for item_nameid {item_nameid}: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
+        except Exception as e:
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Unexpected error during API fetch for item_nameid {item_nameid}: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
+
+def get_steam_market_buy_listings(market_url):
+    """
+    Returns (number of buy orders, highest buy order price) for a Steam Community Market
+    item, taken from its itemordershistogram response.
+    """
+    json_data = get_order_histogram(market_url)
+    if json_data is None:
+        print(f"Failed to retrieve buy listings for {market_url} after multiple attempts.")
+        return None, None
+
+    num_buyers = 0
+    buy_amount = 0.0
+
+    buy_amount_raw = json_data.get('highest_buy_order')
+    if buy_amount_raw:
+        try:
+            buy_amount = float(buy_amount_raw) / 100.0 
+        except ValueError:
+            print(f"Error parsing highest_buy_order amount: {buy_amount_raw}")
+            buy_amount = 0.0
+
+    buy_order_graph = json_data.get('buy_order_graph')
+    if buy_order_graph and isinstance(buy_order_graph, list):
+        if len(buy_order_graph) > 0:
+            num_buyers = int(buy_order_graph[-1][1]) 
+        else:
+            num_buyers = 0
+    else:
+        print(f"Buy order graph not found or is empty for item_nameid {json_data.get('item_nameid')}.")
+        num_buyers = 0
+
+    return num_buyers, buy_amount
+
+# Steam Community Market fees, charged on top of what the seller receives: each is
+# floor(seller proceeds * rate) with a minimum of one cent
+STEAM_TRANSACTION_FEE_RATE = 0.05
+STEAM_PUBLISHER_FEE_RATE = 0.10
+
+DEFAULT_HISTOGRAM_TTL_SECONDS = 300
+
+class OrderBookStore(BufferedCacheWriter):
+    """
+    Full itemordershistogram responses (buy and sell order graphs) keyed by item_nameid,
+    backed by SQLite. Entries younger than ttl_seconds are served by get_order_histogram
+    without a request; older ones can never be served again and are deleted on open.
+    Stores are batched (see BufferedCacheWriter).
+    """
+
+    def __init__(self, db_path, ttl_seconds=DEFAULT_HISTOGRAM_TTL_SECONDS):
+        BufferedCacheWriter.__init__(self)
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'stored': 0, 'expired': 0}
+        self.pending_books = {}  # item_nameid -> (market_url, histogram JSON, fetched_at)
+        self.conn = connect_cache_db(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS order_books ("
+            "item_nameid TEXT PRIMARY KEY, market_url TEXT, histogram TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS order_books_fetched_at ON order_books (fetched_at)")
+        self.stats['expired'] = self.conn.execute(
+            "DELETE FROM order_books WHERE fetched_at < ?", (time.time() - ttl_seconds,)
+        ).rowcount
+        self.conn.commit()
+
+    def get_fresh(self, item_nameid):
+        with self.lock:
+            if item_nameid in self.pending_books:
+                row = self.pending_books[item_nameid][1:]
+            else:
+                row = self.conn.execute(
+                    "SELECT histogram, fetched_at FROM order_books WHERE item_nameid = ?", (item_nameid,)
+                ).fetchone()
+            if not row or time.time() - row[1] >= self.ttl_seconds:
+                return None
+            self.stats['hits'] += 1
+        return json.loads(row[0])
+
+    def store(self, item_nameid, market_url, histogram):
+        with self.lock:
+            self.stats['stored'] += 1
+            self.pending_books[item_nameid] = (market_url, json.dumps(histogram), time.time())
+            self.note_write()
+
+    def write_pending(self):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO order_books (item_nameid, market_url, histogram, fetched_at) VALUES (?, ?, ?, ?)",
+            [(item_nameid, *book) for item_nameid, book in self.pending_books.items()]
+        )
+        self.pending_books = {}
+
+# Opened in the main block for every scan, shard worker and daemon; None (only when the
+# functions are used outside the script) fetches every histogram
+order_book_store_global = None
+
+def seller_proceeds_cents(buyer_prices_cents):
+    """
+    What the seller receives for sales at the given buyer prices (in cents), after the
+    Steam and publisher fees: the largest amount s with s + fees(s) <= buyer price.
+    Takes and returns a numpy array when numpy is installed, otherwise a list.
+    """
+    if numpy is not None:
+        buyer_prices = numpy.asarray(buyer_prices_cents, dtype=numpy.int64)
+        estimate = numpy.floor(buyer_prices / (1 + STEAM_TRANSACTION_FEE_RATE + STEAM_PUBLISHER_FEE_RATE)).astype(numpy.int64)
+        candidates = estimate[:, None] + numpy.array([-2, -1, 0, 1, 2])
+        fees = (numpy.maximum(1, numpy.floor(candidates * STEAM_TRANSACTION_FEE_RATE)) +
+                numpy.maximum(1, numpy.floor(candidates * STEAM_PUBLISHER_FEE_RATE)))
+        valid = (candidates > 0) & (candidates + fees <= buyer_prices[:, None])
+        return numpy.where(valid, candidates, 0).max(axis=1)
+
+    proceeds = []
+    for buyer_price in buyer_prices_cents:
+        seller_amount = int(buyer_price / (1 + STEAM_TRANSACTION_FEE_RATE + STEAM_PUBLISHER_FEE_RATE)) + 2
+        while seller_amount > 0 and (seller_amount + max(1, int(seller_amount * STEAM_TRANSACTION_FEE_RATE))
+                                     + max(1, int(seller_amount * STEAM_PUBLISHER_FEE_RATE))) > buyer_price:
+            seller_amount -= 1
+        proceeds.append(max(0, seller_amount))
+    return proceeds
+
+def sell_into_book(buy_order_graph, units):
+    """
+    Sells `units` (may be fractional, as an expected quantity) into a cumulative buy order
+    graph ([[price, cumulative quantity, label], ...], best price first) and returns
+    (net proceeds in dollars after fees, units filled).
+    """
+    if not buy_order_graph or units <= 0:
+        return 0.0, 0.0
+    prices_cents = [int(round(float(level[0]) * 100)) for level in buy_order_graph]
+    cumulative = [float(level[1]) for level in buy_order_graph]
+    net_cents = seller_proceeds_cents(prices_cents)
+    if numpy is not None:
+        cumulative = numpy.asarray(cumulative)
+        previous = numpy.concatenate(([0.0], cumulative[:-1]))
+        filled = numpy.clip(numpy.minimum(cumulative, units) - previous, 0, None)
+        return float((filled * net_cents).sum()) / 100, float(filled.sum())
+
+    proceeds_cents = 0.0
+    filled_total = 0.0
+    previous = 0.0
+    for level_cumulative, level_net_cents in zip(cumulative, net_cents):
+        filled = max(0.0, min(level_cumulative, units) - previous)
+        proceeds_cents += filled * level_net_cents
+        filled_total += filled
+        previous = level_cumulative
+    return proceeds_cents / 100, filled_total
+
+def evaluate_order_book_depth(badge_price, background_books, units, emoticon_count=0):
+    """
+    Realizable profit of crafting `units` badges of a game and selling the backgrounds
+    they drop into the current buy orders. Each badge drops one of the game's n
+    backgrounds or m emoticons at random, so units / (n + m) of each background is sold
+    into that background's book; the emoticons are not valued.
+    background_books is [(market_url, histogram or None)]. Returns a summary dict.
+    """
+    background_count = len(background_books)
+    item_count = background_count + emoticon_count
+    background_share = background_count / item_count if item_count else 0.0
+    expected_units = units / item_count if item_count else 0.0
+    proceeds = 0.0
+    filled = 0.0
+    thinnest_book = None
+    for market_url, histogram in background_books:
+        buy_order_graph = (histogram or {}).get('buy_order_graph') or []
+        book_proceeds, book_filled = sell_into_book(buy_order_graph, expected_units)
+        proceeds += book_proceeds
+        filled += book_filled
+        depth = float(buy_order_graph[-1][1]) if buy_order_graph else 0.0
+        if thinnest_book is None or depth < thinnest_book[1]:
+            thinnest_book = (market_url, depth)
+    return {
+        'units': units,
+        'backgrounds': background_count,
+        'emoticons': emoticon_count,
+        'background_share': round(background_share, 3),
+        'expected_proceeds': round(proceeds, 2),
+        'crafting_cost': round(units * badge_price, 2),
+        'realizable_profit': round(proceeds - units * badge_price, 2),
+        # Share of the backgrounds expected to drop that the books can absorb
+        'fill_ratio': round(filled / (units * background_share), 3) if units and background_share else 0.0,
+        'thinnest_book_url': thinnest_book[0] if thinnest_book else None,
+        'thinnest_book_depth': thinnest_book[1] if thinnest_book else 0.0,
+    }
+
+def analyze_game_depth(game_info, background_prices, emoticon_count, units):
+    """Fetches (or reuses) the order book of every background of an alerted game and evaluates selling into them."""
+    market_urls = list(dict.fromkeys(market_url for market_url, _ in background_prices if market_url))
+    background_books = [(market_url, get_order_histogram(market_url)) for market_url in market_urls]
+    return evaluate_order_book_depth(game_info['badge_price'], background_books, units, emoticon_count)
+
+# Units (badges crafted) the depth engine sells into the books; 0 disables it (set by --depth)
+depth_units_global = 0
+
+DEPTH_RANKING_CSV_HEADER = [
+    "game name", "app id", "badge price", "highest background price", "units",
+    "expected proceeds", "crafting cost", "realizable profit", "fill ratio",
+    "backgrounds", "emoticons", "thinnest book depth", "thinnest book link", "steam card exchange link"
+]
+
+def write_depth_ranking(ranked_alerts, csv_path):
+    """Writes (game_info, result) pairs of alerted games, best realizable profit first, to a CSV file."""
+    ranked_alerts = sorted(ranked_alerts, key=lambda entry: entry[1]['depth']['realizable_profit'], reverse=True)
+    temporary_path = csv_path + '.tmp'
+    with open(temporary_path, 'w', newline='', encoding='utf-8') as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow(DEPTH_RANKING_CSV_HEADER)
+        for game_info, result in ranked_alerts:
+            depth = result['depth']
+            csv_writer.writerow([
+                game_info['game_title'], game_info['appid'], f"${game_info['badge_price']:.2f}", f"${result['highest_bg_price']:.2f}",
+                depth['units'], f"${depth['expected_proceeds']:.2f}", f"${depth['crafting_cost']:.2f}", f"${depth['realizable_profit']:.2f}",
+                depth['fill_ratio'], depth['backgrounds'], depth['emoticons'], depth['thinnest_book_depth'], depth['thinnest_book_url'] or "N/A",
+                result['sce_game_page_url'],
+            ])
+    os.replace(temporary_path, csv_path)
+    return ranked_alerts
+
+def section_grid(header):
+    """The div.grid right after a section header (the next sibling element), or None."""
+    grid = header.find_next_sibling()
+    if grid is not None and grid.name == 'div' and 'grid' in (grid.get('class') or []):
+        return grid
+    return None
+
+def parse_game_page_bs4(html, appid):
+    """
+    Extracts the game title, the highest background price (with its Steam Market URL),
+    the [(market URL, price)] list of every background and the number of priced emoticons
+    from a Steam Card Exchange game page.
+    The list is None when the page has no Backgrounds grid at all (an error page or a
+    changed layout), as opposed to [] for a grid without prices. A section's grid is the
+    element right after its div.bg-gray-dark header; a later grid belongs to another section.
+    This full BeautifulSoup parse is the reference implementation the faster extractors
+    are checked against.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    game_title_element = soup.find('div', class_='gameTitle')
+    game_title = game_title_element.text.strip() if game_title_element else f"Game (AppID: {appid})"
+
+    highest_price = None
+    highest_price_market_url = None
+    background_prices = None
+    
+    backgrounds_link = soup.find('a', string=re.compile(r'Backgrounds'))
+    
+    if backgrounds_link:
+        parent_div_of_link = backgrounds_link.find_parent('div', class_='bg-gray-dark')
+        
+        if parent_div_of_link:
+            backgrounds_grid = section_grid(parent_div_of_link)
+            
+            if backgrounds_grid:
+                background_prices = []
+                price_links = backgrounds_grid.find_all('a', class_='btn-primary', string=re.compile(r'Price: \$\d+\.\d{2}'))
+                
+                for link in price_links:
+                    price_text = link.get_text(strip=True)
+                    prices_found = re.findall(r'\$(\d+\.\d{2})', price_text)
+                    
+                    for price_str in prices_found:
+                        try:
+                            price = float(price_str)
+                            background_prices.append((link.get('href'), price))
+                            if highest_price is None or price > highest_price:
+                                highest_price = price
+                                highest_price_market_url = link.get('href')
+                        except ValueError:
+                            continue
+            else:
+                pass
+        else:
+            pass
+    else:
+        pass
+
+    # A crafted badge drops either a background or an emoticon, so the depth analysis needs both counts
+    emoticon_count = 0
+    emoticons_link = soup.find('a', string=re.compile(r'Emoticons'))
+    if emoticons_link:
+        parent_div_of_link = emoticons_link.find_parent('div', class_='bg-gray-dark')
+        emoticons_grid = section_grid(parent_div_of_link) if parent_div_of_link else None
+        if emoticons_grid:
+            emoticon_count = len(emoticons_grid.find_all('a', class_='btn-primary', string=re.compile(r'Price: \$\d+\.\d{2}')))
+
+    return game_title, highest_price, highest_price_market_url, background_prices, emoticon_count
+
+BACKGROUNDS_LINK_PATTERN = re.compile(r'Backgrounds')
+EMOTICONS_LINK_PATTERN = re.compile(r'Emoticons')
+# Sections of a game page the extractors read, matched against the header link text
+PAGE_SECTION_PATTERNS = (('Backgrounds', BACKGROUNDS_LINK_PATTERN), ('Emoticons', EMOTICONS_LINK_PATTERN))
+PRICE_BUTTON_PATTERN = re.compile(r'Price: \$\d+\.\d{2}')
+PRICE_VALUE_PATTERN = re.compile(r'\$(\d+\.\d{2})')
+
+# Elements that never have a closing tag, so the streaming extractor must not push them on its stack
+HTML_VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'
+])
+
+def pick_highest_background_price(price_buttons):
+    """
+    Applies the reference price rules to (button text, href) pairs taken from the
+    Backgrounds grid and returns (highest_price, highest_price_market_url, background_prices).
+    price_buttons is None when no Backgrounds grid was found.
+    """
+    if price_buttons is None:
+        return None, None, None
+    highest_price = None
+    highest_price_market_url = None
+    background_prices = []
+    for button_text, href in price_buttons:
+        if button_text is None or not PRICE_BUTTON_PATTERN.search(button_text):
+            continue
+        for price_str in PRICE_VALUE_PATTERN.findall(button_text.strip()):
+            price = float(price_str)
+            background_prices.append((href, price))
+            if highest_price is None or price > highest_price:
+                highest_price = price
+                highest_price_market_url = href
+    return highest_price, highest_price_market_url, background_prices
+
+def count_price_buttons(price_buttons):
+    """Counts the (button text, href) pairs that carry a "Price: $x.xx" label."""
+    if not price_buttons:
+        return 0
+    return sum(1 for button_text, _ in price_buttons if button_text is not None and PRICE_BUTTON_PATTERN.search(button_text))
+
+class GamePageStreamExtractor(HTMLParser):
+    """
+    Single-pass tokenizer that pulls the title and the Backgrounds and Emoticons price buttons
+    out of an SCE game page without building a tree. It keeps only a stack of open elements,
+    which is enough to mirror the reference lookups: the first link naming a section, its
+    enclosing div.bg-gray-dark, and the element right after that div if it is a div.grid. Each stack entry also
+    tracks its child count and only string so BeautifulSoup's .string can be reproduced.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []  # [tag, classes, child_count, only_child_string] per open element
+        self.game_title = None
+        self.title_depth = None
+        self.title_parts = []
+        self.link_depth = None
+        self.link_href = None
+        self.link_is_button = False
+        self.sections_seen = set()
+        self.header_depth = None
+        self.header_section = None
+        self.sibling_depth = None
+        self.sibling_section = None
+        self.grid_depth = None
+        self.grid_section = None
+        self.grids_found = set()
+        self.section_buttons = {name: [] for name, _ in PAGE_SECTION_PATTERNS}
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        classes = frozenset((attributes.get('class') or '').split())
+
+        if self.stack:
+            # Counted here as the parent's child; its string is filled in when it closes
+            self.stack[-1][2] += 1
+            self.stack[-1][3] = None
+
+        if self.sibling_depth is not None and len(self.stack) == self.sibling_depth:
+            # Only the header's next sibling element can be its grid
+            if tag == 'div' and 'grid' in classes:
+                self.grid_depth = len(self.stack)
+                self.grid_section = self.sibling_section
+                self.grids_found.add(self.sibling_section)
+            self.sibling_depth = None
+
+        if tag == 'div' and self.game_title is None and self.title_depth is None and 'gameTitle' in classes:
+            self.title_depth = len(self.stack)
+
+        if tag == 'a':
+            self.link_depth = len(self.stack)
+            self.link_href = attributes.get('href')
+            self.link_is_button = self.grid_depth is not None and 'btn-primary' in classes
+
+        if tag in HTML_VOID_ELEMENTS:
+            return
+        self.stack.append([tag, classes, 0, None])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in HTML_VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        if self.title_depth is not None:
+            self.title_parts.append(data)
+        self.add_string_child(data)
+
+    def handle_comment(self, data):
+        self.add_string_child(data)
+
+    def add_string_child(self, text):
+        if self.stack:
+            self.stack[-1][2] += 1
+            self.stack[-1][3] = text
+
+    def handle_endtag(self, tag):
+        if tag in HTML_VOID_ELEMENTS:
+            return
+        # Like html.parser's tree builder, a stray end tag closes up to its nearest open match
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self.stack) > index:
+            self.close_element()
+
+    def close_element(self):
+        tag, classes, child_count, only_child_string = self.stack.pop()
+        depth = len(self.stack)
+
+        # .string semantics: an element with exactly one child takes that child's string
+        element_string = only_child_string if child_count == 1 else None
+        if self.stack:
+            self.stack[-1][3] = element_string
+
+        if depth == self.link_depth:
+            link_string = element_string
+            if self.link_is_button:
+                self.section_buttons[self.grid_section].append((link_string, self.link_href))
+            elif link_string is not None:
+                for section_name, section_pattern in PAGE_SECTION_PATTERNS:
+                    if section_name in self.sections_seen or not section_pattern.search(link_string):
+                        continue
+                    self.sections_seen.add(section_name)
+                    for ancestor_depth in range(depth - 1, -1, -1):
+                        ancestor_tag, ancestor_classes = self.stack[ancestor_depth][:2]
+                        if ancestor_tag == 'div' and 'bg-gray-dark' in ancestor_classes:
+                            self.header_depth = ancestor_depth
+                            self.header_section = section_name
+                            break
+                    break
+            self.link_depth = None
+
+        if depth == self.title_depth:
+            self.game_title = ''.join(self.title_parts).strip()
+            self.title_depth = None
+
+        if depth == self.header_depth:
+            self.header_depth = None
+            self.sibling_depth = depth
+            self.sibling_section = self.header_section
+        elif self.sibling_depth is not None and depth < self.sibling_depth:
+            # The header's parent closed without a grid sibling
+            self.sibling_depth = None
+
+        if depth == self.grid_depth:
+            self.grid_depth = None
+            self.grid_section = None
+
+def parse_game_page_stream(html, appid):
+    """Streaming-tokenizer extractor; returns the same tuple as parse_game_page_bs4."""
+    extractor = GamePageStreamExtractor()
+    extractor.feed(html)
+    extractor.close()
+    game_title = extractor.game_title if extractor.game_title is not None else f"Game (AppID: {appid})"
+    price_buttons = extractor.section_buttons['Backgrounds'] if 'Backgrounds' in extractor.grids_found else None
+    highest_price, highest_price_market_url, background_prices = pick_highest_background_price(price_buttons)
+    emoticon_count = count_price_buttons(extractor.section_buttons['Emoticons'])
+    return game_title, highest_price, highest_price_market_url, background_prices, emoticon_count
+
+def parse_game_page_lxml(html, appid):
+    """lxml extractor that walks only the nodes the reference lookups touch; returns the same tuple as parse_game_page_bs4."""
+    document = lxml.html.fromstring(html)
+
+    title_elements = document.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' gameTitle ')]")
+    game_title = title_elements[0].text_content().strip() if title_elements else f"Game (AppID: {appid})"
+
+    def has_class(element, class_name):
+        return class_name in (element.get('class') or '').split()
+
+    def element_string(element):
+        # BeautifulSoup's .string: the text of an element whose only child is a string,
+        # or (recursively) the string of its only child element
+        if len(element) == 0:
+            return element.text
+        if len(element) == 1 and not element.text and not element[0].tail:
+            return element_string(element[0])
+        return None
 
-    item_nameid = None
-    attempt = 0
-    while True:
-        attempt += 1
-        try:
-            response = requests.get(market_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            item_nameid_match = re.search(r'Market_LoadOrderSpread\( (\d+) \);', response.text)
-            if item_nameid_match:
-                item_nameid = item_nameid_match.group(1)
-                break
-            else:
-                print(f"Attempt {attempt}: Could not find item_nameid on Steam Market page {market_url}. Retrying in {retry_delay_seconds * attempt} seconds...")
-                time.sleep(retry_delay_seconds * attempt)
-        except requests.exceptions.RequestException as e:
-            print(f"Attempt {attempt}: Error accessing Steam Market page {market_url}: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-            time.sleep(retry_delay_seconds * attempt)
-        except Exception as e:
-            print(f"Attempt {attempt}: Unexpected error during initial market page fetch: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-            time.sleep(retry_delay_seconds * attempt)
+    def section_buttons(link_pattern):
+        # (button text, href) pairs of the grid after the first link matching link_pattern, None without a grid
+        for link in document.iter('a'):
+            link_string = element_string(link)
+            if link_string is None or not link_pattern.search(link_string):
+                continue
+            header = next((div for div in link.iterancestors('div') if has_class(div, 'bg-gray-dark')), None)
+            if header is None:
+                return None
+            # The next sibling element (comments are skipped) is the grid, or the section has none
+            grid = next((sibling for sibling in header.itersiblings() if isinstance(sibling.tag, str)), None)
+            if grid is None or grid.tag != 'div' or not has_class(grid, 'grid'):
+                return None
+            return [(element_string(button), button.get('href')) for button in grid.iter('a') if has_class(button, 'btn-primary')]
+        return None
 
-    if not item_nameid:
-        print(f"Failed to find item_nameid for {market_url} after multiple attempts.")
-        return None, None
+    price_buttons = section_buttons(BACKGROUNDS_LINK_PATTERN)
+    highest_price, highest_price_market_url, background_prices = pick_highest_background_price(price_buttons)
+    emoticon_count = count_price_buttons(section_buttons(EMOTICONS_LINK_PATTERN))
+    return game_title, highest_price, highest_price_market_url, background_prices, emoticon_count
 
-    if item_nameid:
-        histogram_api_url = f"https://steamcommunity.com/market/itemordershistogram?country=US&language=english&currency=1&item_nameid={item_nameid}"
-        
-        attempt = 0
-        while True:
-            attempt += 1
-            try:
-                api_response = requests.get(histogram_api_url, headers=headers, timeout=10)
-                api_response.raise_for_status()
-                json_data = api_response.json()
+# Selectable with --html-extractor; lxml is only offered when it is installed
+HTML_EXTRACTORS = {
+    'bs4': parse_game_page_bs4,
+    'stream': parse_game_page_stream,
+}
+if lxml is not None:
+    HTML_EXTRACTORS['lxml'] = parse_game_page_lxml
 
-                num_buyers = 0
-                buy_amount = 0.0
+html_extractor_global = 'bs4'
 
-                if json_data.get('success') == 1:
-                    buy_amount_raw = json_data.get('highest_buy_order')
-                    if buy_amount_raw:
-                        try:
-                            buy_amount = float(buy_amount_raw) / 100.0 
-                        except ValueError:
-                            print(f"Error parsing highest_buy_order amount: {buy_amount_raw}")
-                            buy_amount = 0.0
-
-                    buy_order_graph = json_data.get('buy_order_graph')
-                    if buy_order_graph and isinstance(buy_order_graph, list):
-                        if len(buy_order_graph) > 0:
-                            num_buyers = int(buy_order_graph[-1][1]) 
-                        else:
-                            num_buyers = 0
-                    else:
-                        print(f"Buy order graph not found or is empty for item_nameid {item_nameid}.")
-                        num_buyers = 0
-
-                    return num_buyers, buy_amount
-                else:
-                    print(f"Attempt {attempt}: Steam Market API response not successful for item_nameid {item_nameid}: {json_data.get('success')}. Retrying in {retry_delay_seconds * attempt} seconds...")
-                    time.sleep(retry_delay_seconds * attempt)
-            except requests.exceptions.RequestException as e:
-                print(f"Attempt {attempt}: Error accessing Steam Market API for item_nameid {item_nameid}: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-                time.sleep(retry_delay_seconds * attempt)
-            except json.JSONDecodeError as e:
-                print(f"Attempt {attempt}: Error decoding JSON from Steam Market API for item_nameid {item_nameid}: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-                time.sleep(retry_delay_seconds * attempt)
-            except Exception as e:
-                print(f"Attempt {attempt}: Unexpected error during API fetch for item_nameid {item_nameid}: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-                time.sleep(retry_delay_seconds * attempt)
-    
-    print(f"Failed to retrieve buy listings for {market_url} after multiple attempts.")
-    return None, None
+def parse_game_page(html, appid):
+    """Extracts (game title, highest background price, market URL, background prices, emoticon count) with the selected extractor."""
+    return HTML_EXTRACTORS[html_extractor_global](html, appid)
 
-def get_highest_background_price(appid):
+def get_highest_background_price(appid, revalidate=False):
     """
     Fetches the background prices for a given Steam AppID from Steam Card Exchange
-    and returns the highest price found along with its Steam Market URL and the SCE game page URL.
+    and returns the highest price found along with its Steam Market URL, the SCE game page URL,
+    the [(market URL, price)] list of every background on the page and its number of emoticons.
+    Pages in the local page cache are served without a request while fresh, and
+    revalidated with a conditional request once their TTL has expired. With revalidate
+    (a game re-checked because its last check is stale) the conditional request is sent
+    even within the TTL. A page without a Backgrounds grid is returned with
+    background_prices None and is not cached.
     """
     if not isinstance(appid, int):
-        return None, None, None, None
+        return None, None, None, None, [], 0
 
-    url = f"https://www.steamcardexchange.net/index.php?gamepage-appid-{appid}"
+    url = f"{SCE_BASE_URL}/index.php?gamepage-appid-{appid}"
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
 
-    retry_delay_seconds = 10
+    cached_entry = game_page_cache_global.lookup(url) if game_page_cache_global is not None else None
+    if cached_entry:
+        if cached_entry['is_fresh'] and not revalidate:
+            game_page_cache_global.record_hit(url)
+            game_title, highest_price, highest_price_market_url, background_prices, emoticon_count = cached_entry['extracted']
+            return highest_price, game_title, highest_price_market_url, url, background_prices, emoticon_count
+        if cached_entry['etag']:
+            headers['If-None-Match'] = cached_entry['etag']
+        if cached_entry['last_modified']:
+            headers['If-Modified-Since'] = cached_entry['last_modified']
 
     attempt = 0
     while True:
         attempt += 1
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = http_get(url, stage='game_page_fetch', headers=headers, timeout=10)
             response.raise_for_status()
             break
         except requests.exceptions.RequestException as e:
-            print(f"Attempt {attempt}: Error accessing page for AppID {appid}: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-            time.sleep(retry_delay_seconds * attempt)
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Error accessing page for AppID {appid}: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
         except Exception as e:
-            print(f"Attempt {attempt}: Unexpected error during game page fetch for AppID {appid}: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-            time.sleep(retry_delay_seconds * attempt)
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    game_title_element = soup.find('div', class_='gameTitle')
-    game_title = game_title_element.text.strip() if game_title_element else f"Game (AppID: {appid})"
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Unexpected error during game page fetch for AppID {appid}: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
 
-    highest_price = None
-    highest_price_market_url = None
-    
-    backgrounds_link = soup.find('a', string=re.compile(r'Backgrounds'))
-    
-    if backgrounds_link:
-        parent_div_of_link = backgrounds_link.find_parent('div', class_='bg-gray-dark')
-        
-        if parent_div_of_link:
-            backgrounds_grid = parent_div_of_link.find_next_sibling('div', class_='grid')
-            
-            if backgrounds_grid:
-                price_links = backgrounds_grid.find_all('a', class_='btn-primary', string=re.compile(r'Price: \$\d+\.\d{2}'))
-                
-                for link in price_links:
-                    price_text = link.get_text(strip=True)
-                    prices_found = re.findall(r'\$(\d+\.\d{2})', price_text)
-                    
-                    for price_str in prices_found:
-                        try:
-                            price = float(price_str)
-                            if highest_price is None or price > highest_price:
-                                highest_price = price
-                                highest_price_market_url = link.get('href')
-                        except ValueError:
-                            continue
-            else:
-                pass
-        else:
-            pass
+    if response.status_code == 304 and cached_entry:
+        game_page_cache_global.record_revalidation(url)
+        game_title, highest_price, highest_price_market_url, background_prices, emoticon_count = cached_entry['extracted']
     else:
-        pass
+        with stage_metrics.timer('html_parse'):
+            game_title, highest_price, highest_price_market_url, background_prices, emoticon_count = parse_game_page(response.text, appid)
+        if game_page_cache_global is not None and background_prices is not None:
+            game_page_cache_global.store(
+                url,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                (game_title, highest_price, highest_price_market_url, background_prices, emoticon_count),
+            )
 
     if highest_price is not None:
-        return highest_price, game_title, highest_price_market_url, url
+        return highest_price, game_title, highest_price_market_url, url, background_prices, emoticon_count
     else:
-        return None, game_title, None, url
+        return None, game_title, None, url, background_prices, emoticon_count
 
 def get_games_from_badgeprices_table(url="https://www.steamcardexchange.net/index.php?badgeprices"):
     """
     Retrieves game data (AppID, title, and badge price) directly from the
     Steam Card Exchange API endpoint that feeds the badge pricelist table with retry logic.
     """
-    api_url = "https://www.steamcardexchange.net/api/request.php?GetBadgePrices_Guest"
+    api_url = f"{SCE_BASE_URL}/api/request.php?GetBadgePrices_Guest"
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'application/json'
     }
     games_data = []
 
-    retry_delay_seconds = 10
-
     attempt = 0
     while True:
         attempt += 1
         try:
-            response = requests.get(api_url, headers=headers, timeout=15)
+            response = http_get(api_url, stage='badge_feed_fetch', headers=headers, timeout=15)
             response.raise_for_status()
             json_data = response.json()
 
             if 'data' in json_data and isinstance(json_data['data'], list):
                 for row in json_data['data']:
-                    if len(row) >= 3 and isinstance(row[0], list) and len(row[0]) >= 2:
-                        game_appid = int(row[0][0])
-                        game_title = row[0][1]
-                        badge_price_str = row[2] 
-
-                        try:
-                            badge_price = float(badge_price_str.replace('$', ''))
-                            games_data.append({
-                                'game_title': game_title,
-                                'appid': game_appid,
-                                'badge_price': badge_price
-                            })
-                        except ValueError:
-                            continue
-                    else:
-                        pass
+                    game_info = parse_badge_price_row(row)
+                    if game_info:
+                        games_data.append(game_info)
                 break
             else:
-                print(f"Attempt {attempt}: API response 'data' key not found or is not a list. Retrying in {retry_delay_seconds * attempt} seconds...")
-                time.sleep(retry_delay_seconds * attempt)
+                retry_delay = backoff_delay(attempt)
+                print(f"Attempt {attempt}: API response 'data' key not found or is not a list. Retrying in {retry_delay:.1f} seconds...")
+                retry_sleep(retry_delay)
         except requests.exceptions.RequestException as e:
-            print(f"Attempt {attempt}: Error accessing the badge prices API: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-            time.sleep(retry_delay_seconds * attempt)
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Error accessing the badge prices API: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
         except json.JSONDecodeError as e:
-            print(f"Attempt {attempt}: Error decoding JSON from API response: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-            time.sleep(retry_delay_seconds * attempt)
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Error decoding JSON from API response: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
         except Exception as e:
-            print(f"Attempt {attempt}: Unexpected error during badge prices API fetch: {e}. Retrying in {retry_delay_seconds * attempt} seconds...")
-            time.sleep(retry_delay_seconds * attempt)
+            retry_delay = backoff_delay(attempt, e)
+            print(f"Attempt {attempt}: Unexpected error during badge prices API fetch: {e}. Retrying in {retry_delay:.1f} seconds...")
+            retry_sleep(retry_delay)
     
     return games_data
 
-# --- Main execution block ---
-if __name__ == "__main__":
-    print("--- Starting to scrape game list from badge prices table ---")
-    
-    # The drive_folder is already set to '.' or a specific path above based on IS_COLAB.
-    # os.makedirs(drive_folder, exist_ok=True) is already called above.
+def parse_badge_price_row(row):
+    """Turns one `data` row of the GetBadgePrices_Guest response into a game_info dict, or None if it is malformed."""
+    if len(row) >= 3 and isinstance(row[0], list) and len(row[0]) >= 2:
+        try:
+            return {
+                'game_title': row[0][1],
+                'appid': int(row[0][0]),
+                'badge_price': float(row[2].replace('$', ''))
+            }
+        except (ValueError, TypeError, AttributeError):
+            return None
+    return None
+
+class BadgeFeedRowParser:
+    """
+    Incremental parser for the GetBadgePrices_Guest JSON. Text is fed as it arrives and
+    every complete element of the top-level `data` array is returned as soon as its
+    closing bracket has been received, so only one partial row is ever buffered.
+    """
+
+    DATA_KEY_PATTERN = re.compile(r'"data"\s*:\s*\[')
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.in_data = False
+        self.finished = False
+
+    def feed(self, text):
+        """Adds text and returns the list of rows completed by it."""
+        rows = []
+        if self.finished:
+            return rows
+        self.buffer += text
+        position = 0
+        if not self.in_data:
+            match = self.DATA_KEY_PATTERN.search(self.buffer)
+            if not match:
+                # Keep a tail in case the key is split across chunks
+                self.buffer = self.buffer[-16:]
+                return rows
+            self.in_data = True
+            position = match.end()
+
+        buffer_length = len(self.buffer)
+        while True:
+            while position < buffer_length and self.buffer[position] in ' \t\r\n,':
+                position += 1
+            if position >= buffer_length:
+                break
+            if self.buffer[position] == ']':
+                self.finished = True
+                break
+            try:
+                row, position = self.decoder.raw_decode(self.buffer, position)
+            except json.JSONDecodeError:
+                # The row is not complete yet; wait for more text
+                break
+            rows.append(row)
+        self.buffer = self.buffer[position:]
+        return rows
+
+    def close(self):
+        """Raises if the stream ended before the `data` array was closed."""
+        if not self.finished:
+            raise json.JSONDecodeError("Badge price feed ended before the 'data' array was complete", self.buffer[:100], 0)
+
+DEFAULT_FEED_QUEUE_SIZE = 1000
+
+def stream_games_from_badgeprices_table(queue_size=DEFAULT_FEED_QUEUE_SIZE):
+    """
+    Streaming version of get_games_from_badgeprices_table: yields game_info dicts while the
+    feed is still downloading. A background thread parses rows as bytes arrive and hands
+    them over through a bounded queue, so memory stays flat however large the feed is and
+    scraping can start on the first rows. A failed download is retried from the start,
+    skipping games that were already yielded.
+    """
+    api_url = f"{SCE_BASE_URL}/api/request.php?GetBadgePrices_Guest"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'application/json'
+    }
+    game_queue = queue.Queue(maxsize=queue_size)
+    end_of_feed = object()
+
+    def produce():
+        yielded_app_ids = set()
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                try:
+                    # Recorded as time to the response headers; the body is consumed while scanning
+                    response = http_get(api_url, stage='badge_feed_fetch', headers=headers, timeout=15, stream=True)
+                    response.raise_for_status()
+                    parser = BadgeFeedRowParser()
+                    text_decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+                    feed_host = urlparse(api_url).netloc
+                    for chunk in response.iter_content(chunk_size=16384):
+                        record_downloaded_bytes(feed_host, len(chunk))
+                        for row in parser.feed(text_decoder.decode(chunk)):
+                            game_info = parse_badge_price_row(row)
+                            if game_info and game_info['appid'] not in yielded_app_ids:
+                                yielded_app_ids.add(game_info['appid'])
+                                game_queue.put(game_info)
+                    parser.feed(text_decoder.decode(b'', final=True))
+                    parser.close()
+                    return
+                except requests.exceptions.RequestException as e:
+                    retry_delay = backoff_delay(attempt, e)
+                    print(f"Attempt {attempt}: Error streaming the badge prices API: {e}. Retrying in {retry_delay:.1f} seconds...")
+                    retry_sleep(retry_delay)
+                except json.JSONDecodeError as e:
+                    retry_delay = backoff_delay(attempt, e)
+                    print(f"Attempt {attempt}: Error decoding streamed JSON from API response: {e}. Retrying in {retry_delay:.1f} seconds...")
+                    retry_sleep(retry_delay)
+                except Exception as e:
+                    retry_delay = backoff_delay(attempt, e)
+                    print(f"Attempt {attempt}: Unexpected error while streaming badge prices API: {e}. Retrying in {retry_delay:.1f} seconds...")
+                    retry_sleep(retry_delay)
+        finally:
+            game_queue.put(end_of_feed)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        game_info = game_queue.get()
+        if game_info is end_of_feed:
+            return
+        yield game_info
+
 
-    # Load already processed app IDs from the comprehensive log file
+def load_processed_app_ids(all_processed_games_path):
+    """Loads the set of AppIDs already logged in the comprehensive processed games CSV."""
     processed_app_ids = set()
-    all_processed_file_exists = os.path.exists(all_processed_games_file)
-    if all_processed_file_exists:
-        print(f"Loading previously processed game IDs from '{all_processed_games_file}'...")
+    print(f"Loading previously processed game IDs from '{all_processed_games_path}'...")
+    try:
+        with open(all_processed_games_path, 'r', newline='', encoding='utf-8') as csvfile:
+            csv_reader = csv.reader(csvfile)
+            header = next(csv_reader, None)
+            if header and "AppID" in header:
+                app_id_col_index = header.index("AppID")
+                for row in csv_reader:
+                    if len(row) > app_id_col_index:
+                        try:
+                            processed_app_ids.add(int(row[app_id_col_index]))
+                        except ValueError:
+                            continue
+            else:
+                print(f"Warning: '{all_processed_games_path}' is missing 'AppID' header or is empty. Cannot skip previously processed games efficiently.")
+        print(f"Loaded {len(processed_app_ids)} previously processed game IDs.")
+    except Exception as e:
+        print(f"Error loading existing comprehensive processed games CSV: {e}. Starting with an empty list of processed games.")
+        processed_app_ids = set()
+    return processed_app_ids
+
+def check_game(game_info):
+    """
+    Scrapes the SCE game page for one game and, when its highest background price beats
+    the badge price, looks up the Steam Market buy orders for that background.
+    Performs network I/O only, so it is safe to run from worker threads.
+    """
+    highest_bg_price, game_title_page, highest_bg_market_url, sce_game_page_url, background_prices, emoticon_count = get_highest_background_price(
+        game_info['appid'], revalidate=game_info.get('revalidate_page', False))
+
+    result = {
+        'highest_bg_price': highest_bg_price,
+        'background_prices': background_prices,
+        'emoticon_count': emoticon_count,
+        'game_title_page': game_title_page,
+        'highest_bg_market_url': highest_bg_market_url,
+        'sce_game_page_url': sce_game_page_url,
+        'is_alert': highest_bg_price is not None and highest_bg_price > game_info['badge_price'],
+        'num_buyers': None,
+        'buy_amount': None,
+        'depth': None,
+    }
+
+    if result['is_alert'] and highest_bg_market_url:
+        breaker = circuit_breaker_for(STEAM_COMMUNITY_BASE_URL)
+        if breaker is not None and breaker.is_open():
+            # Steam is throttling us: keep the workers on SCE pages and look this up once it recovers
+            result['market_lookup_deferred'] = True
+            with run_stats_lock:
+                run_stats['deferred_market_lookups'] += 1
+        else:
+            complete_market_lookup(game_info, result)
+
+    return result
+
+def complete_market_lookup(game_info, result):
+    """Fetches the Steam Market buy orders (and, with --depth, every background's order book) for an alerted game."""
+    result['num_buyers'], result['buy_amount'] = get_steam_market_buy_listings(result['highest_bg_market_url'])
+    if depth_units_global > 0:
+        result['depth'] = analyze_game_depth(game_info, result['background_prices'], result['emoticon_count'], depth_units_global)
+    result['market_lookup_deferred'] = False
+    return result
+
+def print_alert(game_info, result):
+    """Prints the alert for a checked game and returns its alert CSV row, or None if it is not an alert."""
+    if not result['is_alert']:
+        return None
+
+    with run_stats_lock:
+        run_stats['alerts'] += 1
+        if run_stats['time_to_first_alert_seconds'] is None:
+            run_stats['time_to_first_alert_seconds'] = time.monotonic() - run_start_time
+
+    game_title_list = game_info['game_title']
+    appid_list = game_info['appid']
+    badge_price_list = game_info['badge_price']
+    highest_bg_price = result['highest_bg_price']
+    game_title_page = result['game_title_page']
+    highest_bg_market_url = result['highest_bg_market_url']
+    num_buyers = result['num_buyers']
+    buy_amount = result['buy_amount']
+    buy_order_price = None
+
+    print(f"\nChecking '{game_title_list}' (AppID: {appid_list}, List Price: ${badge_price_list:.2f})...")
+    print(f"  Highest background price found on game page: ${highest_bg_price:.2f}")
+    print(f"  >>> ALERT: Highest background price (${highest_bg_price:.2f}) for '{game_title_page}' is HIGHER than its List Price (${badge_price_list:.2f}) from the table!")
+    if highest_bg_market_url:
+        print(f"    Fetching Steam Market buy listings for: {highest_bg_market_url}")
+        if num_buyers is not None and buy_amount is not None:
+            buy_order_price = buy_amount
+            print(f"    Steam Market Buy Orders: {num_buyers} requests to buy at ${buy_amount:.2f} or lower.")
+        else:
+            print("    Could not retrieve Steam Market buy order details.")
+        depth = result.get('depth')
+        if depth:
+            print(f"    Order book depth: crafting {depth['units']} badges (${depth['crafting_cost']:.2f}) and selling the drops into the buy orders "
+                  f"nets ${depth['expected_proceeds']:.2f} after fees, realizable profit ${depth['realizable_profit']:.2f} "
+                  f"({depth['fill_ratio'] * 100:.0f}% filled, thinnest book {depth['thinnest_book_depth']:.0f} orders).")
+    else:
+        print("    No Steam Market URL found for this background.")
+    print("-" * 70)
+
+    return [
+        game_title_list,
+        appid_list,
+        f"${badge_price_list:.2f}",
+        f"${highest_bg_price:.2f}",
+        f"${buy_order_price:.2f}" if buy_order_price is not None else "N/A",
+        highest_bg_market_url if highest_bg_market_url else "N/A",
+        result['sce_game_page_url']
+    ]
+
+def record_game_result(game_info, result):
+    """
+    Reports a checked game: prints and journals its alert (or that it no longer alerts),
+    and updates its rescan state and price index. Returns the alert CSV row or None.
+    """
+    with stage_metrics.timer('result_write'):
+        alert_row = print_alert(game_info, result)
+        if alert_row:
+            results_journal_global.append(alert_record(alert_row))
+        if result['background_prices'] is None:
+            # No Backgrounds grid on the page: keep the last known alert, state and price bounds
+            return alert_row
+        if not alert_row:
+            results_journal_global.append(cleared_record(game_info['appid']))
+        if game_state_store_global is not None:
+            game_state_store_global.record_check(game_info['appid'], game_info['badge_price'], result['highest_bg_price'],
+                                                 result['buy_amount'], result['num_buyers'])
+        if background_price_index_global is not None:
+            background_price_index_global.record_game(game_info['appid'], result['background_prices'])
+    return alert_row
+
+async def scan_games_async(games_to_scan, concurrency, handle_result, before_check=None, priority=None):
+    """
+    Checks games concurrently: up to `concurrency` game pages and market lookups are in
+    flight at once on a thread pool, while per-host token buckets inside http_get keep
+    each site under its throttle. games_to_scan may be a list or any iterator, such as
+    the streamed badge feed, which is consumed lazily through a bounded queue.
+    before_check(game_info) and handle_result(game_info, result) run on the event loop
+    thread, so logging and CSV writes never race. Market lookups deferred while Steam's
+    circuit is open are finished in the background once it closes.
+    With priority(game_info), higher-scoring games are checked first: a list is sorted
+    up front, while an iterator is reordered within a lookahead of PRIORITY_LOOKAHEAD games.
+    Returns the number of games checked.
+    """
+    loop = asyncio.get_running_loop()
+    if priority is None:
+        work_queue = asyncio.Queue(maxsize=concurrency * 2)
+    else:
+        if isinstance(games_to_scan, (list, tuple)):
+            games_to_scan = sorted(games_to_scan, key=priority, reverse=True)
+        work_queue = asyncio.PriorityQueue(maxsize=max(concurrency * 2, PRIORITY_LOOKAHEAD))
+    games_iterator = iter(games_to_scan)
+    end_of_games = object()
+    queued_count = 0
+
+    async def put_game(game_info):
+        nonlocal queued_count
+        queued_count += 1
+        if priority is None:
+            await work_queue.put(game_info)
+        elif game_info is end_of_games:
+            await work_queue.put((math.inf, queued_count, game_info))
+        else:
+            # The count breaks ties in feed order and keeps game dicts from being compared
+            await work_queue.put((-priority(game_info), queued_count, game_info))
+
+    games_checked = 0
+    deferred_tasks = []
+
+    async def feeder():
+        while True:
+            if isinstance(games_to_scan, (list, tuple)):
+                game_info = next(games_iterator, end_of_games)
+            else:
+                # Generators may block on the network (streamed feed), so advance them off the loop
+                game_info = await loop.run_in_executor(None, next, games_iterator, end_of_games)
+            if game_info is end_of_games:
+                for _ in range(concurrency):
+                    await put_game(end_of_games)
+                return
+            await put_game(game_info)
+
+    async def worker():
+        nonlocal games_checked
+        while True:
+            game_info = await work_queue.get()
+            if priority is not None:
+                game_info = game_info[2]
+            if game_info is end_of_games:
+                return
+            if before_check:
+                before_check(game_info)
+            result = await loop.run_in_executor(executor, check_game, game_info)
+            if result.get('market_lookup_deferred'):
+                deferred_tasks.append(asyncio.ensure_future(finish_deferred(game_info, result)))
+                continue
+            handle_result(game_info, result)
+            games_checked += 1
+
+    async def finish_deferred(game_info, result):
+        nonlocal games_checked
+        breaker = circuit_breaker_for(STEAM_COMMUNITY_BASE_URL)
+        while breaker is not None and breaker.is_open():
+            await asyncio.sleep(breaker.wait_seconds())
+        result = await loop.run_in_executor(executor, complete_market_lookup, game_info, result)
+        handle_result(game_info, result)
+        games_checked += 1
+
+    thread_initializer = start_thread_profiler if active_profilers else None
+    with ThreadPoolExecutor(max_workers=concurrency, initializer=thread_initializer) as executor:
+        await asyncio.gather(feeder(), *(worker() for _ in range(concurrency)))
+        if deferred_tasks:
+            await asyncio.gather(*deferred_tasks)
+
+    return games_checked
+
+def run_shard_worker(args, shard_index):
+    """
+    Works through one shard of a sharded scan: starts a new sweep from the badge feed if
+    the checkpoint has no open work (skipping games already processed in this folder's
+    results), then claims and checks batches until no claimable work is left (stealing
+    from other shards unless --no-steal). Results stay in the checkpoint until they are
+    merged into the journal. Returns the number of games checked.
+    """
+    checkpoint = ShardCheckpoint(args.shard_db, args.shard_journal_mode)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-shard{shard_index}"
+    if not checkpoint.has_open_work():
+        games_from_list = get_games_from_badgeprices_table()
+        if os.path.exists(processed_app_ids_file):
+            skip_app_ids = ProcessedAppIdStore(processed_app_ids_file, read_only=True)
+        else:
+            skip_app_ids = {record['appid'] for record in read_journal(results_journal_file)[0] if record.get('type') == 'processed'}
+        seeded_count = checkpoint.seed(games_from_list, args.shards, skip_app_ids)
+        if seeded_count:
+            print(f"[{worker_id}] Seeded the shard checkpoint with {seeded_count} games.")
+        if isinstance(skip_app_ids, ProcessedAppIdStore):
+            skip_app_ids.close()
+
+    def complete_game(game_info, result):
+        checkpoint.complete(game_info['appid'], print_alert(game_info, result))
+        if result['background_prices'] is None:
+            return
+        if game_state_store_global is not None:
+            game_state_store_global.record_check(game_info['appid'], game_info['badge_price'], result['highest_bg_price'],
+                                                 result['buy_amount'], result['num_buyers'])
+        if background_price_index_global is not None:
+            background_price_index_global.record_game(game_info['appid'], result['background_prices'])
+
+    concurrency = max(1, args.concurrency)
+    games_checked = 0
+    while True:
+        batch = checkpoint.claim(worker_id, shard_index, concurrency * 4, args.shard_lease * 60, steal=not args.no_steal)
+        if not batch:
+            break
+        games_checked += asyncio.run(scan_games_async(batch, concurrency, complete_game))
+
+    print(f"[{worker_id}] Finished: checked {games_checked} games. Checkpoint status: {checkpoint.progress()}")
+    checkpoint.close()
+    return games_checked
+
+# Output flags of the coordinating process; local shard workers must not write to the same files
+SHARD_OUTPUT_FLAGS = {'--metrics-json': True, '--metrics-prom': True, '--stats-json': True, '--profile': False}
+
+def shard_worker_argv(argv, shard_index, stats_path=None):
+    """The command-line arguments of a local shard worker: argv without the output flags, plus its shard and stats file."""
+    worker_argv = []
+    skip_value = False
+    for argument in argv:
+        if skip_value:
+            skip_value = False
+            continue
+        flag = argument.split('=', 1)[0]
+        if flag in SHARD_OUTPUT_FLAGS:
+            skip_value = SHARD_OUTPUT_FLAGS[flag] and '=' not in argument
+            continue
+        worker_argv.append(argument)
+    worker_argv += ["--shard-index", str(shard_index)]
+    if stats_path:
+        worker_argv += ["--stats-json", stats_path]
+    return worker_argv
+
+def shard_stats_path(stats_path, shard_index):
+    """Per-worker run summary path next to stats_path, e.g. stats.shard0.json."""
+    root, extension = os.path.splitext(stats_path)
+    return f"{root}.shard{shard_index}{extension or '.json'}"
+
+def run_local_shard_workers(args, stats_path=None):
+    """
+    Starts one worker process per shard on this machine, waits for them, and returns their
+    exit codes. With stats_path, each worker writes its run summary to shard_stats_path().
+    """
+    worker_processes = []
+    for shard_index in range(args.shards):
+        worker_stats_path = shard_stats_path(stats_path, shard_index) if stats_path else None
+        worker_command = [sys.executable, os.path.abspath(__file__)] + shard_worker_argv(sys.argv[1:], shard_index, worker_stats_path)
+        worker_processes.append(subprocess.Popen(worker_command))
+    return [worker_process.wait() for worker_process in worker_processes]
+
+def merge_shard_run_stats(stats_paths):
+    """
+    Adds the request/retry/byte counters and stage latency histograms of the workers' run
+    summaries to this process's run_stats and stage_metrics, so --stats-json and --metrics-*
+    report the totals of the run, and returns the number of games they checked. Missing
+    files (a worker that failed before writing one) are skipped.
+    """
+    games_checked = 0
+    for stats_path in stats_paths:
         try:
-            with open(all_processed_games_file, 'r', newline='', encoding='utf-8') as csvfile:
-                csv_reader = csv.reader(csvfile)
-                header = next(csv_reader, None)
-                if header and "AppID" in header:
-                    app_id_col_index = header.index("AppID")
-                    for row in csv_reader:
-                        if len(row) > app_id_col_index:
-                            try:
-                                processed_app_ids.add(int(row[app_id_col_index]))
-                            except ValueError:
-                                continue
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                worker_stats = json.load(stats_file)
+        except (IOError, ValueError) as e:
+            print(f"Warning: Could not read shard run summary '{stats_path}': {e}")
+            continue
+        games_checked += worker_stats.get('games_checked', 0)
+        stage_metrics.merge(worker_stats.get('stage_histograms') or {})
+        with run_stats_lock:
+            for name, value in run_stats.items():
+                worker_value = worker_stats.get(name)
+                if worker_value is None:
+                    continue
+                if name == 'time_to_first_alert_seconds':
+                    run_stats[name] = worker_value if value is None else min(value, worker_value)
+                elif isinstance(value, dict):
+                    for key, count in worker_value.items():
+                        value[key] = value.get(key, 0) + count
                 else:
-                    print(f"Warning: '{all_processed_games_file}' is missing 'AppID' header or is empty. Cannot skip previously processed games efficiently.")
-            print(f"Loaded {len(processed_app_ids)} previously processed game IDs.")
-        except Exception as e:
-            print(f"Error loading existing comprehensive processed games CSV: {e}. Starting with an empty list of processed games.")
-            processed_app_ids = set()
+                    run_stats[name] = value + worker_value
+    return games_checked
+
+DEFAULT_POLL_INTERVAL_SECONDS = 60
+DEFAULT_DAEMON_STALE_BATCH = 100
+DEFAULT_API_PORT = 8765
+
+class WatchState:
+    """
+    In-memory state of the watch daemon: the latest badge feed, what each game looked
+    like when it was last checked (badge price, backgrounds, buy orders) and the current
+    alerts. Shared between the polling loop and the alerts API threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.games = {}
+        self.checked = {}  # appid -> (last_checked, badge_price, highest_bg_price)
+        self.alerts = {}
+        self.status = {'started_at': time.time(), 'polls': 0, 'last_poll_at': None, 'last_poll_seconds': None,
+                       'last_poll_rechecked': 0, 'games_checked': 0}
+
+    def seed_checks(self, game_states):
+        """Starts from the persisted game states so unchanged games are not re-fetched after a restart."""
+        with self.lock:
+            self.checked.update(game_states)
+
+    def update_feed(self, games, ttl_seconds, stale_batch):
+        """
+        Stores a fresh badge feed and returns the games to re-check: new games, games whose
+        badge price moved, last-known alert candidates that have no alert details in memory
+        yet, and up to stale_batch of the games whose last check is older than ttl_seconds.
+        """
+        now = time.time()
+        to_check = []
+        stale_games = []
+        with self.lock:
+            self.games = {game_info['appid']: game_info for game_info in games}
+            for appid in [appid for appid in self.alerts if appid not in self.games]:
+                del self.alerts[appid]
+            for game_info in self.games.values():
+                state = self.checked.get(game_info['appid'])
+                reason = rescan_reason(game_info, state, ttl_seconds, now)
+                if reason == 'stale':
+                    # The cached page may be as old as the check itself, so ask SCE whether it changed
+                    game_info = dict(game_info, revalidate_page=True)
+                if reason is None or reason == 'stale':
+                    _, _, last_highest_bg_price = state
+                    if last_highest_bg_price is not None and last_highest_bg_price > game_info['badge_price'] and game_info['appid'] not in self.alerts:
+                        # Alerted before the daemon started; fetch its details once
+                        to_check.append(game_info)
+                    elif reason == 'stale':
+                        stale_games.append((state[0], game_info))
+                else:
+                    to_check.append(game_info)
+        stale_games.sort(key=lambda entry: entry[0])
+        return to_check + [game_info for _, game_info in stale_games[:stale_batch]]
+
+    def record_result(self, game_info, result, alert_row):
+        with self.lock:
+            self.checked[game_info['appid']] = (time.time(), game_info['badge_price'], result['highest_bg_price'])
+            self.status['games_checked'] += 1
+            if not alert_row:
+                self.alerts.pop(game_info['appid'], None)
+                return
+            margin = result['highest_bg_price'] - game_info['badge_price']
+            self.alerts[game_info['appid']] = {
+                'appid': game_info['appid'],
+                'game_title': game_info['game_title'],
+                'badge_price': game_info['badge_price'],
+                'highest_bg_price': result['highest_bg_price'],
+                'margin': round(margin, 2),
+                'margin_pct': round(margin / game_info['badge_price'] * 100, 1) if game_info['badge_price'] else None,
+                'num_buyers': result['num_buyers'],
+                'buy_order_price': result['buy_amount'],
+                'market_url': result['highest_bg_market_url'],
+                'sce_url': result['sce_game_page_url'],
+                'checked_at': time.time(),
+                'realizable_profit': result['depth']['realizable_profit'] if result.get('depth') else None,
+                'fill_ratio': result['depth']['fill_ratio'] if result.get('depth') else None,
+                'depth': result.get('depth'),
+            }
+
+    def record_poll(self, poll_seconds, rechecked_count):
+        with self.lock:
+            self.status['polls'] += 1
+            self.status['last_poll_at'] = time.time()
+            self.status['last_poll_seconds'] = poll_seconds
+            self.status['last_poll_rechecked'] = rechecked_count
+
+    def query_alerts(self, min_margin=None, min_margin_pct=None, min_buyers=None, min_buy_price=None, min_profit=None, sort='margin', limit=None):
+        """Returns the current alerts that pass every given threshold, best first by `sort`."""
+        with self.lock:
+            alerts = [dict(alert) for alert in self.alerts.values()]
+        selected = []
+        for alert in alerts:
+            if min_margin is not None and alert['margin'] < min_margin:
+                continue
+            if min_margin_pct is not None and (alert['margin_pct'] is None or alert['margin_pct'] < min_margin_pct):
+                continue
+            if min_buyers is not None and (alert['num_buyers'] or 0) < min_buyers:
+                continue
+            if min_buy_price is not None and (alert['buy_order_price'] or 0) < min_buy_price:
+                continue
+            if min_profit is not None and (alert['realizable_profit'] is None or alert['realizable_profit'] < min_profit):
+                continue
+            selected.append(alert)
+        selected.sort(key=lambda alert: alert[sort] if alert[sort] is not None else float('-inf'), reverse=True)
+        return selected[:limit] if limit else selected
+
+    def snapshot_status(self):
+        with self.lock:
+            return dict(self.status, games_in_feed=len(self.games), alerts=len(self.alerts))
+
+# Alert fields the API can sort by, and the float-valued query filters it accepts
+ALERT_SORT_KEYS = ('margin', 'margin_pct', 'num_buyers', 'buy_order_price', 'highest_bg_price', 'realizable_profit', 'checked_at')
+ALERT_QUERY_FILTERS = ('min_margin', 'min_margin_pct', 'min_buyers', 'min_buy_price', 'min_profit')
+
+class AlertsApiServer:
+    """
+    Local HTTP/JSON view of a WatchState:
+      GET /alerts?min_margin=&min_margin_pct=&min_buyers=&min_buy_price=&min_profit=&sort=&limit=
+      GET /games/<appid>
+      GET /status
+    """
+
+    def __init__(self, watch_state, host='127.0.0.1', port=DEFAULT_API_PORT):
+        self.watch_state = watch_state
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket; safe to call more than once."""
+        if self.thread is None:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread = None
+
+    def make_handler(self):
+        watch_state = self.watch_state
+
+        class AlertsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+                if parsed.path == '/status':
+                    self.send_json(200, watch_state.snapshot_status())
+                    return
+                if parsed.path == '/alerts':
+                    try:
+                        filters = {name: float(query[name]) for name in ALERT_QUERY_FILTERS if name in query}
+                        limit = int(query['limit']) if 'limit' in query else None
+                    except ValueError:
+                        self.send_json(400, {'error': f"Filters {', '.join(ALERT_QUERY_FILTERS)} and limit must be numbers."})
+                        return
+                    sort = query.get('sort', 'margin')
+                    if sort not in ALERT_SORT_KEYS:
+                        self.send_json(400, {'error': f"sort must be one of {', '.join(ALERT_SORT_KEYS)}."})
+                        return
+                    alerts = watch_state.query_alerts(sort=sort, limit=limit, **filters)
+                    self.send_json(200, {'count': len(alerts), 'alerts': alerts})
+                    return
+                match = re.match(r'/games/(\d+)$', parsed.path)
+                if match:
+                    appid = int(match.group(1))
+                    with watch_state.lock:
+                        game_info = watch_state.games.get(appid)
+                        checked = watch_state.checked.get(appid)
+                        alert = watch_state.alerts.get(appid)
+                    if game_info is None:
+                        self.send_json(404, {'error': f"AppID {appid} is not in the current badge feed."})
+                        return
+                    self.send_json(200, {
+                        'game': game_info,
+                        'last_checked': checked[0] if checked else None,
+                        'last_highest_bg_price': checked[2] if checked else None,
+                        'alert': alert,
+                    })
+                    return
+                self.send_json(404, {'error': "Unknown path; try /alerts, /games/<appid> or /status."})
+
+        return AlertsHandler
+
+def run_watch_daemon(args, processed_app_ids):
+    """
+    Keeps running instead of exiting after one sweep: re-polls the badge feed every
+    --poll-interval seconds, re-checks only the games selected by WatchState.update_feed,
+    and serves the live alerts over AlertsApiServer until interrupted by Ctrl-C or SIGTERM
+    (systemd, docker and kill), after which the caller flushes and exports as usual.
+    """
+    watch_state = WatchState()
+    watch_state.seed_checks(game_state_store_global.load_all())
+    api_server = AlertsApiServer(watch_state, args.api_host, args.api_port).start()
+    print(f"--- Watch daemon started: polling every {args.poll_interval:g}s, alerts API at {api_server.base_url}/alerts ---")
+
+    def mark_processed(game_info):
+        # processed_app_ids picks the AppID up when the journal commits the record
+        if game_info['appid'] not in processed_app_ids:
+            results_journal_global.append(processed_record(game_info['appid']))
+
+    def handle_result(game_info, result):
+        alert_row = record_game_result(game_info, result)
+        if alert_row and alert_counts is not None:
+            alert_counts[game_info['appid']] = alert_counts.get(game_info['appid'], 0) + 1
+        watch_state.record_result(game_info, result, alert_row)
+
+    alert_counts = count_alerts_by_appid(results_journal_global.records) if args.priority else None
+
+    shutdown = {'signal': None}
+
+    def stop_on_sigterm(signum, frame):
+        # A second SIGTERM must not cut the shutdown short
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        shutdown['signal'] = signum
+        api_server.stop()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            raise KeyboardInterrupt
+        # Mid-scan: cancel it the way asyncio.run handles Ctrl-C, so the poll loop below stops once it has unwound
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+
+    previous_sigterm_handler = signal.signal(signal.SIGTERM, stop_on_sigterm)
+    concurrency = max(1, args.concurrency)
+    try:
+        while True:
+            poll_start_time = time.monotonic()
+            games_from_list = get_games_from_badgeprices_table()
+            games_to_check = watch_state.update_feed(games_from_list, args.rescan_ttl * 3600, args.daemon_stale_batch)
+            if args.prune and games_to_check:
+                price_bounds = background_price_index_global.load_bounds()
+                now = time.time()
+                games_to_check = [
+                    game_info for game_info in games_to_check
+                    if prune_decision(game_info, price_bounds.get(game_info['appid']), args.prune_margin,
+                                      args.prune_revalidate_rate, args.prune_max_age * 3600, now) != 'prune'
+                ]
+            priority = None
+            if args.priority and games_to_check:
+                # New and repriced games only outrank the stale refresh batch when they are more promising
+                priority = GamePriorityModel(game_state_store_global.load_all(), alert_counts).score
+            if games_to_check:
+                asyncio.run(scan_games_async(games_to_check, concurrency, handle_result, before_check=mark_processed, priority=priority))
+            results_journal_global.flush()
+            poll_seconds = time.monotonic() - poll_start_time
+            watch_state.record_poll(poll_seconds, len(games_to_check))
+            status = watch_state.snapshot_status()
+            print(f"--- Poll {status['polls']}: {status['games_in_feed']} games in feed, re-checked {len(games_to_check)} in {poll_seconds:.1f}s, {status['alerts']} live alerts ---")
+            if args.metrics_prom:
+                write_metrics_prometheus(args.metrics_prom)
+            time.sleep(max(0.0, args.poll_interval - poll_seconds))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        if shutdown['signal'] is None and not isinstance(sys.exc_info()[1], KeyboardInterrupt):
+            raise
+        print(f"\n--- Watch daemon stopping{' (SIGTERM)' if shutdown['signal'] else ''} ---")
+    finally:
+        api_server.stop()
+        if shutdown['signal'] is None:
+            signal.signal(signal.SIGTERM, previous_sigterm_handler)
+
+def open_results_journal(args):
+    """
+    Recovers the results journal (migrating the pre-journal CSV files into a new one) and
+    opens the processed AppID set built from it. Returns (journal, processed AppID store).
+    """
+    journal = ResultJournal(results_journal_file, args.journal_batch, args.journal_interval_ms)
+    if journal.is_new and (os.path.exists(all_processed_games_file) or os.path.exists(output_csv_file)):
+        migrated_count = migrate_csv_logs_to_journal(journal, output_csv_file, all_processed_games_file)
+        print(f"Migrated {migrated_count} records from the existing CSV files into '{results_journal_file}'.")
+
+    if journal.is_new or not os.path.exists(processed_app_ids_file):
+        # One-time build from the journal; a fresh journal also starts a fresh AppID set
+        built_count = ProcessedAppIdStore.create(processed_app_ids_file, (
+            record['appid'] for record in journal.records if record.get('type') == 'processed'))
+        if built_count:
+            print(f"Built '{processed_app_ids_file}' from {built_count} AppIDs in '{results_journal_file}'.")
+    processed_app_ids = ProcessedAppIdStore(processed_app_ids_file)
+    journal.on_commit = processed_app_ids.add_committed_records
+    return journal, processed_app_ids
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Find Steam games whose highest profile background sells for more than crafting the badge.")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of games to check at once (default: 1, i.e. one game at a time).")
+    parser.add_argument("--sce-rate", type=float, default=DEFAULT_SCE_RATE_LIMIT,
+                        help=f"Max requests per second to steamcardexchange.net, 0 for unlimited (default: {DEFAULT_SCE_RATE_LIMIT}).")
+    parser.add_argument("--steam-rate", type=float, default=DEFAULT_STEAM_RATE_LIMIT,
+                        help=f"Max requests per second to steamcommunity.com, 0 for unlimited (default: {DEFAULT_STEAM_RATE_LIMIT}).")
+    parser.add_argument("--no-nameid-cache", action="store_true",
+                        help="Do not read or write the local item_nameid cache.")
+    parser.add_argument("--import-nameids", metavar="CSV",
+                        help="Bulk-import item_nameids from a CSV (columns: market_hash_name or market_url, item_nameid) and exit.")
+    parser.add_argument("--warm-nameids", action="store_true",
+                        help="Fetch and cache the item_nameid of every market link in the alert CSV, then exit.")
+    parser.add_argument("--page-cache-ttl", type=float, default=DEFAULT_PAGE_CACHE_TTL_HOURS, metavar="HOURS",
+                        help=f"Serve cached SCE game pages without revalidating for this many hours (default: {DEFAULT_PAGE_CACHE_TTL_HOURS}).")
+    parser.add_argument("--page-cache-max-entries", type=int, default=DEFAULT_PAGE_CACHE_MAX_ENTRIES,
+                        help=f"Evict least recently used game pages beyond this many entries (default: {DEFAULT_PAGE_CACHE_MAX_ENTRIES}).")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="Always download SCE game pages in full, without reading or writing the page cache.")
+    parser.add_argument("--rescan", action="store_true",
+                        help="Re-check previously processed games whose badge price changed or whose last check is older than --rescan-ttl, instead of skipping them.")
+    parser.add_argument("--rescan-ttl", type=float, default=DEFAULT_RESCAN_TTL_HOURS, metavar="HOURS",
+                        help=f"With --rescan, re-check games last checked more than this many hours ago (default: {DEFAULT_RESCAN_TTL_HOURS}).")
+    parser.add_argument("--priority", action="store_true",
+                        help="Check the games most likely to alert first, scored from their badge price, past background/badge ratios, last check and past alerts.")
+    parser.add_argument("--prune", action="store_true",
+                        help="Skip games whose indexed background prices cannot plausibly beat the badge price, without fetching their page.")
+    parser.add_argument("--prune-margin", type=float, default=DEFAULT_PRUNE_MARGIN, metavar="FRACTION",
+                        help=f"With --prune, keep a game unless its price bound times (1 + FRACTION) is below the badge price (default: {DEFAULT_PRUNE_MARGIN}).")
+    parser.add_argument("--prune-revalidate-rate", type=float, default=DEFAULT_PRUNE_REVALIDATE_RATE, metavar="FRACTION",
+                        help=f"With --prune, fetch this share of prunable games anyway to keep the index honest (default: {DEFAULT_PRUNE_REVALIDATE_RATE}).")
+    parser.add_argument("--prune-max-age", type=float, default=DEFAULT_PRUNE_MAX_AGE_HOURS, metavar="HOURS",
+                        help=f"With --prune, never prune a game whose index entry is older than this many hours (default: {DEFAULT_PRUNE_MAX_AGE_HOURS}).")
+    parser.add_argument("--html-extractor", choices=sorted(HTML_EXTRACTORS), default='bs4',
+                        help="How to extract prices from SCE game pages: 'bs4' (full BeautifulSoup parse, the reference), "
+                             "'stream' (single-pass tokenizer) or 'lxml' (needs lxml installed). Default: bs4.")
+    parser.add_argument("--sce-base-url", default=SCE_BASE_URL,
+                        help="Root URL for steamcardexchange.net requests (e.g. a local replay_server.py).")
+    parser.add_argument("--steam-base-url", default=STEAM_COMMUNITY_BASE_URL,
+                        help="Root URL for steamcommunity.com requests (e.g. a local replay_server.py).")
+    parser.add_argument("--retry-delay", type=float, default=RETRY_DELAY_SECONDS,
+                        help=f"Base delay in seconds between retries of a failed request (default: {RETRY_DELAY_SECONDS}).")
+    parser.add_argument("--retry-max-delay", type=float, default=RETRY_MAX_DELAY_SECONDS,
+                        help=f"Cap in seconds for the exponential retry backoff; a server's Retry-After is always honored (default: {RETRY_MAX_DELAY_SECONDS}).")
+    parser.add_argument("--breaker-threshold", type=int, default=DEFAULT_BREAKER_THRESHOLD, metavar="N",
+                        help=f"Pause all requests to a host after N consecutive throttled or failed responses (default: {DEFAULT_BREAKER_THRESHOLD}).")
+    parser.add_argument("--breaker-cooldown", type=float, default=DEFAULT_BREAKER_COOLDOWN_SECONDS, metavar="SECONDS",
+                        help=f"Initial pause once a host's circuit opens; doubles while it keeps failing (default: {DEFAULT_BREAKER_COOLDOWN_SECONDS}).")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="Write per-stage latency histograms and request/byte/retry counters as JSON to PATH when the run ends.")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="Write the same metrics in the Prometheus text format to PATH (e.g. for node_exporter's textfile collector).")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Run under cProfile and tracemalloc and write the report to '{profile_report_file}'.")
+    parser.add_argument("--stats-json", metavar="PATH",
+                        help="Write a JSON run summary (games/sec, requests, retries, time to first alert) to PATH.")
+    parser.add_argument("--journal-batch", type=int, default=DEFAULT_JOURNAL_BATCH_SIZE, metavar="N",
+                        help=f"Commit journaled results to disk every N records (default: {DEFAULT_JOURNAL_BATCH_SIZE}).")
+    parser.add_argument("--journal-interval-ms", type=float, default=DEFAULT_JOURNAL_FLUSH_INTERVAL_MS, metavar="MS",
+                        help=f"...or once MS milliseconds have passed since the last commit (default: {DEFAULT_JOURNAL_FLUSH_INTERVAL_MS:g}).")
+    parser.add_argument("--export-csv", action="store_true",
+                        help="Rewrite the alert and processed-games CSV files from the results journal, then exit.")
+    parser.add_argument("--stream-feed", action="store_true",
+                        help="Parse the badge price feed as it downloads and start scraping on the first rows, instead of waiting for the whole response.")
+    parser.add_argument("--depth", type=int, default=0, metavar="K",
+                        help="For every alert, fetch the buy/sell order books of all the game's backgrounds and compute the profit of crafting K badges "
+                             "and selling the drops into the buy orders after Steam fees; alerts are then ranked by that realizable profit.")
+    parser.add_argument("--histogram-ttl", type=float, default=DEFAULT_HISTOGRAM_TTL_SECONDS, metavar="SECONDS",
+                        help=f"Reuse stored itemordershistogram responses younger than this many seconds (default: {DEFAULT_HISTOGRAM_TTL_SECONDS}).")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running: re-poll the badge feed every --poll-interval seconds, re-check only changed games, and serve live alerts over a local HTTP/JSON API.")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL_SECONDS, metavar="SECONDS",
+                        help=f"With --daemon, seconds between badge feed polls (default: {DEFAULT_POLL_INTERVAL_SECONDS}).")
+    parser.add_argument("--daemon-stale-batch", type=int, default=DEFAULT_DAEMON_STALE_BATCH, metavar="N",
+                        help=f"With --daemon, also re-check up to N games per poll whose last check is older than --rescan-ttl (default: {DEFAULT_DAEMON_STALE_BATCH}).")
+    parser.add_argument("--api-host", default="127.0.0.1",
+                        help="With --daemon, address the alerts API listens on (default: 127.0.0.1).")
+    parser.add_argument("--api-port", type=int, default=DEFAULT_API_PORT,
+                        help=f"With --daemon, port of the alerts API (default: {DEFAULT_API_PORT}).")
+    parser.add_argument("--evaluate-alerts", action="store_true",
+                        help="Evaluate alerts over every game recorded in the local state database with the --min-* thresholds, print them, and exit.")
+    parser.add_argument("--min-margin", type=float, default=0.0, metavar="DOLLARS",
+                        help="With --evaluate-alerts/--parquet, only count alerts whose background beats the badge price by at least this much.")
+    parser.add_argument("--min-margin-pct", type=float, default=0.0, metavar="PERCENT",
+                        help="With --evaluate-alerts/--parquet, only count alerts whose margin is at least this percentage of the badge price.")
+    parser.add_argument("--min-buyers", type=int, default=0, metavar="N",
+                        help="With --evaluate-alerts/--parquet, only count alerts with at least N buy orders.")
+    parser.add_argument("--parquet", metavar="PATH",
+                        help="Also export the game table (prices, buy orders, margins, alert flags) to a Parquet file; needs pyarrow.")
+    parser.add_argument("--shards", type=int, default=0, metavar="N",
+                        help="Split the scan into N hash-based shards coordinated through --shard-db. Without --shard-index, "
+                             "runs all N shard workers as local processes and merges their alerts when they finish.")
+    parser.add_argument("--shard-index", type=int, metavar="I",
+                        help="Run only the worker for shard I (0-based), e.g. one per machine sharing --shard-db.")
+    parser.add_argument("--shard-db", default=shard_db_file,
+                        help=f"Shared SQLite checkpoint for sharded scans (default: {shard_db_file}).")
+    parser.add_argument("--shard-journal-mode", choices=['wal', 'delete'], default='wal',
+                        help="SQLite journal mode of --shard-db: 'wal' when all workers share one host, 'delete' for a network volume shared by several machines.")
+    parser.add_argument("--shard-lease", type=float, default=DEFAULT_SHARD_LEASE_MINUTES, metavar="MINUTES",
+                        help=f"Claimed games not finished within this many minutes can be claimed by another worker (default: {DEFAULT_SHARD_LEASE_MINUTES}).")
+    parser.add_argument("--no-steal", action="store_true",
+                        help="Shard workers stop when their own shard is done instead of taking work from other shards.")
+    parser.add_argument("--merge-shards", action="store_true",
+                        help="Write every alert recorded in --shard-db to the alert CSV, then exit.")
+    return parser.parse_args(argv)
+
+def write_run_stats(stats_path, games_checked, scan_elapsed, concurrency, alert_discovery=()):
+    """Writes the run summary used by benchmark_pipeline.py."""
+    with run_stats_lock:
+        summary = dict(run_stats, requests_by_host=dict(run_stats['requests_by_host']),
+                       responses_by_host=dict(run_stats['responses_by_host']))
+    summary.update({
+        'games_checked': games_checked,
+        'scan_seconds': scan_elapsed,
+        'total_seconds': time.monotonic() - run_start_time,
+        'games_per_second': games_checked / scan_elapsed if scan_elapsed > 0 else 0.0,
+        'requests_per_game': summary['requests'] / games_checked if games_checked else 0.0,
+        'concurrency': concurrency,
+        'alert_discovery': [{'sweep_percent': sweep_percent, 'alerts_percent': alerts_percent}
+                            for sweep_percent, alerts_percent in alert_discovery],
+        'stages': stage_metrics.summary(),
+        # Raw histograms, merged by the coordinator of a local sharded run
+        'stage_histograms': stage_metrics.snapshot(),
+    })
+    with open(stats_path, 'w', encoding='utf-8') as stats_file:
+        json.dump(summary, stats_file, indent=2)
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    args = parse_args()
+    SCE_BASE_URL = args.sce_base_url.rstrip('/')
+    STEAM_COMMUNITY_BASE_URL = args.steam_base_url.rstrip('/')
+    RETRY_DELAY_SECONDS = args.retry_delay
+    RETRY_MAX_DELAY_SECONDS = args.retry_max_delay
+    if args.profile:
+        tracemalloc.start()
+        start_thread_profiler()
+        atexit.register(write_profile_report)
+    if args.metrics_json:
+        atexit.register(write_metrics_json, args.metrics_json)
+    if args.metrics_prom:
+        atexit.register(write_metrics_prometheus, args.metrics_prom)
+    configure_rate_limits(args.sce_rate, args.steam_rate, args.breaker_threshold, args.breaker_cooldown)
+    html_extractor_global = args.html_extractor
+    depth_units_global = max(0, args.depth)
+
+    if args.parquet and pyarrow is None:
+        print("Fatal: --parquet needs pyarrow (pip install pyarrow). Exiting script.")
+        sys.exit(1)
+
+    if args.evaluate_alerts:
+        state_store = GameStateStore(cache_db_file)
+        evaluate_start_time = time.perf_counter()
+        game_table = GameTable.from_rows(state_store.iter_rows())
+        alert_flags, margins = game_table.evaluate_alerts(args.min_margin, args.min_margin_pct, args.min_buyers)
+        evaluate_elapsed = time.perf_counter() - evaluate_start_time
+        alert_rows = game_table.alert_rows(alert_flags, margins)
+        for row in alert_rows:
+            buy_order_text = f"${row['buy_order_price']:.2f}" if not math.isnan(row['buy_order_price']) else "N/A"
+            buyers_text = row['num_buyers'] if row['num_buyers'] >= 0 else "N/A"
+            print(f"AppID {row['appid']}: background ${row['highest_bg_price']:.2f} vs badge ${row['badge_price']:.2f} "
+                  f"(+${row['margin']:.2f}), buy orders: {buyers_text} at {buy_order_text}")
+        backend = "numpy" if numpy is not None else "array"
+        print(f"--- {len(alert_rows)} alerts among {len(game_table)} games (evaluated in {evaluate_elapsed * 1000:.1f} ms, {backend} backend) ---")
+        if args.parquet:
+            game_table.to_parquet(args.parquet, alert_flags, margins)
+            print(f"--- Game table written to '{args.parquet}' ---")
+        state_store.close()
+        sys.exit(0)
+
+    if not args.no_nameid_cache:
+        item_nameid_cache_global = ItemNameIdCache(cache_db_file)
+        print(f"Loaded item_nameid cache '{cache_db_file}' ({len(item_nameid_cache_global)} entries).")
+
+    if args.import_nameids or args.warm_nameids:
+        if item_nameid_cache_global is None:
+            print("Fatal: --import-nameids and --warm-nameids cannot be combined with --no-nameid-cache. Exiting script.")
+            sys.exit(1)
+        if args.import_nameids:
+            imported_count = import_item_nameids(item_nameid_cache_global, args.import_nameids)
+            print(f"Imported {imported_count} item_nameids from '{args.import_nameids}'.")
+        if args.warm_nameids:
+            if os.path.exists(output_csv_file):
+                warmed_count = warm_item_nameid_cache(item_nameid_cache_global, output_csv_file)
+                print(f"Cached {warmed_count} new item_nameids.")
+            else:
+                print(f"No alert CSV found at '{output_csv_file}'. Nothing to warm.")
+        item_nameid_cache_global.close()
+        sys.exit(0)
+
+    if args.merge_shards or (args.shards and args.shard_index is None):
+        if args.shards and not args.merge_shards:
+            print(f"--- Running {args.shards} shard workers against '{args.shard_db}' ---")
+            # The workers' summaries are also needed to report their requests and stage timings in --metrics-*
+            worker_stats_base = args.stats_json or (shard_run_stats_file if args.metrics_json or args.metrics_prom else None)
+            shards_start_time = time.perf_counter()
+            exit_codes = run_local_shard_workers(args, worker_stats_base)
+            shards_elapsed = time.perf_counter() - shards_start_time
+            if any(exit_codes):
+                print(f"Warning: some shard workers failed (exit codes {exit_codes}). Unfinished games stay claimable in '{args.shard_db}'.")
+            if worker_stats_base:
+                worker_stats_paths = [shard_stats_path(worker_stats_base, shard_index) for shard_index in range(args.shards)]
+                shard_games_checked = merge_shard_run_stats(worker_stats_paths)
+                if args.stats_json:
+                    write_run_stats(args.stats_json, shard_games_checked, shards_elapsed, max(1, args.concurrency) * args.shards)
+                    print(f"--- Run summary of {args.shards} shard workers written to '{args.stats_json}' ---")
+                else:
+                    for worker_stats_path in worker_stats_paths:
+                        if os.path.exists(worker_stats_path):
+                            os.remove(worker_stats_path)
+        checkpoint = ShardCheckpoint(args.shard_db, args.shard_journal_mode)
+        results_journal_global, processed_app_ids = open_results_journal(args)
+        merged_games, merged_alerts = merge_shard_results(checkpoint, results_journal_global)
+        print(f"--- Merged {merged_games} games ({merged_alerts} alerts) from '{args.shard_db}' into '{results_journal_file}' (checkpoint status: {checkpoint.progress()}) ---")
+        checkpoint.close()
+        results_journal_global.close()
+        processed_app_ids.close()
+        alert_count, processed_count = export_journal_to_csv(read_journal(results_journal_file)[0], output_csv_file, all_processed_games_file)
+        print(f"--- Alert data written to '{output_csv_file}' ({alert_count} alerts) ---")
+        sys.exit(0)
+
+    if args.shard_index is not None:
+        if not 0 <= args.shard_index < args.shards:
+            print("Fatal: --shard-index must be between 0 and --shards - 1. Exiting script.")
+            sys.exit(1)
+        game_state_store_global = GameStateStore(cache_db_file)
+        background_price_index_global = BackgroundPriceIndex(cache_db_file)
+        order_book_store_global = OrderBookStore(cache_db_file, args.histogram_ttl)
+        if not args.no_page_cache:
+            game_page_cache_global = GamePageCache(cache_db_file, args.page_cache_ttl * 3600, args.page_cache_max_entries)
+        shard_start_time = time.perf_counter()
+        shard_games_checked = run_shard_worker(args, args.shard_index)
+        if args.stats_json:
+            write_run_stats(args.stats_json, shard_games_checked, time.perf_counter() - shard_start_time, max(1, args.concurrency))
+        # Commits the stores' last batched writes
+        for store in (game_page_cache_global, game_state_store_global, background_price_index_global, order_book_store_global, item_nameid_cache_global):
+            if store is not None:
+                store.close()
+        sys.exit(0)
+
+    if args.export_csv:
+        # Read-only, so it is safe next to a running scan: its in-flight batch is just not exported yet
+        if not os.path.exists(results_journal_file):
+            print(f"No journal found at '{results_journal_file}'. Nothing to export.")
+            sys.exit(0)
+        alert_count, processed_count = export_journal_to_csv(read_journal(results_journal_file)[0], output_csv_file, all_processed_games_file)
+        print(f"Exported {alert_count} alerts to '{output_csv_file}' and {processed_count} AppIDs to '{all_processed_games_file}'.")
+        sys.exit(0)
+
+    print("--- Starting to scrape game list from badge prices table ---")
+
+    # Recover the results journal and load already processed app IDs from it
+    results_journal_global, processed_app_ids = open_results_journal(args)
+    if len(processed_app_ids):
+        print(f"Loaded {len(processed_app_ids)} previously processed game IDs from '{processed_app_ids_file}'.")
     else:
-        print("No comprehensive log file found. Starting fresh for all games.")
-    
-    games_from_list = get_games_from_badgeprices_table()
-    
-    if not games_from_list:
+        print("No previously processed games found. Starting fresh for all games.")
+
+    if args.daemon:
+        game_state_store_global = GameStateStore(cache_db_file)
+        background_price_index_global = BackgroundPriceIndex(cache_db_file)
+        order_book_store_global = OrderBookStore(cache_db_file, args.histogram_ttl)
+        if not args.no_page_cache:
+            game_page_cache_global = GamePageCache(cache_db_file, args.page_cache_ttl * 3600, args.page_cache_max_entries)
+        run_watch_daemon(args, processed_app_ids)
+        if args.parquet:
+            game_count, table_alert_count = export_game_table(game_state_store_global, args.parquet, args.min_margin, args.min_margin_pct, args.min_buyers)
+            print(f"--- Game table written to '{args.parquet}' ({game_count} games, {table_alert_count} alerts) ---")
+        for store in (game_page_cache_global, game_state_store_global, background_price_index_global, order_book_store_global, item_nameid_cache_global):
+            if store is not None:
+                store.close()
+        results_journal_global.close()
+        processed_app_ids.close()
+        alert_count, processed_count = export_journal_to_csv(read_journal(results_journal_file)[0], output_csv_file, all_processed_games_file)
+        print(f"--- Alert data written to '{output_csv_file}' ({alert_count} alerts) ---")
+        sys.exit(0)
+
+    if args.stream_feed:
+        games_from_list = stream_games_from_badgeprices_table()
+    else:
+        games_from_list = get_games_from_badgeprices_table()
+
+    if not args.stream_feed and not games_from_list:
         print("No games found in the badge prices table via API. Please check the API URL or response structure. Exiting.")
     else:
-        print(f"Successfully retrieved {len(games_from_list)} games from the badge prices API.")
+        if args.stream_feed:
+            print("Streaming games from the badge prices API; checks start as soon as the first rows arrive.")
+        else:
+            print(f"Successfully retrieved {len(games_from_list)} games from the badge prices API.")
         print("\n--- Comparing Highest Background Prices with Badge Prices ---")
         print("Note: Comparing highest background price from game page against 'Price' from the API data.")
         print("      The 'Price' from the API is used as a reference as background prices are not in the initial list.")
         print("-" * 70)
 
-        # Initialize global file objects and writers
-        alert_file_exists = os.path.exists(output_csv_file)
-        if not open_csv_files(output_csv_file, all_processed_games_file, alert_file_exists, all_processed_file_exists):
-            print("Fatal: Could not open CSV files. Exiting script.")
-            sys.exit(1)
-
         games_to_process = games_from_list
-        print(f"Processing all {len(games_to_process)} games and writing alerts to '{output_csv_file}' and log to '{all_processed_games_file}'...")
+        if args.stream_feed:
+            print(f"Processing games as they stream in and journaling results to '{results_journal_file}'...")
+        else:
+            print(f"Processing all {len(games_to_process)} games and journaling results to '{results_journal_file}'...")
 
-        for game_info in games_to_process:
-            game_title_list = game_info['game_title']
-            appid_list = game_info['appid']
-            badge_price_list = game_info['badge_price']
+        game_state_store_global = GameStateStore(cache_db_file)
+        game_states = game_state_store_global.load_all() if args.rescan else None
+        rescan_reasons = {'new': 0, 'badge price changed': 0, 'stale': 0}
+        feed_counts = {'unique': 0, 'selected': 0}
 
-            if appid_list in processed_app_ids:
-                print(f"Skipping '{game_title_list}' (AppID: {appid_list}) - already processed in a previous run.")
-                continue
+        background_price_index_global = BackgroundPriceIndex(cache_db_file)
+        price_bounds = background_price_index_global.load_bounds() if args.prune else None
+        prune_counts = {'pruned': 0, 'forced revalidation': 0, 'expired': 0}
 
-            # Log to all_processed_games.csv with retry
-            log_attempt = 0
-            while True:
-                log_attempt += 1
-                try:
-                    all_processed_csv_writer_global.writerow([appid_list])
-                    all_processed_csvfile_global.flush()
-                    break
-                except (IOError, ValueError, Exception) as e:
-                    print(f"Attempt {log_attempt}: Warning: Could not write AppID {appid_list} to all_processed_games.csv log file: {e}. Attempting to re-open files and retry in {retry_delay_seconds} seconds...")
-                    time.sleep(retry_delay_seconds)
-                    current_alert_file_exists = os.path.exists(output_csv_file)
-                    current_all_processed_file_exists = os.path.exists(all_processed_games_file)
-                    if not open_csv_files(output_csv_file, all_processed_games_file, current_alert_file_exists, current_all_processed_file_exists):
-                        print("Fatal: Could not re-open CSV files for logging. Exiting script.")
-                        sys.exit(1)
-                    if log_attempt >= 3:
-                        print(f"Failed to log AppID {appid_list} to all_processed_games.csv after multiple attempts. Continuing without logging this game.")
-                        break
-
-            processed_app_ids.add(appid_list)
-
-            highest_bg_price, game_title_page, highest_bg_market_url, sce_game_page_url = get_highest_background_price(appid_list)
-
-            if highest_bg_price is not None and highest_bg_price > badge_price_list:
-                buy_order_price = None
-                
-                if highest_bg_market_url:
-                    num_buyers, buy_amount = get_steam_market_buy_listings(highest_bg_market_url)
-                    if num_buyers is not None and buy_amount is not None:
-                        buy_order_price = buy_amount
-                        print(f"\nChecking '{game_title_list}' (AppID: {appid_list}, List Price: ${badge_price_list:.2f})...")
-                        print(f"  Highest background price found on game page: ${highest_bg_price:.2f}")
-                        print(f"  >>> ALERT: Highest background price (${highest_bg_price:.2f}) for '{game_title_page}' is HIGHER than its List Price (${badge_price_list:.2f}) from the table!")
-                        print(f"    Fetching Steam Market buy listings for: {highest_bg_market_url}")
-                        print(f"    Steam Market Buy Orders: {num_buyers} requests to buy at ${buy_amount:.2f} or lower.")
-                        print("-" * 70)
-                    else:
-                        print(f"\nChecking '{game_title_list}' (AppID: {appid_list}, List Price: ${badge_price_list:.2f})...")
-                        print(f"  Highest background price found on game page: ${highest_bg_price:.2f}")
-                        print(f"  >>> ALERT: Highest background price (${highest_bg_price:.2f}) for '{game_title_page}' is HIGHER than its List Price (${badge_price_list:.2f}) from the table!")
-                        print(f"    Fetching Steam Market buy listings for: {highest_bg_market_url}")
-                        print("    Could not retrieve Steam Market buy order details.")
-                        print("-" * 70)
-                else:
-                    print(f"\nChecking '{game_title_list}' (AppID: {appid_list}, List Price: ${badge_price_list:.2f})...")
-                    print(f"  Highest background price found on game page: ${highest_bg_price:.2f}")
-                    print(f"  >>> ALERT: Highest background price (${highest_bg_price:.2f}) for '{game_title_page}' is HIGHER than its List Price (${badge_price_list:.2f}) from the table!")
-                    print("    No Steam Market URL found for this background.")
-                    print("-" * 70)
-                
-                write_attempt = 0
-                while True:
-                    write_attempt += 1
-                    try:
-                        alert_csv_writer_global.writerow([
-                            game_title_list,
-                            appid_list,
-                            f"${badge_price_list:.2f}",
-                            f"${highest_bg_price:.2f}",
-                            f"${buy_order_price:.2f}" if buy_order_price is not None else "N/A",
-                            highest_bg_market_url if highest_bg_market_url else "N/A",
-                            sce_game_page_url
-                        ])
-                        alert_csvfile_global.flush()
-                        break
-                    except (IOError, ValueError, Exception) as e:
-                        print(f"Attempt {write_attempt}: CRITICAL ERROR: Failed to write alert row for AppID {appid_list}. File might be closed. Error: {e}. Attempting to re-open files and retry in {retry_delay_seconds} seconds...")
-                        time.sleep(retry_delay_seconds)
-                        current_alert_file_exists = os.path.exists(output_csv_file)
-                        current_all_processed_file_exists = os.path.exists(all_processed_games_file)
-                        if not open_csv_files(output_csv_file, all_processed_games_file, current_alert_file_exists, current_all_processed_file_exists):
-                            print("Fatal: Could not re-open CSV files for alerts. Exiting script.")
-                            sys.exit(1)
-                        if write_attempt >= 3:
-                            print(f"Failed to write alert for AppID {appid_list} after multiple attempts. Skipping this alert.")
-                            break
+        def select_games_to_scan(games):
+            # A generator so the streamed feed is filtered row by row instead of being collected first
+            seen_app_ids = set()
+            rescan_started_at = time.time()
+            for game_info in games:
+                # Guard against the same AppID appearing twice in the API list
+                if game_info['appid'] in seen_app_ids:
+                    continue
+                seen_app_ids.add(game_info['appid'])
+                feed_counts['unique'] += 1
+                if args.rescan:
+                    reason = rescan_reason(game_info, game_states.get(game_info['appid']), args.rescan_ttl * 3600, rescan_started_at)
+                    if reason is None:
+                        continue
+                    rescan_reasons[reason] += 1
+                    if reason == 'stale':
+                        # The cached page may be as old as the check itself, so ask SCE whether it changed
+                        game_info = dict(game_info, revalidate_page=True)
+                elif game_info['appid'] in processed_app_ids:
+                    print(f"Skipping '{game_info['game_title']}' (AppID: {game_info['appid']}) - already processed in a previous run.")
+                    continue
+                if args.prune:
+                    decision = prune_decision(game_info, price_bounds.get(game_info['appid']), args.prune_margin,
+                                              args.prune_revalidate_rate, args.prune_max_age * 3600, rescan_started_at)
+                    if decision == 'prune':
+                        prune_counts['pruned'] += 1
+                        continue
+                    if decision in prune_counts:
+                        prune_counts[decision] += 1
+                feed_counts['selected'] += 1
+                yield game_info
 
-        if alert_csvfile_global and not alert_csvfile_global.closed:
-            alert_csvfile_global.close()
-        if all_processed_csvfile_global and not all_processed_csvfile_global.closed:
-            all_processed_csvfile_global.close()
-        
-        print(f"\n--- Alert data written to '{output_csv_file}' ---")
-        print(f"--- All processed AppIDs logged to '{all_processed_games_file}' ---")
+        def print_rescan_summary():
+            print(f"Rescan: re-checking {feed_counts['selected']} of {feed_counts['unique']} games "
+                  f"({rescan_reasons['new']} new, {rescan_reasons['badge price changed']} badge price changed, {rescan_reasons['stale']} older than {args.rescan_ttl:g}h).")
+
+        def print_prune_summary():
+            print(f"Pruning: skipped {prune_counts['pruned']} games whose indexed background prices are far below the badge price "
+                  f"({prune_counts['forced revalidation']} forced revalidations, {prune_counts['expired']} index entries older than {args.prune_max_age:g}h).")
+
+        games_to_scan = select_games_to_scan(games_to_process)
+        if not args.stream_feed:
+            games_to_scan = list(games_to_scan)
+            if args.rescan:
+                print_rescan_summary()
+            if args.prune:
+                print_prune_summary()
+
+        if not args.no_page_cache:
+            game_page_cache_global = GamePageCache(cache_db_file, args.page_cache_ttl * 3600, args.page_cache_max_entries)
+
+        def mark_processed(game_info):
+            # Journal before fetching so a game that crashes the script is not retried forever
+            # processed_app_ids picks the AppID up when the journal commits the record
+            if game_info['appid'] not in processed_app_ids:
+                results_journal_global.append(processed_record(game_info['appid']))
+
+        order_book_store_global = OrderBookStore(cache_db_file, args.histogram_ttl)
+        depth_alerts = []
+        sweep_counts = {'games': 0}
+        alert_positions = []
+
+        priority = None
+        if args.priority:
+            priority_states = game_states if game_states is not None else game_state_store_global.load_all()
+            priority = GamePriorityModel(priority_states, count_alerts_by_appid(results_journal_global.records)).score
+            if args.stream_feed:
+                print(f"Priority order: streamed games are reordered within a lookahead of {PRIORITY_LOOKAHEAD} games.")
+
+        def handle_result(game_info, result):
+            record_game_result(game_info, result)
+            sweep_counts['games'] += 1
+            if result['is_alert']:
+                alert_positions.append(sweep_counts['games'])
+            if result.get('depth'):
+                depth_alerts.append((game_info, result))
+
+        concurrency = max(1, args.concurrency)
+        scan_start_time = time.monotonic()
+        games_checked = asyncio.run(scan_games_async(games_to_scan, concurrency, handle_result, before_check=mark_processed, priority=priority))
+        scan_elapsed = time.monotonic() - scan_start_time
+
+        games_per_second = games_checked / scan_elapsed if scan_elapsed > 0 else 0.0
+        alert_discovery = alert_discovery_curve(alert_positions, games_checked)
+        if args.stats_json:
+            write_run_stats(args.stats_json, games_checked, scan_elapsed, concurrency, alert_discovery)
+        print(f"\n--- Checked {games_checked} games in {scan_elapsed:.1f}s ({games_per_second:.2f} games/second, concurrency {concurrency}) ---")
+        if alert_discovery:
+            first_alert_seconds = run_stats['time_to_first_alert_seconds']
+            print(f"--- Alert discovery{' (priority order)' if args.priority else ''}: first alert after {first_alert_seconds:.1f}s; "
+                  + ", ".join(f"{alerts_percent:.0f}% of alerts by {sweep_percent}% of the sweep" for sweep_percent, alerts_percent in alert_discovery)
+                  + " ---")
+        print_stage_summary()
+        if args.stream_feed:
+            print(f"--- Streamed {feed_counts['unique']} unique games from the badge prices API ---")
+            if args.rescan:
+                print_rescan_summary()
+            if args.prune:
+                print_prune_summary()
+        if game_page_cache_global is not None:
+            # Evictions happen when batched stores are written, so commit the last batch first
+            game_page_cache_global.flush()
+            page_cache_stats = game_page_cache_global.stats
+            print(f"--- Game page cache: {page_cache_stats['hits']} hits, {page_cache_stats['revalidated']} revalidated (304), {page_cache_stats['stored']} downloaded, {page_cache_stats['evicted']} evicted ---")
+            game_page_cache_global.close()
+        order_book_stats = order_book_store_global.stats
+        print(f"--- Order book cache: {order_book_stats['hits']} hits, {order_book_stats['stored']} fetched, {order_book_stats['expired']} expired ---")
+        order_book_store_global.close()
+        if depth_alerts:
+            ranked_alerts = write_depth_ranking(depth_alerts, depth_ranking_csv_file)
+            print(f"\n--- Alerts ranked by realizable profit for {depth_units_global} crafted badges (written to '{depth_ranking_csv_file}') ---")
+            for game_info, result in ranked_alerts[:20]:
+                depth = result['depth']
+                print(f"    ${depth['realizable_profit']:>8.2f}  {depth['fill_ratio'] * 100:>4.0f}% filled  "
+                      f"(list ${result['highest_bg_price'] - game_info['badge_price']:+.2f})  {game_info['game_title']} (AppID: {game_info['appid']})")
+        if args.parquet:
+            game_count, table_alert_count = export_game_table(game_state_store_global, args.parquet, args.min_margin, args.min_margin_pct, args.min_buyers)
+            print(f"--- Game table written to '{args.parquet}' ({game_count} games, {table_alert_count} alerts) ---")
+        game_state_store_global.close()
+        background_price_index_global.close()
+
+    # Export whatever the journal holds, including a run with no new games
+    results_journal_global.close()
+    processed_app_ids.close()
+    alert_count, processed_count = export_journal_to_csv(read_journal(results_journal_file)[0], output_csv_file, all_processed_games_file)
+    print(f"--- Alert data written to '{output_csv_file}' ({alert_count} alerts) ---")
+    print(f"--- All processed AppIDs logged to '{all_processed_games_file}' ({processed_count} games) ---")
+
+    if item_nameid_cache_global is not None:
+        item_nameid_cache_global.close()
 
     print("\n--- Script execution finished ---")
@@ -0,0 +1,362 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+from benchmark_html_extractors import make_synthetic_game_page
+
+# Fixture directory layout (as written by `replay_server.py record` or `synthesize`):
+#   badge_prices.json                      GetBadgePrices_Guest response
+#   gamepages/<appid>.html                 SCE game pages
+#   listings/<quoted market_hash_name>.html Steam Market listing pages (753/<name>)
+#   histograms/<item_nameid>.json          itemordershistogram responses
+
+
+def fixture_name_for_listing(market_hash_name):
+    """File name used for a listing page fixture; market_hash_name is "<appid>/<name>"."""
+    return quote(market_hash_name, safe='') + '.html'
+
+
+def synthetic_item_nameid(market_hash_name):
+    """Stable fake item_nameid for a listing in synthetic fixtures."""
+    return str(zlib.crc32(market_hash_name.encode('utf-8')) % 90000000 + 10000000)
+
+
+def synthesize_fixtures(fixtures_dir, game_count, seed=0):
+    """Writes a complete synthetic fixture set for `game_count` games."""
+    rng = random.Random(seed)
+    for subdir in ('gamepages', 'listings', 'histograms'):
+        os.makedirs(os.path.join(fixtures_dir, subdir), exist_ok=True)
+
+    rows = []
+    for index in range(game_count):
+        appid = 200000 + index * 10
+        badge_price = round(rng.uniform(0.3, 6.0), 2)
+        background_count = 0 if index % 10 == 0 else rng.randint(1, 10)
+        background_prices = [rng.uniform(0.05, 1.5) for _ in range(background_count)]
+        if background_prices and rng.random() < 0.2:
+            # A minority of games have one sought-after background, as on the real site
+            background_prices[rng.randrange(background_count)] = rng.uniform(2.0, 12.0)
+        rows.append([[appid, f"Replay Game {appid}"], rng.randint(5, 15), f"${badge_price:.2f}", rng.randint(0, 500)])
+
+        with open(os.path.join(fixtures_dir, 'gamepages', f'{appid}.html'), 'w', encoding='utf-8') as page_file:
+            page_file.write(make_synthetic_game_page(appid, background_prices, seed=appid))
+
+        for background_index, price in enumerate(background_prices):
+            market_hash_name = f"753/{appid}-Background {background_index}"
+            item_nameid = synthetic_item_nameid(market_hash_name)
+            with open(os.path.join(fixtures_dir, 'listings', fixture_name_for_listing(market_hash_name)), 'w', encoding='utf-8') as listing_file:
+                listing_file.write(
+                    '<html><body><div id="market_commodity_buyrequests"></div>'
+                    f'<script type="text/javascript">$J(function() {{ Market_LoadOrderSpread( {item_nameid} ); }});</script>'
+                    '</body></html>'
+                )
+            buy_graph = []
+            cumulative = 0
+            for level in range(rng.randint(0, 6)):
+                cumulative += rng.randint(1, 60)
+                buy_graph.append([round(price * 0.85 - level * 0.05, 2), cumulative, f"{cumulative} buy orders"])
+            sell_graph = []
+            cumulative = 0
+            for level in range(rng.randint(1, 6)):
+                cumulative += rng.randint(1, 20)
+                sell_graph.append([round(price + level * 0.07, 2), cumulative, f"{cumulative} sell orders"])
+            histogram = {
+                'success': 1,
+                'highest_buy_order': str(int(round(buy_graph[0][0] * 100))) if buy_graph else None,
+                'lowest_sell_order': str(int(round(sell_graph[0][0] * 100))),
+                'buy_order_graph': buy_graph,
+                'sell_order_graph': sell_graph,
+            }
+            with open(os.path.join(fixtures_dir, 'histograms', f'{item_nameid}.json'), 'w', encoding='utf-8') as histogram_file:
+                json.dump(histogram, histogram_file)
+
+    with open(os.path.join(fixtures_dir, 'badge_prices.json'), 'w', encoding='utf-8') as feed_file:
+        json.dump({'data': rows}, feed_file)
+    return game_count
+
+
+def record_fixtures(fixtures_dir, limit, delay_seconds=1.0):
+    """
+    Records live responses into a fixture directory: the badge price feed, then the game
+    page and the listing page and histogram of every background for the first `limit` games.
+    """
+    import compare_background_prices_with_badge_prices as scraper
+    import requests
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    for subdir in ('gamepages', 'listings', 'histograms'):
+        os.makedirs(os.path.join(fixtures_dir, subdir), exist_ok=True)
+
+    feed_response = requests.get(f"{scraper.SCE_BASE_URL}/api/request.php?GetBadgePrices_Guest", headers=headers, timeout=30)
+    feed_response.raise_for_status()
+    feed = feed_response.json()
+    feed_rows = feed.get('data', [])[:limit]
+
+    # A game is only kept in the recorded feed when every response the scraper will ask
+    # for was recorded; the replay server answers anything missing with a 404, which the
+    # scraper retries forever
+    recorded_rows = []
+    for row in feed_rows:
+        appid = int(row[0][0])
+        page_response = requests.get(f"{scraper.SCE_BASE_URL}/index.php?gamepage-appid-{appid}", headers=headers, timeout=30)
+        time.sleep(delay_seconds)
+        if not page_response.ok:
+            print(f"Skipping AppID {appid}: HTTP {page_response.status_code}")
+            continue
+        fixture_files = {os.path.join(fixtures_dir, 'gamepages', f'{appid}.html'): page_response.text}
+
+        # Every background, since --depth reads the order book of each one
+        _, _, _, background_prices, _ = scraper.parse_game_page_bs4(page_response.text, appid)
+        skip_reason = None
+        for market_url in dict.fromkeys(market_url for market_url, _ in background_prices or []):
+            market_hash_name = scraper.market_hash_name_from_url(market_url)
+            if not market_hash_name:
+                continue
+            listing_response = requests.get(market_url, headers=headers, timeout=30)
+            time.sleep(delay_seconds)
+            match = re.search(r'Market_LoadOrderSpread\( (\d+) \);', listing_response.text)
+            if not match:
+                skip_reason = f"no item_nameid in the listing page of {market_url} (HTTP {listing_response.status_code})"
+                break
+            fixture_files[os.path.join(fixtures_dir, 'listings', fixture_name_for_listing(market_hash_name))] = listing_response.text
+            histogram_response = requests.get(
+                f"{scraper.STEAM_COMMUNITY_BASE_URL}/market/itemordershistogram?country=US&language=english&currency=1&item_nameid={match.group(1)}",
+                headers=headers, timeout=30
+            )
+            time.sleep(delay_seconds)
+            if not histogram_response.ok:
+                skip_reason = f"HTTP {histogram_response.status_code} for the order histogram of {market_url}"
+                break
+            fixture_files[os.path.join(fixtures_dir, 'histograms', f'{match.group(1)}.json')] = histogram_response.text
+        if skip_reason:
+            print(f"Skipping AppID {appid}: {skip_reason}")
+            continue
+
+        for path, text in fixture_files.items():
+            with open(path, 'w', encoding='utf-8') as fixture_file:
+                fixture_file.write(text)
+        recorded_rows.append(row)
+        print(f"Recorded AppID {appid}")
+
+    feed['data'] = recorded_rows
+    with open(os.path.join(fixtures_dir, 'badge_prices.json'), 'w', encoding='utf-8') as feed_file:
+        json.dump(feed, feed_file)
+    return len(recorded_rows)
+
+
+class FaultProfile:
+    """Latency and fault injection settings applied to every replayed response."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, rate_5xx=0.0, rate_garbage=0.0, retry_after_seconds=1, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_garbage = rate_garbage
+        self.retry_after_seconds = retry_after_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Returns (delay seconds, fault) for one request; fault is None, '429', '5xx' or 'garbage'."""
+        with self.lock:
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+            roll = self.rng.random()
+        if roll < self.rate_429:
+            return delay, '429'
+        if roll < self.rate_429 + self.rate_5xx:
+            return delay, '5xx'
+        if roll < self.rate_429 + self.rate_5xx + self.rate_garbage:
+            return delay, 'garbage'
+        return delay, None
+
+
+class ReplayServer:
+    """
+    Local stand-in for steamcardexchange.net and steamcommunity.com that serves recorded
+    fixtures. One server answers both sites' paths; run two instances (one per site) so
+    the scraper's per-host rate limiting still sees two hosts.
+    """
+
+    def __init__(self, fixtures_dir, fault_profile=None, host='127.0.0.1', port=0):
+        self.fixtures_dir = fixtures_dir
+        self.fault_profile = fault_profile or FaultProfile()
+        self.stats = {'requests': 0, 'by_kind': {}, 'faults': {}, 'not_modified': 0}
+        self.stats_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, key, name):
+        with self.stats_lock:
+            self.stats[key][name] = self.stats[key].get(name, 0) + 1
+
+    def resolve(self, path, query):
+        """Maps a request to (kind, fixture path, content type), or None when the route is unknown."""
+        if path == '/api/request.php' and 'GetBadgePrices_Guest' in query:
+            return 'badge_prices', os.path.join(self.fixtures_dir, 'badge_prices.json'), 'application/json'
+        if path == '/index.php':
+            match = re.match(r'gamepage-appid-(\d+)$', query)
+            if match:
+                return 'game_page', os.path.join(self.fixtures_dir, 'gamepages', f'{match.group(1)}.html'), 'text/html; charset=utf-8'
+        match = re.match(r'/market/listings/(\d+)/(.+)$', path)
+        if match:
+            market_hash_name = f"{match.group(1)}/{unquote(match.group(2))}"
+            return 'listing', os.path.join(self.fixtures_dir, 'listings', fixture_name_for_listing(market_hash_name)), 'text/html; charset=utf-8'
+        if path == '/market/itemordershistogram':
+            item_nameid = parse_qs(query).get('item_nameid', [''])[0]
+            if item_nameid.isdigit():
+                return 'histogram', os.path.join(self.fixtures_dir, 'histograms', f'{item_nameid}.json'), 'application/json'
+        return None
+
+    def make_handler(self):
+        server = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_body(self, status, body, content_type, extra_headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (extra_headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == '/__stats':
+                    with server.stats_lock:
+                        body = json.dumps(server.stats).encode('utf-8')
+                    self.send_body(200, body, 'application/json')
+                    return
+
+                with server.stats_lock:
+                    server.stats['requests'] += 1
+                route = server.resolve(parsed.path, parsed.query)
+                kind = route[0] if route else 'unknown'
+                server.count('by_kind', kind)
+
+                delay, fault = server.fault_profile.draw()
+                if delay:
+                    time.sleep(delay)
+
+                if fault:
+                    server.count('faults', fault)
+                if fault == '429':
+                    self.send_body(429, b'Too Many Requests', 'text/plain',
+                                   {'Retry-After': str(server.fault_profile.retry_after_seconds)})
+                    return
+                if fault == '5xx':
+                    with server.fault_profile.lock:
+                        status = server.fault_profile.rng.choice([500, 502, 503])
+                    self.send_body(status, b'Server Error', 'text/plain')
+                    return
+
+                if not route or not os.path.exists(route[1]):
+                    self.send_body(404, b'Not Found', 'text/plain')
+                    return
+
+                if fault == 'garbage':
+                    with server.fault_profile.lock:
+                        body = server.fault_profile.rng.randbytes(256)
+                    self.send_body(200, body, route[2])
+                    return
+
+                with open(route[1], 'rb') as fixture_file:
+                    body = fixture_file.read()
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    with server.stats_lock:
+                        server.stats['not_modified'] += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_body(200, body, route[2], {'ETag': etag})
+
+        return ReplayHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded SCE / Steam Market fixtures over local HTTP.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve a fixture directory as both sites.")
+    serve_parser.add_argument("fixtures_dir")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--sce-port", type=int, default=8801)
+    serve_parser.add_argument("--steam-port", type=int, default=8802)
+    serve_parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean added latency per response.")
+    serve_parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter around --latency-ms.")
+    serve_parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of responses answered 429 with Retry-After.")
+    serve_parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of responses answered 500/502/503.")
+    serve_parser.add_argument("--rate-garbage", type=float, default=0.0, help="Fraction of responses replaced with random bytes (HTTP 200).")
+    serve_parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s.")
+
+    synthesize_parser = subparsers.add_parser("synthesize", help="Write a synthetic fixture directory.")
+    synthesize_parser.add_argument("fixtures_dir")
+    synthesize_parser.add_argument("--games", type=int, default=500)
+
+    record_parser = subparsers.add_parser("record", help="Record live responses for the first N games in the feed.")
+    record_parser.add_argument("fixtures_dir")
+    record_parser.add_argument("--games", type=int, default=50)
+    record_parser.add_argument("--delay", type=float, default=1.0, help="Seconds to wait between live requests.")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "synthesize":
+        synthesize_fixtures(args.fixtures_dir, args.games)
+        print(f"Wrote synthetic fixtures for {args.games} games to '{args.fixtures_dir}'.")
+        return 0
+    if args.command == "record":
+        recorded = record_fixtures(args.fixtures_dir, args.games, args.delay)
+        print(f"Recorded fixtures for {recorded} games to '{args.fixtures_dir}'.")
+        return 0
+
+    servers = []
+    for port in (args.sce_port, args.steam_port):
+        fault_profile = FaultProfile(args.latency_ms, args.jitter_ms, args.rate_429, args.rate_5xx, args.rate_garbage, args.retry_after)
+        servers.append(ReplayServer(args.fixtures_dir, fault_profile, args.host, port).start())
+    print(f"Replaying '{args.fixtures_dir}'. Point the scraper at it with:")
+    print(f"  --sce-base-url {servers[0].base_url} --steam-base-url {servers[1].base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import compare_background_prices_with_badge_prices as scraper
+
+ROWS = [
+    [[10, "Game with \"quotes\" and ] brackets"], 5, 0.43],
+    [[20, "Ünïcode [game]"], 6, 1.2],
+    [[30, "Plain"], 7, 12.05],
+]
+FEED = '{"recordsTotal": 3,\n "data" :\t[ ' + ',\n  '.join(json.dumps(row) for row in ROWS) + ' ],\n "draw": 1}'
+
+
+def parse_in_chunks(text, chunk_size):
+    parser = scraper.BadgeFeedRowParser()
+    rows = []
+    for start in range(0, len(text), chunk_size):
+        rows.extend(parser.feed(text[start:start + chunk_size]))
+    parser.close()
+    return rows
+
+
+def test_whole_feed_in_one_chunk():
+    assert parse_in_chunks(FEED, len(FEED)) == ROWS
+
+
+def test_one_character_at_a_time():
+    assert parse_in_chunks(FEED, 1) == ROWS
+
+
+def test_every_split_point():
+    for split in range(1, len(FEED)):
+        parser = scraper.BadgeFeedRowParser()
+        rows = parser.feed(FEED[:split]) + parser.feed(FEED[split:])
+        parser.close()
+        assert rows == ROWS, f"split at {split}"
+
+
+def test_rows_are_returned_as_soon_as_they_are_complete():
+    parser = scraper.BadgeFeedRowParser()
+    first_row_end = FEED.index(json.dumps(ROWS[0])) + len(json.dumps(ROWS[0]))
+
+    assert parser.feed(FEED[:first_row_end - 1]) == []
+    assert parser.feed(FEED[first_row_end - 1:first_row_end]) == [ROWS[0]]
+
+
+def test_text_after_the_data_array_is_ignored():
+    parser = scraper.BadgeFeedRowParser()
+    parser.feed(FEED)
+    assert parser.feed(', "data": [[[99, "Late"], 1, 1.0]]}') == []
+
+
+def test_truncated_feed_raises_on_close():
+    parser = scraper.BadgeFeedRowParser()
+    rows = parser.feed(FEED[:FEED.index('"Plain"')])
+
+    assert rows == ROWS[:2]
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
@@ -0,0 +1,102 @@
+import sqlite3
+
+import compare_background_prices_with_badge_prices as scraper
+
+
+def row_count(db_path, table):
+    return sqlite3.connect(db_path).execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_cache_database_uses_wal(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    store = scraper.GameStateStore(db_path)
+    assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    store.close()
+
+
+def test_page_cache_serves_pending_entries_and_writes_them_in_a_batch(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = scraper.GamePageCache(db_path, ttl_seconds=3600)
+    cache.flush_every = 3
+    extracted = ("Game", 1.5, "bg-1", [("bg-1", 1.5)], 2)
+
+    cache.store("page-1", '"etag"', None, extracted)
+    cache.record_hit("page-1")
+    assert cache.lookup("page-1")['extracted'] == extracted
+    assert row_count(db_path, "game_page_cache") == 0
+
+    cache.store("page-2", None, None, extracted)
+    assert row_count(db_path, "game_page_cache") == 2
+    cache.close()
+
+
+def test_page_cache_evicts_with_an_in_memory_count(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = scraper.GamePageCache(db_path, ttl_seconds=3600, max_entries=3)
+    for index in range(5):
+        cache.store(f"page-{index}", None, None, ("Game", None, None, [], 0))
+    cache.store("page-4", None, None, ("Game", None, None, [], 0))
+    cache.close()
+
+    assert cache.entry_count == 3
+    assert cache.stats['evicted'] == 2
+    reopened = scraper.GamePageCache(db_path, ttl_seconds=3600, max_entries=3)
+    assert reopened.entry_count == 3
+    assert reopened.lookup("page-4") is not None
+    reopened.close()
+
+
+def test_reads_see_pending_game_checks_and_price_index_updates(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    state_store = scraper.GameStateStore(db_path)
+    price_index = scraper.BackgroundPriceIndex(db_path)
+
+    state_store.record_check(10, 0.5, 1.0)
+    state_store.record_check(10, 0.6, 1.2)
+    price_index.record_game(10, [("bg-1", 1.0), ("bg-2", 2.0)])
+    price_index.record_game(10, [("bg-1", 1.5)])
+
+    assert state_store.load_all()[10][1:] == (0.6, 1.2)
+    # bg-2 is no longer listed; bg-1 is bounded by its last price plus the range it moved over
+    assert price_index.load_bounds()[10][0] == 2.0
+    assert len(price_index) == 1
+    state_store.close()
+    price_index.close()
+
+
+def test_item_nameid_cache_batches_new_entries(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = scraper.ItemNameIdCache(db_path)
+    cache.flush_every = 3
+
+    cache.put("753/1-Background", 111)
+    assert cache.get("753/1-Background") == "111"
+    assert row_count(db_path, "item_nameids") == 0
+
+    assert cache.put_many([("753/2-Background", 222), ("753/3-Background", 333)]) == 2
+    assert row_count(db_path, "item_nameids") == 3
+    cache.put("753/4-Background", 444)
+    cache.close()
+
+    reopened = scraper.ItemNameIdCache(db_path)
+    assert len(reopened) == 4
+    reopened.close()
+
+
+def test_warming_fetches_each_uncached_listing_once(tmp_path, monkeypatch):
+    cache = scraper.ItemNameIdCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("753/1-Background", 111)
+    alert_csv_path = tmp_path / "alerts.csv"
+    links = ["753/2-Background", "753/1-Background", "753/2-Background", "753/3-Background", "753/3-Background"]
+    alert_csv_path.write_text(
+        "highest background steam market link\n"
+        + "".join(f"https://steamcommunity.com/market/listings/{link}\n" for link in links),
+        encoding='utf-8',
+    )
+    fetched = []
+    monkeypatch.setattr(scraper, 'get_item_nameid', lambda market_url, headers: fetched.append(market_url))
+
+    assert scraper.warm_item_nameid_cache(cache, str(alert_csv_path)) == 2
+    assert fetched == ["https://steamcommunity.com/market/listings/753/2-Background",
+                       "https://steamcommunity.com/market/listings/753/3-Background"]
+    cache.close()
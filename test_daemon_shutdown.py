@@ -0,0 +1,31 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compare_background_prices_with_badge_prices.py")
+
+
+def test_sigterm_stops_the_daemon_cleanly(tmp_path):
+    # Nothing listens on port 1, so the daemon keeps retrying the badge feed until it is stopped
+    daemon = subprocess.Popen(
+        [sys.executable, SCRIPT, "--daemon", "--api-port", "0", "--retry-delay", "0.05",
+         "--sce-base-url", "http://127.0.0.1:1", "--steam-base-url", "http://127.0.0.1:1"],
+        cwd=str(tmp_path), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        for line in daemon.stdout:
+            if "Watch daemon started" in line:
+                break
+        time.sleep(0.2)
+        daemon.send_signal(signal.SIGTERM)
+        output = daemon.communicate(timeout=30)[0]
+    finally:
+        if daemon.poll() is None:
+            daemon.kill()
+
+    assert daemon.returncode == 0
+    assert "Watch daemon stopping (SIGTERM)" in output
+    assert "Traceback" not in output
+    assert (tmp_path / "steam_background_alerts.csv").exists()
@@ -0,0 +1,43 @@
+import pytest
+
+import compare_background_prices_with_badge_prices as scraper
+
+# (appid, badge price, highest background price, buy order price, buyers, last checked)
+ROWS = [
+    (1, 1.0, 1.5, 1.25, 50, 0.0),   # margin exactly 0.5 (50%), exactly 50 buyers
+    (2, 1.0, 1.25, 1.0, 80, 0.0),   # margin 0.25, below the threshold
+    (3, 2.0, 2.0, 1.5, 90, 0.0),    # no margin at all
+    (4, 1.0, 3.0, 2.5, 49, 0.0),    # one buyer short
+    (5, 1.0, None, None, None, 0.0),
+]
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def table_module(request, monkeypatch):
+    if request.param == 'numpy':
+        if scraper.numpy is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setattr(scraper, 'numpy', None)
+    return scraper
+
+
+def flagged_appids(game_table, alert_flags):
+    return [int(appid) for appid, flagged in zip(game_table.columns['appid'], alert_flags) if flagged]
+
+
+def test_thresholds_are_inclusive(table_module):
+    game_table = table_module.GameTable.from_rows(ROWS)
+
+    alert_flags, margins = game_table.evaluate_alerts(min_margin=0.5, min_margin_pct=50.0, min_buyers=50)
+
+    assert margins[0] == 0.5
+    assert flagged_appids(game_table, alert_flags) == [1]
+
+
+def test_a_zero_margin_never_alerts(table_module):
+    game_table = table_module.GameTable.from_rows(ROWS)
+
+    alert_flags, _ = game_table.evaluate_alerts()
+
+    assert flagged_appids(game_table, alert_flags) == [1, 2, 4]
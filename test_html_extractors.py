@@ -0,0 +1,69 @@
+import random
+
+import benchmark_html_extractors as benchmark
+import compare_background_prices_with_badge_prices as scraper
+
+EXTRACTORS = sorted(name for name in scraper.HTML_EXTRACTORS if name != 'bs4')
+
+
+def header(name):
+    return f'<div class="bg-gray-dark flex"><h2><a href="#{name.lower()}">{name}</a></h2><span>items</span></div>'
+
+
+def grid(kind, prices):
+    buttons = ''.join(
+        f'<div><a class="btn-primary" href="{kind}-{index}">Price: ${price:.2f}</a>'
+        f'<a class="btn-secondary" href="#">Stock: 3</a></div>'
+        for index, price in enumerate(prices)
+    )
+    return f'<div class="grid grid-cols-5">{buttons}</div>'
+
+
+def page(*blocks):
+    return (
+        '<html><body><div class="gameTitle"> Layout Game </div><section class="content">'
+        + ''.join(blocks) + '</section></body></html>'
+    )
+
+
+def random_layout(rng):
+    blocks = []
+    for _ in range(rng.randint(1, 8)):
+        choice = rng.random()
+        if choice < 0.3:
+            blocks.append(header(rng.choice(["Backgrounds", "Emoticons", "Trading Cards"])))
+        elif choice < 0.6:
+            blocks.append(grid(rng.choice(["bg", "emo"]), [rng.randint(1, 999) / 100 for _ in range(rng.randint(0, 4))]))
+        elif choice < 0.7:
+            blocks.append('<div class="note">Some text</div>')
+        elif choice < 0.8:
+            blocks.append('<!-- a comment -->')
+        elif choice < 0.9:
+            blocks.append('<br>')
+        else:
+            blocks.append(f'<div class="wrapper">{header("Backgrounds")}{grid("nested", [1.25])}</div>')
+    return page(*blocks)
+
+
+def test_extractors_match_on_synthetic_pages():
+    assert benchmark.check_parity(benchmark.make_synthetic_pages(100), EXTRACTORS) == []
+
+
+def test_a_grid_after_another_header_belongs_to_that_section():
+    html = page(header("Backgrounds"), '<div class="note">No backgrounds</div>', header("Emoticons"), grid("e", [3.0]))
+
+    assert scraper.parse_game_page_bs4(html, 1) == ("Layout Game", None, None, None, 1)
+    assert benchmark.check_parity([(1, html)], EXTRACTORS) == []
+
+
+def test_a_section_grid_must_follow_its_header():
+    html = page(header("Backgrounds"), '<!-- prices -->', grid("bg", [0.5, 2.0]))
+
+    assert scraper.parse_game_page_bs4(html, 1) == ("Layout Game", 2.0, "bg-1", [("bg-0", 0.5), ("bg-1", 2.0)], 0)
+    assert benchmark.check_parity([(1, html)], EXTRACTORS) == []
+
+
+def test_extractors_match_on_random_layouts():
+    rng = random.Random(7)
+    pages = [(appid, random_layout(rng)) for appid in range(1000)]
+    assert benchmark.check_parity(pages, EXTRACTORS)[:3] == []
@@ -0,0 +1,44 @@
+import pytest
+
+import compare_background_prices_with_badge_prices as scraper
+
+
+def test_seller_proceeds_after_fees():
+    proceeds = scraper.seller_proceeds_cents([2, 3, 115, 1000])
+    assert [int(cents) for cents in proceeds] == [0, 1, 100, 870]
+
+
+def test_seller_proceeds_matches_without_numpy(monkeypatch):
+    buyer_prices = list(range(1, 5000, 7))
+    with_numpy = [int(cents) for cents in scraper.seller_proceeds_cents(buyer_prices)]
+    monkeypatch.setattr(scraper, 'numpy', None)
+    assert scraper.seller_proceeds_cents(buyer_prices) == with_numpy
+
+
+def test_sell_into_book_stops_at_the_available_depth():
+    buy_order_graph = [[1.15, 2, ""], [0.50, 5, ""]]
+    proceeds, filled = scraper.sell_into_book(buy_order_graph, 10)
+    assert filled == 5
+    assert proceeds == pytest.approx(2 * 1.00 + 3 * 0.44)
+
+
+def test_each_background_gets_its_share_of_all_profile_items():
+    # Deep books, so every expected unit is filled at $1.15 (seller receives $1.00)
+    book = {'buy_order_graph': [[1.15, 1000, ""]]}
+    background_books = [("bg-1", book), ("bg-2", book)]
+
+    without_emoticons = scraper.evaluate_order_book_depth(0.50, background_books, 12)
+    with_emoticons = scraper.evaluate_order_book_depth(0.50, background_books, 12, emoticon_count=4)
+
+    assert without_emoticons['expected_proceeds'] == 12.0
+    # 2 backgrounds out of 6 profile items: 12 * 2/6 backgrounds are sold
+    assert with_emoticons['expected_proceeds'] == 4.0
+    assert with_emoticons['realizable_profit'] == 4.0 - 6.0
+    assert with_emoticons['background_share'] == pytest.approx(0.333)
+    assert with_emoticons['fill_ratio'] == 1.0
+
+
+def test_game_without_backgrounds_has_no_proceeds():
+    depth = scraper.evaluate_order_book_depth(0.50, [], 10, emoticon_count=5)
+    assert depth['expected_proceeds'] == 0.0
+    assert depth['fill_ratio'] == 0.0
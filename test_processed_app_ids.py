@@ -0,0 +1,132 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import compare_background_prices_with_badge_prices as scraper
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_membership_and_length(tmp_path):
+    path = str(tmp_path / "ids.u32")
+    app_ids = [730, 10, 570, 440, 10]
+
+    assert scraper.ProcessedAppIdStore.create(path, app_ids) == 4
+    store = scraper.ProcessedAppIdStore(path)
+
+    assert len(store) == 4
+    assert all(appid in store for appid in app_ids)
+    assert 0 not in store and 11 not in store and 4294967295 not in store
+    store.close()
+
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / "ids.u32")
+    scraper.ProcessedAppIdStore.create(path, [])
+    store = scraper.ProcessedAppIdStore(path)
+
+    assert len(store) == 0
+    assert 1 not in store
+    store.add_many([5])
+    store.close()
+
+    assert 5 in scraper.ProcessedAppIdStore(path)
+
+
+def test_append_segment_survives_a_crash(tmp_path):
+    path = str(tmp_path / "ids.u32")
+    scraper.ProcessedAppIdStore.create(path, [1, 2, 3])
+    store = scraper.ProcessedAppIdStore(path)
+    store.add_many([7, 2, 5])
+    # No close(): the appended AppIDs are only in the .log segment
+
+    reopened = scraper.ProcessedAppIdStore(path)
+    assert len(reopened) == 5
+    assert reopened.appended_ids == {5, 7}
+    reopened.close()
+
+
+def test_compaction_only_at_the_threshold(tmp_path):
+    path = str(tmp_path / "ids.u32")
+    scraper.ProcessedAppIdStore.create(path, [100, 300])
+    store = scraper.ProcessedAppIdStore(path, compact_threshold=3)
+
+    store.add_many([200, 50])
+    assert os.path.getsize(path) == 8
+    store.add_many([400])
+    assert os.path.getsize(path) == 20
+    assert os.path.getsize(path + '.log') == 0
+    assert list(store.base_ids) == [50, 100, 200, 300, 400]
+
+    store.add_many([250])
+    store.close()
+    # Closing below the threshold keeps the append segment instead of rewriting the base
+    assert os.path.getsize(path) == 20
+    assert os.path.getsize(path + '.log') == 4
+    reopened = scraper.ProcessedAppIdStore(path, compact_threshold=3)
+    assert reopened.appended_ids == {250}
+    assert len(reopened) == 6 and 250 in reopened
+
+    reopened.add_many([10, 20])
+    reopened.close()
+    assert os.path.getsize(path + '.log') == 0
+    compacted = scraper.ProcessedAppIdStore(path, read_only=True)
+    assert list(compacted.base_ids) == [10, 20, 50, 100, 200, 250, 300, 400]
+    compacted.close()
+
+
+def test_torn_and_leftover_append_segment(tmp_path):
+    path = str(tmp_path / "ids.u32")
+    scraper.ProcessedAppIdStore.create(path, [1, 2, 3])
+    with open(path + '.log', 'wb') as append_file:
+        # 2 is left over from an interrupted compaction, the last two bytes are a torn write
+        append_file.write(scraper.array('I', [2, 9]).tobytes() + b'\x01\x02')
+
+    store = scraper.ProcessedAppIdStore(path)
+
+    assert store.appended_ids == {9}
+    assert len(store) == 4
+    assert os.path.getsize(path + '.log') == 8
+    store.close()
+
+
+def test_journal_commit_feeds_the_store(tmp_path):
+    path = str(tmp_path / "ids.u32")
+    scraper.ProcessedAppIdStore.create(path, [])
+    store = scraper.ProcessedAppIdStore(path)
+    journal = scraper.ResultJournal(str(tmp_path / "journal.jsonl"), flush_every=3, flush_interval_ms=60000)
+    journal.on_commit = store.add_committed_records
+
+    journal.append(scraper.processed_record(1))
+    journal.append(scraper.processed_record(2))
+    assert 1 not in store
+
+    journal.append(scraper.alert_record(["Game", 2]))
+    assert 1 in store and 2 in store
+    journal.close()
+    store.close()
+
+
+def test_crash_before_the_journal_commits_leaves_games_unprocessed(tmp_path):
+    crashing_run = textwrap.dedent("""
+        import os
+        import compare_background_prices_with_badge_prices as scraper
+        scraper.ProcessedAppIdStore.create('ids.u32', [])
+        store = scraper.ProcessedAppIdStore('ids.u32')
+        journal = scraper.ResultJournal('journal.jsonl', flush_every=50, flush_interval_ms=60000)
+        journal.on_commit = store.add_committed_records
+        for appid in range(10):
+            journal.append(scraper.processed_record(appid))
+        journal.append(scraper.alert_record(['Game', 3]))
+        os._exit(1)
+    """)
+    environment = dict(os.environ, PYTHONPATH=SCRIPT_DIR)
+    subprocess.run([sys.executable, "-c", crashing_run], cwd=str(tmp_path), env=environment)
+
+    journal = scraper.ResultJournal(str(tmp_path / "journal.jsonl"))
+    store = scraper.ProcessedAppIdStore(str(tmp_path / "ids.u32"))
+    assert journal.records == []
+    assert len(store) == 0
+    journal.close()
+    store.close()
@@ -0,0 +1,26 @@
+import compare_background_prices_with_badge_prices as scraper
+
+
+def game(appid, badge_price):
+    return {'appid': appid, 'game_title': f"Game {appid}", 'badge_price': badge_price}
+
+
+def test_rescan_reasons():
+    now = 1000000.0
+    assert scraper.rescan_reason(game(1, 0.5), None, 3600, now) == 'new'
+    assert scraper.rescan_reason(game(1, 0.5), (now - 10, 0.6, 0.1), 3600, now) == 'badge price changed'
+    assert scraper.rescan_reason(game(1, 0.5), (now - 7200, 0.5, 0.1), 3600, now) == 'stale'
+    assert scraper.rescan_reason(game(1, 0.5), (now - 10, 0.5, 0.1), 3600, now) is None
+
+
+def test_daemon_revalidates_the_pages_of_stale_games():
+    watch_state = scraper.WatchState()
+    now = scraper.time.time()
+    watch_state.seed_checks({1: (now - 7200, 0.5, 0.1), 2: (now - 10, 0.6, 0.1)})
+
+    to_check = {game_info['appid']: game_info for game_info in watch_state.update_feed([game(1, 0.5), game(2, 0.5), game(3, 0.5)], 3600, 10)}
+
+    assert to_check[1]['revalidate_page'] is True
+    assert 'revalidate_page' not in to_check[2] and 'revalidate_page' not in to_check[3]
+    # The feed itself is not modified
+    assert 'revalidate_page' not in watch_state.games[1]
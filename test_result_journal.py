@@ -0,0 +1,109 @@
+import json
+import os
+
+import compare_background_prices_with_badge_prices as scraper
+
+
+def write_lines(path, lines, tail=b''):
+    with open(path, 'wb') as journal_file:
+        for line in lines:
+            journal_file.write(json.dumps(line).encode('utf-8') + b'\n')
+        journal_file.write(tail)
+
+
+def processed(appid):
+    return scraper.processed_record(appid)
+
+
+def test_recovery_truncates_an_incomplete_last_line(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    write_lines(journal_path, [processed(1), processed(2)], tail=b'{"type":"proc')
+    intact_length = os.path.getsize(journal_path) - len(b'{"type":"proc')
+
+    journal = scraper.ResultJournal(journal_path)
+    journal.append(processed(3))
+    journal.close()
+
+    assert journal.recovered_length == intact_length
+    records, _ = scraper.read_journal(journal_path)
+    assert records == [processed(1), processed(2), processed(3)]
+
+
+def test_recovery_drops_a_corrupt_last_line(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    write_lines(journal_path, [processed(1)], tail=b'\x00\x00garbage\n')
+
+    journal = scraper.ResultJournal(journal_path)
+    journal.close()
+
+    assert journal.records == [processed(1)]
+    assert scraper.read_journal(journal_path)[0] == [processed(1)]
+
+
+def test_recovery_checks_the_tail_of_a_journal_longer_than_the_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, 'JOURNAL_TAIL_CHECK_BYTES', 64)
+    journal_path = str(tmp_path / "journal.jsonl")
+    write_lines(journal_path, [processed(appid) for appid in range(100)], tail=b'{"ty')
+
+    journal = scraper.ResultJournal(journal_path)
+    journal.close()
+
+    assert len(journal.records) == 100
+    assert os.path.getsize(journal_path) == journal.recovered_length
+
+
+def test_mid_file_corruption_is_reported_and_later_records_are_kept(tmp_path, capsys):
+    journal_path = str(tmp_path / "journal.jsonl")
+    with open(journal_path, 'wb') as journal_file:
+        journal_file.write(b'{"type":"processed","appid":1}\nnot json\n{"type":"processed","appid":2}\n')
+
+    records, good_length = scraper.read_journal(journal_path)
+
+    assert records == [processed(1), processed(2)]
+    assert good_length == os.path.getsize(journal_path)
+    assert "line(s) 2" in capsys.readouterr().out
+
+
+def test_read_journal_never_modifies_the_file(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    write_lines(journal_path, [processed(1)], tail=b'{"type":"processed","ap')
+    size_before = os.path.getsize(journal_path)
+
+    records, _ = scraper.read_journal(journal_path)
+
+    assert records == [processed(1)]
+    assert os.path.getsize(journal_path) == size_before
+
+
+def test_records_are_committed_in_batches(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    journal = scraper.ResultJournal(journal_path, flush_every=3, flush_interval_ms=60000)
+    journal.append(processed(1))
+    journal.append(processed(2))
+    assert scraper.read_journal(journal_path)[0] == []
+
+    journal.append(processed(3))
+    assert len(scraper.read_journal(journal_path)[0]) == 3
+    journal.close()
+
+
+def test_export_keeps_the_latest_alert_per_game(tmp_path):
+    def alert(appid, price):
+        return scraper.alert_record([f"Game {appid}", str(appid), "$1.00", price, "N/A", "N/A", "N/A"])
+
+    records = [
+        processed(1), alert(1, "$2.00"),
+        processed(2), alert(2, "$3.00"),
+        processed(3), scraper.cleared_record(3),
+        alert(1, "$2.50"),
+        scraper.cleared_record(2),
+    ]
+    alert_csv_path = str(tmp_path / "alerts.csv")
+    processed_csv_path = str(tmp_path / "processed.csv")
+
+    alert_count, processed_count = scraper.export_journal_to_csv(records, alert_csv_path, processed_csv_path)
+
+    assert (alert_count, processed_count) == (1, 3)
+    with open(alert_csv_path, encoding='utf-8') as alert_csv:
+        lines = alert_csv.read().splitlines()
+    assert lines[1].split(',')[3] == "$2.50"
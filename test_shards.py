@@ -0,0 +1,57 @@
+import json
+
+import compare_background_prices_with_badge_prices as scraper
+
+
+def test_worker_argv_drops_the_output_flags():
+    argv = ["--shards", "2", "--metrics-json", "m.json", "--metrics-prom=m.prom", "--profile",
+            "--stats-json", "st.json", "--concurrency", "8"]
+
+    assert scraper.shard_worker_argv(argv, 1) == ["--shards", "2", "--concurrency", "8", "--shard-index", "1"]
+    assert scraper.shard_worker_argv(argv, 0, "st.shard0.json")[-2:] == ["--stats-json", "st.shard0.json"]
+
+
+def test_shard_stats_path():
+    assert scraper.shard_stats_path("out/st.json", 3) == "out/st.shard3.json"
+    assert scraper.shard_stats_path("st", 0) == "st.shard0.json"
+
+
+def test_worker_run_summaries_are_added_up(tmp_path, monkeypatch):
+    run_stats = dict(scraper.run_stats, requests=0, retries=0, alerts=0, time_to_first_alert_seconds=None,
+                     requests_by_host={}, responses_by_host={}, bytes_by_host={})
+    monkeypatch.setattr(scraper, 'run_stats', run_stats)
+    stats_paths = []
+    for shard_index, (requests, first_alert) in enumerate([(10, 2.5), (7, 1.5)]):
+        stats_path = str(tmp_path / f"st.shard{shard_index}.json")
+        with open(stats_path, 'w', encoding='utf-8') as stats_file:
+            json.dump({'games_checked': 5, 'requests': requests, 'retries': 1, 'alerts': 2,
+                       'time_to_first_alert_seconds': first_alert, 'requests_by_host': {'sce': requests}}, stats_file)
+        stats_paths.append(stats_path)
+
+    games_checked = scraper.merge_shard_run_stats(stats_paths + [str(tmp_path / "missing.json")])
+
+    assert games_checked == 10
+    assert (run_stats['requests'], run_stats['retries'], run_stats['alerts']) == (17, 2, 4)
+    assert run_stats['requests_by_host'] == {'sce': 17}
+    assert run_stats['time_to_first_alert_seconds'] == 1.5
+
+
+def test_worker_stage_histograms_are_merged(tmp_path, monkeypatch):
+    worker_metrics = scraper.StageMetrics()
+    for seconds in (0.004, 0.2, 0.2):
+        worker_metrics.observe('game_page_fetch', seconds)
+    coordinator_metrics = scraper.StageMetrics()
+    coordinator_metrics.observe('game_page_fetch', 0.02)
+    coordinator_metrics.observe('csv_export', 0.001)
+    monkeypatch.setattr(scraper, 'stage_metrics', coordinator_metrics)
+    stats_path = str(tmp_path / "st.shard0.json")
+    with open(stats_path, 'w', encoding='utf-8') as stats_file:
+        json.dump({'games_checked': 3, 'stage_histograms': worker_metrics.snapshot()}, stats_file)
+
+    scraper.merge_shard_run_stats([stats_path])
+
+    summary = coordinator_metrics.summary()
+    assert summary['game_page_fetch']['count'] == 4
+    assert summary['game_page_fetch']['max_seconds'] == 0.2
+    assert summary['game_page_fetch']['p50_seconds'] == 0.025
+    assert summary['csv_export']['count'] == 1